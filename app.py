@@ -15,6 +15,7 @@ if missing_secrets:
 
 from services.strava_api import StravaService
 from services.db import DatabaseService
+from services.db_cache import CachedDatabaseService
 from ui.state_manager import get_state
 
 # Initialize State
@@ -48,7 +49,7 @@ if state.dev_mode:
 strava_creds = Config.get_strava_creds()
 supa_creds = Config.get_supabase_creds()
 auth_svc = StravaService(strava_creds["client_id"], strava_creds["client_secret"])
-db_svc = DatabaseService(supa_creds["url"], supa_creds["key"])
+db_svc = CachedDatabaseService(DatabaseService(supa_creds.get("url"), supa_creds.get("key")))
 
 # --- 5. STATE ---
 # Initialize data only AFTER authentication
@@ -57,7 +58,7 @@ if not state.data:
         # Get athlete ID from token
         ath = state.strava_token.get("athlete", {})
         athlete_id = ath.get("id")
-        state.data = db_svc.get_history(athlete_id) if athlete_id else []
+        state.data = db_svc.get_history_summary(athlete_id) if athlete_id else []
     else:
         state.data = []
 
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline dell'archivio stream mmap (services/stream_archive.py): analisi
+(decoupling + EF) di uno storico pluriennale confrontando gli stream tenuti come liste
+Python in memoria (vecchio st.session_state.data) con le viste zero-copy sull'archivio.
+Riporta heap Python di picco (tracemalloc) e tempo.
+
+Uso: python -m benchmarks.bench_archive
+"""
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from engine.metrics import MetricsCalculator
+from services.stream_archive import StreamArchive
+
+N = 1000        # ~3 anni di corse
+SAMPLES = 3600
+
+def _streams(rng):
+    watts = np.clip(260 + rng.normal(0, 25, SAMPLES), 0, None).round().astype(int)
+    hr = np.clip(140 + np.linspace(0, 12, SAMPLES) + rng.normal(0, 2, SAMPLES), 60, 200).round().astype(int)
+    return watts, hr
+
+def _analyze(pairs):
+    return [(MetricsCalculator.calculate_decoupling(w, h), MetricsCalculator.calculate_efficiency_factor(w, h)["ef"]) for w, h in pairs]
+
+def main():
+    rng = np.random.default_rng(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = StreamArchive(tmp)
+        for i in range(N):
+            w, h = _streams(rng)
+            archive.append(1, i, i * 86400, {"watts": w, "hr": h})
+        print(f"Archivio: {archive.stats(1)['bytes'] / 1e6:.1f} MB su disco per {N} corse")
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        session = [{"raw_watts": v["watts"].tolist(), "raw_hr": v["hr"].tolist()} for _, _, v in archive.iter_views(1)]
+        res_lists = _analyze((r["raw_watts"], r["raw_hr"]) for r in session)
+        elapsed = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del session
+        print(f"Liste in sessione : heap di picco {peak / 1e6:8.1f} MB  {elapsed:6.2f} s")
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        res_views = _analyze((v["watts"], v["hr"]) for _, _, v in archive.iter_views(1))
+        elapsed = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"Viste mmap        : heap di picco {peak / 1e6:8.1f} MB  {elapsed:6.2f} s")
+        assert np.allclose(res_lists, res_views)
+
+if __name__ == "__main__":
+    main()
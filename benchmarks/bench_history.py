@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline del caricamento storico: get_history (select *, stream al secondo
+inclusi) contro get_history_summary (solo colonne scalari + details) su un client
+Supabase in memoria (tests/fake_supabase.py). Riporta byte JSON trasferiti e
+latenza di serializzazione + mapping + costruzione del DataFrame della dashboard.
+
+Uso: python -m benchmarks.bench_history
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pandas as pd
+
+from tests.test_history_summary import make_db, make_row
+
+N = 1000        # corse nello storico
+SAMPLES = 3600  # un'ora di stream al secondo per corsa
+
+def _measure(db, method):
+    # Il fake serializza la risposta in JSON come PostgREST: il tempo include la codifica
+    db.client.bytes_received = 0
+    t0 = time.perf_counter()
+    pd.DataFrame(getattr(db, method)(1))
+    return db.client.bytes_received, time.perf_counter() - t0
+
+def main():
+    rows = [make_row(i, f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T07:00:00", SAMPLES) for i in range(N)]
+    db = make_db(rows)
+    for method in ("get_history", "get_history_summary"):
+        size, elapsed = _measure(db, method)
+        print(f"{method:20s} {N} runs: {size / 1e6:8.2f} MB  {elapsed * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Benchmark del gaming feedback durante una sync iniziale: gaming_feedback sullo
+storico completo a ogni corsa (DataFrame + rolling, O(n²) sulla sync) contro
+InsightsState.push (finestre mobili incrementali, O(1) per corsa).
+
+Uso: python -m benchmarks.bench_insights
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from engine.core import ScoreEngine
+
+SIZES = (250, 1000, 2000)  # corse importate nella sync
+
+def main():
+    engine = ScoreEngine()
+    rng = np.random.default_rng(0)
+    for n in SIZES:
+        scores = rng.uniform(30, 100, n).round(2).tolist()
+
+        t0 = time.perf_counter()
+        history = []
+        for s in scores:
+            history.append(s)
+            engine.gaming_feedback(history)
+        batch = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        state = engine.insights_state()
+        for s in scores:
+            state.push(s)
+        incremental = time.perf_counter() - t0
+
+        print(f"{n:5d} corse: gaming_feedback {batch * 1000:9.1f} ms   InsightsState {incremental * 1000:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
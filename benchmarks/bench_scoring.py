@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark SCORE 4.1 (Dark Ritual).
+Confronta il path originale (benchmarks/legacy_scoring.py: json.load di bestwr.json
+ad ogni score) con quello attuale: latenza per chiamata con il registry condiviso e
+rescore di uno storico da 5k corse (loop originale, loop scalare attuale,
+compute_scores_batch).
+
+Uso: python -m benchmarks.bench_scoring
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from engine.metrics import RunMetrics, MeteoData
+from engine.scoring import ScoringSystem
+from benchmarks import legacy_scoring
+
+N = 5000
+
+def main():
+    scoring = ScoringSystem()
+    m = RunMetrics(250, 150, 10000, 2700, 50, 70, 185, 50, MeteoData(22, 65), 35, "M")
+    m.decoupling = 0.03
+
+    scoring.compute_score_v6_darkritual(m, 250 / 70, 1.0)  # warm-up registry
+
+    t_score = timeit.timeit(lambda: scoring.compute_score_v6_darkritual(m, 250 / 70, 1.0), number=N) / N
+    t_legacy = timeit.timeit(lambda: legacy_scoring.compute_score_v6_darkritual(m, 250 / 70, 1.0), number=N) / N
+
+    print(f"compute_score_v6_darkritual (registry): {t_score * 1e6:8.1f} µs/call")
+    print(f"original path (bestwr.json per call):   {t_legacy * 1e6:8.1f} µs/call")
+
+    # --- Rescore storico: scalare vs batch ---
+    rng = np.random.default_rng(0)
+    history = []
+    for _ in range(N):
+        h = RunMetrics(rng.uniform(180, 320), rng.uniform(130, 175), rng.uniform(3000, 42000),
+                       int(rng.uniform(900, 14000)), 0, 70, 185, 50,
+                       MeteoData(rng.uniform(0, 32), rng.uniform(30, 95)), 35, "M")
+        h.decoupling = rng.uniform(0, 0.1)
+        history.append(h)
+    frame = scoring.metrics_frame(history)
+
+    t_old = timeit.timeit(lambda: [legacy_scoring.compute_score_v6_darkritual(h, 250 / 70, 1.0) for h in history], number=1)
+    t_loop = timeit.timeit(lambda: [scoring.compute_score_v6_darkritual(h, 250 / 70, 1.0) for h in history], number=1)
+    t_batch = timeit.timeit(lambda: scoring.compute_scores_batch(frame, nominal_power=250 / 70), number=10) / 10
+    print(f"rescore {N} runs, original path:        {t_old * 1e3:8.1f} ms")
+    print(f"rescore {N} runs, scalar loop:          {t_loop * 1e3:8.1f} ms")
+    print(f"rescore {N} runs, compute_scores_batch: {t_batch * 1e3:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline del formato degli stream al secondo: JSON in raw_data (formato
+attuale) contro l'archivio colonnare (int16/uint8, delta + zlib) di services/stream_store.py.
+Riporta byte per corsa, tempo di encode e tempo di decode fino all'array NumPy.
+
+Uso: python -m benchmarks.bench_streams
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from services.stream_store import CHANNELS, decode_channel, encode_channel
+
+N = 200         # corse
+SAMPLES = 3600  # un'ora al secondo
+
+def _make_streams(rng):
+    # Potenza rumorosa attorno a un target, HR che deriva lentamente: profilo tipico di una corsa
+    watts = np.clip(260 + rng.normal(0, 25, SAMPLES), 0, None).round().astype(int).tolist()
+    hr = np.clip(135 + np.cumsum(rng.integers(-1, 2, SAMPLES)) / 8 + np.linspace(0, 15, SAMPLES), 60, 200).round().astype(int).tolist()
+    return {"watts": watts, "hr": hr}
+
+def main():
+    rng = np.random.default_rng(42)
+    runs = [_make_streams(rng) for _ in range(N)]
+
+    t0 = time.perf_counter()
+    blobs_json = [json.dumps(r) for r in runs]
+    t1 = time.perf_counter()
+    decoded = [json.loads(b) for b in blobs_json]
+    arrays = [(np.asarray(d["watts"]), np.asarray(d["hr"])) for d in decoded]
+    t2 = time.perf_counter()
+    json_bytes = sum(len(b) for b in blobs_json)
+    print(f"JSON raw_data  : {json_bytes / N / 1024:7.1f} KB/run  encode {(t1 - t0) / N * 1e3:6.3f} ms/run  "
+          f"decode->numpy {(t2 - t1) / N * 1e3:6.3f} ms/run")
+
+    t0 = time.perf_counter()
+    blobs_col = [{ch: encode_channel(r[ch], dt) for ch, dt in CHANNELS.items()} for r in runs]
+    t1 = time.perf_counter()
+    arrays = [{ch: decode_channel(b[ch], dt) for ch, dt in CHANNELS.items()} for b in blobs_col]
+    t2 = time.perf_counter()
+    col_bytes = sum(len(v) for b in blobs_col for v in b.values())
+    print(f"Stream store   : {col_bytes / N / 1024:7.1f} KB/run  encode {(t1 - t0) / N * 1e3:6.3f} ms/run  "
+          f"decode->numpy {(t2 - t1) / N * 1e3:6.3f} ms/run")
+    print(f"Riduzione: {json_bytes / col_bytes:.1f}x byte")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline della sync Strava contro il fake server locale (tests/fake_strava.py).
+Confronta il throughput di run_sync con un solo worker (equivalente al vecchio
+loop seriale, senza lo sleep di 0.5 s per corsa) e con il pool di Config.SYNC_WORKERS,
+riportando quante connessioni Strava sono state aperte rispetto alle richieste.
+
+Uso: python -m benchmarks.bench_sync
+"""
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from controllers.sync_controller import SyncController
+from services.http_pool import PooledSession
+from services.rate_limiter import StravaRateLimiter
+from services.strava_api import StravaService
+from tests.fake_strava import FakeStravaServer
+from tests.test_sync_concurrency import FakeSyncDB
+
+N = 50          # entro il budget streams: ogni corsa scarica streams + meteo
+LATENCY = 0.08  # secondi per richiesta (RTT tipico verso Strava/Open-Meteo)
+
+def _run(srv, workers: int):
+    session = PooledSession()
+    auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000), session=session)
+    ctrl = SyncController(auth, FakeSyncDB())
+    ctrl.workers = workers
+    with srv.patch_weather():
+        t0 = time.perf_counter()
+        count, _ = ctrl.run_sync("tok", 1, {}, [], [])
+        elapsed = time.perf_counter() - t0
+    assert count == N
+    return elapsed, session.stats()
+
+def main():
+    logging.disable(logging.CRITICAL)
+    with FakeStravaServer(n_activities=N, latency=LATENCY) as srv:
+        for workers in (1, Config.SYNC_WORKERS):
+            elapsed, conn = _run(srv, workers)
+            print(f"run_sync {N} runs, {workers:2d} worker(s): {elapsed:6.2f} s  ({N / elapsed:6.1f} runs/s)  "
+                  f"strava: {conn['requests']} req / {conn['connections_opened']} conn")
+
+if __name__ == "__main__":
+    main()
@@ -83,7 +83,7 @@ def render_top_section(auth_svc, db_svc):
                 st.session_state.filter_end_date = new_end
                 with st.spinner("Sync..."):
                     from controllers.sync_controller import SyncController
-                    SyncController(auth_svc, db_svc).sync_activities(max((datetime.now().date() - new_start).days, 1))
+                    SyncController(auth_svc, db_svc).sync_activities()
                 st.rerun()
             
             if st.button("⬅️ Reset", width='stretch'):
@@ -109,7 +109,9 @@ def render_top_section(auth_svc, db_svc):
         "hr_max": hr_max,
         "hr_rest": hr_rest,
         "age": age,
-        "sex": sex
+        "sex": sex,
+        # Zone FC del profilo: con l'FTP invalidano la cache delle metriche derivate
+        "hr_zones": saved_profile.get('hr_zones') if saved_profile else None
     }
     
     return phys_params, False, 0
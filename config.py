@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 
 class Config:
@@ -120,9 +121,10 @@ class Config:
         if not st.secrets.get("strava", {}).get("client_id"): missing.append("strava.client_id")
         if not st.secrets.get("strava", {}).get("client_secret"): missing.append("strava.client_secret")
         
-        # Supabase
-        if not st.secrets.get("supabase", {}).get("url"): missing.append("supabase.url")
-        if not st.secrets.get("supabase", {}).get("key"): missing.append("supabase.key")
+        # Supabase (non serve con il backend sqlite)
+        if Config.get_db_backend() != "sqlite":
+            if not st.secrets.get("supabase", {}).get("url"): missing.append("supabase.url")
+            if not st.secrets.get("supabase", {}).get("key"): missing.append("supabase.key")
         
         # Gemini (Optional but recommended)
         if not st.secrets.get("gemini", {}).get("api_key"): missing.append("gemini.api_key")
@@ -141,6 +143,26 @@ class Config:
     def get_gemini_key():
         return st.secrets.get("gemini", {}).get("api_key")
 
+    @staticmethod
+    def _database_setting(env: str, key: str):
+        """Variabile d'ambiente, poi [database] nei secrets; None se assente (anche senza secrets.toml)."""
+        if os.environ.get(env):
+            return os.environ[env]
+        try:
+            return st.secrets.get("database", {}).get(key)
+        except Exception:
+            return None
+
+    @staticmethod
+    def get_db_backend() -> str:
+        """Backend DB: SCORE_DB_BACKEND, poi secrets database.backend, poi DB_BACKEND."""
+        return str(Config._database_setting("SCORE_DB_BACKEND", "backend") or Config.DB_BACKEND).lower()
+
+    @staticmethod
+    def get_local_db_path():
+        """File del backend sqlite: SCORE_LOCAL_DB_PATH, poi secrets database.path, poi LOCAL_DB_PATH."""
+        return Config._database_setting("SCORE_LOCAL_DB_PATH", "path") or Config.LOCAL_DB_PATH
+
     # --- LOGGING ---
     @staticmethod
     def setup_logging():
@@ -157,6 +179,24 @@ class Config:
     # --- EXTERNAL SERVICES ---
     OPEN_METEO_URL = "https://archive-api.open-meteo.com/v1/archive"
     STRAVA_BASE_URL = "https://www.strava.com/api/v3"
+    SYNC_WORKERS = 8  # Fetch paralleli (streams + meteo) durante la sync
+    DB_BATCH_SIZE = 50      # Righe per upsert massivo delle corse
+    DB_FLUSH_SEC = 5.0      # Flush del buffer corse in sync anche sotto DB_BATCH_SIZE
+    DB_PAGE_SIZE = 500      # Righe per pagina keyset (sotto il tetto max-rows di PostgREST)
+    DB_BACKEND = "supabase" # Default di get_db_backend: "supabase" | "sqlite" (backend embedded offline, services/local_db.py)
+    LOCAL_DB_PATH = None    # Default di get_local_db_path (None = .cache/score.sqlite)
+    # TTL (s) delle letture memorizzate da CachedDatabaseService; le scritture le invalidano subito
+    DB_CACHE_TTL = {
+        "get_athlete_profile": 300,
+        "get_history": 120,
+        "get_history_summary": 120,
+        "get_run_ids_for_athlete": 120,
+        "get_athlete_baselines": 300,
+        "get_athlete_baseline": 300,
+        "get_score_trend": 120,
+        "get_weekly_stats": 120,
+        "get_monthly_stats": 120,
+    }
 
     # --- ALGORITHM TUNING ---
     SCALING_FACTOR = 280.0
@@ -168,6 +208,9 @@ class Config:
     SCORE_GAMMA = 2.0
     SCORE_W_REF = 6.0
     W_REF = 6.0
+
+    # Training load (ATL/CTL/TSB): metrica di carico giornaliero, "trimp" (FC) o "tss" (potenza)
+    TRAINING_LOAD_METRIC = "trimp"
     
     # --- DEV MODE ---
     DEV_IDS = {12345678, 59049495} # Saverio's ID added
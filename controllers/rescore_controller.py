@@ -0,0 +1,203 @@
+import logging
+import re
+from typing import Dict, Any, List, Optional, Callable
+import pandas as pd
+from config import Config
+from engine.core import ScoreEngine
+from engine.metrics import MetricsCalculator
+
+logger = logging.getLogger("sCore.Rescore")
+
+_METEO_TEMP = re.compile(r"(-?\d+(?:\.\d+)?)\s*°C")
+_METEO_HUM = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+
+class RescoreController:
+    """
+    Ricalcola lo storico di un atleta quando cambia Config.ENGINE_VERSION.
+    Legge le corse dal DB a pagine, usa gli stream salvati (archivio o raw_data) e il
+    batch scorer, riscrive solo le righe cambiate (upsert massivo) e registra
+    ogni ricalcolo in score_replay. Nessuna chiamata Strava o meteo.
+    """
+    def __init__(self, db_svc, engine: Optional[ScoreEngine] = None):
+        self.db = db_svc
+        self.engine = engine or ScoreEngine()
+
+    def needs_rescore(self, athlete_id: int) -> bool:
+        return self.db.count_stale_runs(athlete_id, Config.ENGINE_VERSION) > 0
+
+    def run(self, athlete_id: int, page_size: int = 200, resume: bool = True,
+            progress_cb: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Esegue (o riprende) il rescore. Ritorna {"processed", "updated", "resumed"}.
+        progress_cb(processed, updated) viene chiamata dopo ogni pagina.
+        """
+        target = Config.ENGINE_VERSION
+        checkpoint = self.db.get_rescore_checkpoint(athlete_id) if resume else None
+        resumed = bool(checkpoint and checkpoint.get("status") == "running" and checkpoint.get("target_version") == target)
+
+        state = {
+            "athlete_id": athlete_id,
+            "target_version": target,
+            "status": "running",
+            "last_run_id": checkpoint.get("last_run_id") if resumed else None,
+            "processed": checkpoint.get("processed", 0) if resumed else 0,
+            "updated": checkpoint.get("updated", 0) if resumed else 0
+        }
+        if resumed:
+            logger.info(f"♻️ Resuming rescore for {athlete_id} after run {state['last_run_id']}")
+
+        params = self._athlete_params(athlete_id)
+
+        pages = self.db.iter_rescore_pages(athlete_id, after_id=state["last_run_id"], page_size=page_size)
+        while True:
+            try:
+                rows = next(pages, None)
+            except Exception as e:
+                # Checkpoint invariato: si riprende dall'ultima pagina salvata
+                logger.error(f"Rescore aborted for {athlete_id} after run {state['last_run_id']}: {e}")
+                return {"processed": state["processed"], "updated": state["updated"], "resumed": resumed, "error": "read failed"}
+            if not rows:
+                break
+
+            updates, replays = self._rescore_page(rows, params, target)
+            if updates and not self.db.save_rescored_runs(updates):
+                # Checkpoint invariato: la pagina verrà ripresa al prossimo run
+                logger.error(f"Rescore aborted for {athlete_id} at run {rows[0]['id']}")
+                return {"processed": state["processed"], "updated": state["updated"], "resumed": resumed, "error": "write failed"}
+            self.db.save_replays(replays)
+
+            state["last_run_id"] = rows[-1]["id"]
+            state["processed"] += len(rows)
+            state["updated"] += len(updates)
+            self.db.save_rescore_checkpoint(state)
+
+            if progress_cb:
+                progress_cb(state["processed"], state["updated"])
+
+        state["status"] = "done"
+        self.db.save_rescore_checkpoint(state)
+        logger.info(f"✅ Rescore {athlete_id} -> v{target}: {state['updated']}/{state['processed']} runs updated")
+        return {"processed": state["processed"], "updated": state["updated"], "resumed": resumed}
+
+    def _athlete_params(self, athlete_id: int) -> Dict[str, Any]:
+        profile = self.db.get_athlete_profile(athlete_id) or {}
+        weight = profile.get("weight") or Config.DEFAULT_WEIGHT
+        ftp = profile.get("ftp") or Config.DEFAULT_FTP
+        return {
+            "weight": weight,
+            "hr_max": profile.get("hr_max") or Config.DEFAULT_HR_MAX,
+            "hr_rest": profile.get("hr_rest") or Config.DEFAULT_HR_REST,
+            "age": profile.get("age") or Config.DEFAULT_AGE,
+            "sex": profile.get("sex") or "M",
+            # Stessa nominal power di SyncController.run_sync
+            "nominal_power": (ftp / weight) if weight > 0 else 3.0
+        }
+
+    @staticmethod
+    def _run_inputs(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Input dello score da una riga 'runs': raw_data.inputs se presente, altrimenti colonne legacy."""
+        raw = row.get("raw_data") or {}
+        inputs = raw.get("inputs") or {}
+        # Stream dall'archivio colonnare se presenti, altrimenti JSON legacy in raw_data
+        streams = row.get("streams") or raw
+        watts = streams.get("watts")
+        hr = streams.get("hr")
+        watts = watts if watts is not None else []
+        hr = hr if hr is not None else []
+
+        temp, hum = inputs.get("temp"), inputs.get("humidity")
+        if temp is None or hum is None:
+            meteo = row.get("meteo_desc") or ""
+            m_t, m_h = _METEO_TEMP.search(meteo), _METEO_HUM.search(meteo)
+            if temp is None: temp = float(m_t.group(1)) if m_t else 20.0
+            if hum is None: hum = float(m_h.group(1)) if m_h else 50.0
+
+        # Drift ricalcolato dagli stream salvati (la colonna è arrotondata in %)
+        if len(watts) and len(hr):
+            decoupling = MetricsCalculator.calculate_decoupling(watts, hr)
+        else:
+            decoupling = inputs.get("decoupling", (row.get("decoupling") or 0.0) / 100)
+
+        # Medie del summary; se mancano, quelle ripulite dagli stream (come in sync)
+        power, avg_hr = row.get("avg_power") or 0, row.get("avg_hr") or 0
+        if (not power or not avg_hr) and len(watts) and len(hr):
+            stats = MetricsCalculator.calculate_stream_stats(watts, hr)
+            power = power or stats["avg_power_clean"]
+            avg_hr = avg_hr or stats["avg_hr_clean"]
+
+        return {
+            "power": power,
+            "hr": avg_hr,
+            "distance": inputs.get("distance_m") or (row.get("distance_km") or 0) * 1000,
+            "moving_time": inputs.get("moving_time") or row.get("duration_sec") or len(watts),
+            "temp": temp,
+            "humidity": hum,
+            "decoupling": decoupling
+        }
+
+    def _rescore_page(self, rows: List[Dict[str, Any]], params: Dict[str, Any], target: str):
+        frame = pd.DataFrame([self._run_inputs(r) for r in rows])
+        for key in ("weight", "hr_max", "hr_rest", "age", "sex"):
+            frame[key] = params[key]
+
+        # Corse senza tempo utile: non ricalcolabili, score invariato ma marcate con la versione
+        # corrente, altrimenti count_stale_runs non scende mai a zero e il rescore riparte a ogni sync
+        valid = frame["moving_time"] > 0
+        batch = self.engine.compute_scores_batch(frame[valid], nominal_power=params["nominal_power"], target_hr_eff=1.0)
+
+        updates, replays = [], []
+        for i in frame.index[~valid]:
+            row = rows[i]
+            if row.get("score_version") != target:
+                updates.append(dict({k: row.get(k) for k in ("id", "athlete_id", "date", "score", "decoupling",
+                                                           "wcf", "rank", "quality", "raw_data")},
+                                    score_version=target))
+        for i, b in batch.iterrows():
+            row, inp = rows[i], frame.loc[i]
+            score = round(float(b["score"]), 2)
+            dec_pct = round(float(inp["decoupling"]) * 100, 1)
+            unchanged = (
+                row.get("score_version") == target
+                and row.get("score") is not None and round(float(row["score"]), 2) == score
+                and row.get("decoupling") == dec_pct
+            )
+            if unchanged:
+                continue
+
+            details = self.engine.scoring.batch_details(b)
+            raw = dict(row.get("raw_data") or {})
+            target_t_adj = (raw.get("details") or {}).get("Target T_adj")
+            w_kg = float(inp["power"]) / params["weight"] if params["weight"] > 0 else 0.0
+            raw["details"] = self.engine.score_detail(w_kg, details, target_t_adj if isinstance(target_t_adj, (int, float)) else None)
+            raw["inputs"] = {
+                "moving_time": int(inp["moving_time"]),
+                "distance_m": float(inp["distance"]),
+                "temp": float(inp["temp"]),
+                "humidity": float(inp["humidity"]),
+                "decoupling": float(inp["decoupling"])
+            }
+            rank, _ = self.engine.get_rank(score)
+
+            updates.append({
+                "id": row["id"],
+                "athlete_id": row["athlete_id"],
+                "date": row["date"],
+                "score": score,
+                "decoupling": dec_pct,
+                "wcf": round(details["wcf"], 2),
+                "rank": rank,
+                "quality": self.engine.run_quality(score).get("label"),
+                "score_version": target,
+                "raw_data": raw
+            })
+            replays.append({
+                "run_id": row["id"],
+                "athlete_id": row["athlete_id"],
+                "score_version": target,
+                "score": score,
+                "decoupling": float(inp["decoupling"]),
+                "wcf": details["wcf"],
+                "tref_sec": details["T_ref"],
+                "details": dict(details, previous_score=row.get("score"), previous_version=row.get("score_version"))
+            })
+        return updates, replays
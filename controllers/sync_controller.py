@@ -1,22 +1,65 @@
 import streamlit as st
 import logging
 import time
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
 from config import Config
 from engine.core import ScoreEngine, RunMetrics
+from engine.training_load import run_load
 from services.meteo_svc import WeatherService
+from services.strava_api import activity_epoch
 
 # Initialize logger at module level
 logger = logging.getLogger("sCore.Sync")
 
+# Richieste Strava lasciate libere quando si decide quante corse scaricano gli streams
+STREAM_BUDGET_RESERVE = 10
+
+class RunWriter:
+    """
+    Buffer delle corse elaborate in sync: upsert massivo (save_runs_bulk) quando il buffer
+    raggiunge chunk_size corse o sono passati flush_sec secondi dall'ultimo flush.
+    """
+    def __init__(self, db, athlete_id: int, chunk_size: Optional[int] = None, flush_sec: Optional[float] = None):
+        self.db = db
+        self.athlete_id = athlete_id
+        self.chunk_size = chunk_size or Config.DB_BATCH_SIZE
+        self.flush_sec = Config.DB_FLUSH_SEC if flush_sec is None else flush_sec
+        self.buffer: List[Dict[str, Any]] = []
+        self.saved: List[Dict[str, Any]] = []
+        self.failed: Dict[Any, str] = {}
+        self.last_flush = time.monotonic()
+
+    def add(self, run_obj: Dict[str, Any]):
+        self.buffer.append(run_obj)
+        if len(self.buffer) >= self.chunk_size or time.monotonic() - self.last_flush >= self.flush_sec:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        result = self.db.save_runs_bulk(batch, self.athlete_id, self.chunk_size)
+        saved_ids = set(result["saved"])
+        for run_obj in batch:
+            if run_obj["id"] in saved_ids:
+                self.saved.append(run_obj)
+                logger.info(f"✅ Saved run {run_obj['id']}: SCORE={run_obj['SCORE']:.1f}, Rank={run_obj['Rank']}")
+            else:
+                self.failed[run_obj["id"]] = result["failed"].get(run_obj["id"], "not saved")
+                logger.error(f"❌ Failed to save run {run_obj['id']}")
+
 class SyncController:
     def __init__(self, auth_svc, db_svc):
         self.auth = auth_svc
         self.db = db_svc
         self.engine = ScoreEngine()
+        # Worker per il fetch parallelo di streams e meteo
+        self.workers = Config.SYNC_WORKERS
 
-    def sync_activities(self, days_lookback: int) -> Dict[str, Any]:
+    def sync_activities(self, mode: str = "incremental") -> Dict[str, Any]:
         """
         Orchestra la sincronizzazione recuperando automaticamente i parametri necessari.
         """
@@ -128,24 +171,39 @@ class SyncController:
                  logger.error(f"Error syncing zones: {e}")
 
              # History Scores per gaming
-             history = [r['SCORE'] for r in self.db.get_history(athlete_id) if 'SCORE' in r]
+             history = [r['SCORE'] for r in self.db.get_history_summary(athlete_id) if 'SCORE' in r]
              
              # Esegui sync
              new_count, msg = self.run_sync(
-                 token, athlete_id, phys_params, days_lookback, 
-                 existing_ids, history
+                 token, athlete_id, phys_params,
+                 existing_ids, history, mode=mode
              )
              
-             return {"new": new_count, "api_msg": msg}
+             # --- RESCORE (corse calcolate con un ENGINE_VERSION precedente) ---
+             rescored = 0
+             try:
+                 from controllers.rescore_controller import RescoreController
+                 rescorer = RescoreController(self.db, self.engine)
+                 if rescorer.needs_rescore(athlete_id):
+                     rescored = rescorer.run(athlete_id).get("updated", 0)
+             except Exception as e:
+                 logger.error(f"Rescore failed: {e}")
+             
+             return {"new": new_count, "api_msg": msg, "rescored": rescored}
              
         except Exception as e:
             print(f"Sync Error: {e}")
             return {"new": 0, "error": str(e)}
 
-    def run_sync(self, token, athlete_id, physical_params, days_back, existing_ids, history_scores, progress_bar=None, last_import_timestamp=None):
+    def run_sync(self, token, athlete_id, physical_params, existing_ids, history_scores, progress_bar=None, last_import_timestamp=None, mode: str = "incremental"):
         """
         Esegue la sync. Ritona (count_new, message).
         history_scores: lista di float degli score precedenti (per calcolo gaming)
+        mode: "incremental" (attività dopo l'ultima importata, after=, più una tornata di
+              backfill finché lo storico non è tutto importato) oppure "backfill" (solo storico
+              all'indietro, before=). Senza cursore si parte dal backfill.
+        Nessuna finestra in giorni: cosa importare lo decide il cursore (un cutoff scarterebbe il backfill).
+        Ritorna (-1, messaggio) se Strava non risponde.
         """
         weight = physical_params.get('weight', Config.DEFAULT_WEIGHT)
         # Default Params from config first
@@ -165,10 +223,12 @@ class SyncController:
             if profile.get('sex'): sex = profile.get('sex')
             if profile.get('age'): age = profile.get('age')
 
-        # --- 1. FETCH SEMPLIFICATO (SOLUZIONE DEFINITIVA) ---
-
-        # --- 1. FETCH SEMPLIFICATO (SOLUZIONE DEFINITIVA) ---
-        activities_list = self.auth.fetch_all_activities_simple(token)
+        # --- 1. FETCH INCREMENTALE (cursori after/before) ---
+        cursor = self.db.get_sync_cursor(athlete_id)
+        new_activities, backfill, cursor = self._fetch_activity_list(token, cursor, mode)
+        if new_activities is None:
+            return -1, "Errore nel recupero attività da Strava"
+        activities_list = new_activities + backfill
         
         # Debug Temporaneo / Dev Console
         try:
@@ -182,57 +242,41 @@ class SyncController:
         except: pass
         
         if not activities_list:
-             return -1, "Nessuna attività trovata"
+             self.db.save_sync_cursor(athlete_id, cursor)
+             return (0, "Nessuna nuova attività") if cursor.get("last_activity_at") else (-1, "Nessuna attività trovata")
 
         # FIX ORDER: Strava returns Newest-First. We need Oldest-First for Gaming History.
         activities_list.sort(key=lambda x: x['start_date_local'])
 
-        count_new = 0
-        total = len(activities_list)
+        # Corse elaborate scritte a blocchi (chunk o tempo) invece di un upsert per corsa
+        writer = RunWriter(self.db, athlete_id)
         
-        # Local copy of history
-        current_history = list(history_scores)
+        # Baseline T_adj per distanza: lette una volta, aggiornate localmente (min), scritte a fine sync
+        stored_baselines = self.db.get_athlete_baselines(athlete_id)
+        baselines = dict(stored_baselines)
+        run_t_adj = {}  # id corsa -> (distanza, T_adj): su DB vanno solo quelle delle corse salvate
+
+        # Stato incrementale del gaming feedback (MA7/MA28, volatilità, achievements) sullo storico
+        insights = self.engine.insights_state(history_scores)
 
         # FIX TYPE MISMATCH: Ensure all are strings
         existing_ids_str = set(str(eid) for eid in existing_ids)
         
-        # Cutoff Date (Filtro post-fetch)
-        # For initial sync (no existing runs), load everything. For updates, use cutoff.
-        from datetime import timedelta
-        is_initial_sync = len(existing_ids_str) == 0
-        cutoff = None if is_initial_sync else datetime.now() - timedelta(days=days_back)
-        
-        if is_initial_sync:
-            logger.info("🔄 Initial sync detected - loading ALL historical activities")
-        else:
-            logger.info(f"🔄 Update sync - checking activities from last {days_back} days")
-        
-        # --- SAFE SYNC LOGIC (DROP-IN) ---
-        # --- SAFE SYNC LOGIC (DROP-IN) ---
-        MAX_STREAMS = 50 # Increased cap for historical analysis
-        RETRY = 3
-        RETRY = 3
-        stream_count = 0
-
-        stream_count = 0
+        # Nessun cutoff per data: il cursore garantisce che ogni attività arrivi una sola volta
+        # (un cutoff perderebbe per sempre quelle fuori finestra, backfill compreso)
+        logger.info(f"🔄 Sync: {len(new_activities)} new + {len(backfill)} backfill activities")
 
-        for i, s in enumerate(activities_list):
-            if progress_bar:
-                progress_bar.progress((i + 1) / total)
-            
-            # --- 1. BASIC FILTERS ---
+        # --- 2. SELEZIONE CANDIDATI (ordine cronologico) ---
+        candidates = []
+        for s in activities_list:
             # Solo Corsa (case-insensitive)
             activity_type = (s.get('type') or '').lower()
             if activity_type != 'run': 
                 logger.info(f"Skipping activity {s.get('id')}: Not a Run (type={s.get('type')})")
                 continue
 
-            # Date Filter (skip only if cutoff is set)
             try:
                 dt = datetime.strptime(s['start_date_local'], "%Y-%m-%dT%H:%M:%SZ")
-                if cutoff is not None and dt < cutoff:
-                    logger.info(f"Skipping activity {s.get('id')}: Before cutoff date")
-                    continue
             except Exception as e:
                 logger.warning(f"Skipping activity {s.get('id')}: Date parse error - {e}")
                 continue
@@ -251,161 +295,282 @@ class SyncController:
                 logger.warning(f"Skipping activity {s.get('id')}: Too short (moving_time < 60s)")
                 continue
             
-            logger.info(f"Processing activity {s.get('id')} - {s.get('name', 'Untitled')}")
-            
-            # --- 2. FETCH STREAMS (con fallback) ---
-            watts_stream = []
-            hr_stream = []
-            
-            # Scarichiamo streams solo per le prime N attività (Anti-Ban)
-            if stream_count < MAX_STREAMS:
-                for r in range(RETRY):
-                    try:
-                         # Fetch streams con backoff
-                         st_raw = self.auth.fetch_streams(token, s['id'])
-                         if st_raw:
-                             watts_stream = st_raw.get('watts', {}).get('data', [])
-                             hr_stream = st_raw.get('heartrate', {}).get('data', [])
-                             stream_count += 1
-                             logger.info(f"Streams fetched for {s['id']}: {len(watts_stream)} watts, {len(hr_stream)} HR")
-                             break
-                    except Exception as e:
-                         logger.warning(f"Stream fetch attempt {r+1} failed for {s['id']}: {e}")
-                         time.sleep(2 ** (r + 1))
-            else:
-                logger.info(f"Stream limit reached ({MAX_STREAMS}), using summary data only for {s['id']}")
-            
-            # Fallback: se mancano streams, usa i dati summary di Strava
-            avg_power = s.get('average_watts', 0) or 0
-            avg_hr = s.get('average_heartrate', 0) or 0
-            
-            # Se NON ci sono dati summary e nemmeno streams, skippa
-            if avg_power == 0 and avg_hr == 0 and not watts_stream and not hr_stream:
-                logger.warning(f"Skipping {s['id']}: No power or HR data (summary or streams)")
-                continue
-            
-            # --- 3. BUILD RUN OBJECT (ROBUST) ---
-            # Meteo (Optional)
-            t, h, is_real = 20.0, 50.0, False 
-            
-            # Safely extract LatLng
-            latlng = s.get('start_latlng')
-            if latlng and isinstance(latlng, list) and len(latlng) == 2:
-                 try:
-                    # Date YYYY-MM-DD logic
-                    date_iso = dt.strftime("%Y-%m-%d")
-                    t, h, is_real = WeatherService.get_weather(latlng[0], latlng[1], date_iso, dt.hour)
-                    logger.info(f"Weather for {s['id']}: {t}°C, {h}% (real={is_real})")
-                 except Exception as e: 
-                    logger.warning(f"Weather fetch failed for {s['id']}: {e}")
-                    pass
-
-            # Create MeteoData object
-            from engine.metrics import MeteoData
-            meteo_data = MeteoData(temperature=t, humidity=h, is_real=is_real)
-
-            m = RunMetrics(
-                avg_power,
-                avg_hr,
-                s.get('distance', 0),
-                s.get('moving_time', 0),
-                s.get('total_elevation_gain', 0),
-                weight, hr_max, hr_rest,
-                meteo_data,  # Pass MeteoData object instead of t, h
-                age, sex
-            )
-
-            # Drift & Score
-            dec = self.engine.calculate_decoupling(watts_stream, hr_stream)
-            m.decoupling = dec
+            candidates.append((s, dt))
+
+        # --- 3. FETCH CONCORRENTE (streams + meteo) ---
+        # I worker scaricano in parallelo (limitati dal token bucket di StravaService),
+        # lo scoring consuma i risultati in ordine: la history di gaming è oldest-first.
+        # Streams solo finché c'è budget Strava nella finestra corrente (Anti-Ban),
+        # tenendo una riserva per le altre chiamate della sessione.
+        stream_budget = max(0, self.auth.limiter.remaining() - STREAM_BUDGET_RESERVE)
+        stream_count = 0
+        total = len(candidates)
+        pool = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="sCore-sync")
+        try:
+            # Meteo in batch (una richiesta a intervallo per cella) in parallelo agli streams
+            weather_future = pool.submit(self._fetch_weather_batch, candidates)
+            futures = [
+                pool.submit(self._fetch_activity_data, token, s, dt, idx < stream_budget)
+                for idx, (s, dt) in enumerate(candidates)
+            ]
+            weather = None
+
+            for i, ((s, dt), future) in enumerate(zip(candidates, futures)):
+                if progress_bar:
+                    progress_bar.progress((i + 1) / total)
+
+                fetched = future.result()
+                if fetched is None:
+                    continue
+                
+                if weather is None:
+                    weather = weather_future.result()
+                
+                logger.info(f"Processing activity {s.get('id')} - {s.get('name', 'Untitled')}")
+                watts_stream, hr_stream = fetched["watts"], fetched["hr"]
+                t, h, is_real = weather[i]
+                if fetched["has_streams"]:
+                    stream_count += 1
+                
+                # Fallback: se mancano streams, usa i dati summary di Strava
+                avg_power = s.get('average_watts', 0) or 0
+                avg_hr = s.get('average_heartrate', 0) or 0
+                
+                # Create MeteoData object
+                from engine.metrics import MeteoData
+                meteo_data = MeteoData(temperature=t, humidity=h, is_real=is_real)
+
+                m = RunMetrics(
+                    avg_power,
+                    avg_hr,
+                    s.get('distance', 0),
+                    s.get('moving_time', 0),
+                    s.get('total_elevation_gain', 0),
+                    weight, hr_max, hr_rest,
+                    meteo_data,  # Pass MeteoData object instead of t, h
+                    age, sex
+                )
+                # NP / VI / IF, medie ripulite, cadenza e pendenza dagli stream (un solo passaggio)
+                m.apply_stream_stats(self.engine.calculate_stream_stats(
+                    watts_stream, hr_stream, ftp, fetched["cadence"], fetched["grade"]
+                ))
+
+                # Drift & Score
+                dec = self.engine.calculate_decoupling(watts_stream, hr_stream)
+                m.decoupling = dec
             
-            # --- v6 IMPLEMENTATION & BASELINE UPDATE ---
-            # 1. Calcolo T_adj (Logic v5 per baseline)
-            current_t_adj = self.engine.calculate_t_adj(m)
-            dist_label = m.dist_label
+                # --- v6 IMPLEMENTATION & BASELINE UPDATE ---
+                # 1. Calcolo T_adj (Logic v5 per baseline)
+                current_t_adj = self.engine.calculate_t_adj(m)
+                dist_label = m.dist_label
             
-            # 2. Aggiornamento Baseline (Se improvement)
-            self.db.update_athlete_baseline(athlete_id, dist_label, current_t_adj)
+                # 2. Aggiornamento Baseline (Se improvement), in memoria fino al flush di fine sync
+                run_t_adj[s['id']] = (dist_label, current_t_adj)
+                if dist_label not in baselines or current_t_adj < baselines[dist_label]:
+                    baselines[dist_label] = current_t_adj
             
-            # 3. Calcolo Score v6 Darkritual (Competitive Efficiency Index)
-            # Nominal Power (W/kg) = FTP / Weight. Fallback to 3.0 W/kg if weight is missing
-            nominal_pwr_kg = (ftp / weight) if weight > 0 else 3.0
+                # 3. Calcolo Score v6 Darkritual (Competitive Efficiency Index)
+                # Nominal Power (W/kg) = FTP / Weight. Fallback to 3.0 W/kg if weight is missing
+                nominal_pwr_kg = (ftp / weight) if weight > 0 else 3.0
             
-            # Target HR Eff. Assuming default 1.0 (Parity)
-            # Recupero Baseline PRIMA dello score per passarlo alla funzione (Richiesta User)
-            db_baseline_pre = self.db.get_athlete_baseline(athlete_id, dist_label)
+                # Target HR Eff. Assuming default 1.0 (Parity)
+                # Recupero Baseline PRIMA dello score per passarlo alla funzione (Richiesta User)
+                db_baseline_pre = baselines.get(dist_label)
             
-            # DARKRITUAL: Competitive score with WR comparison
-            score, details = self.engine.compute_score_v6_darkritual_wrapper(
-                m, 
-                nominal_power=nominal_pwr_kg, 
-                target_hr_eff=1.0,
-                athlete_level="intermediate",  # TODO: make dynamic from DB profile
-                db_baseline_adj=db_baseline_pre
-            )
+                # DARKRITUAL: Competitive score with WR comparison
+                score, details = self.engine.compute_score_v6_darkritual_wrapper(
+                    m, 
+                    nominal_power=nominal_pwr_kg, 
+                    target_hr_eff=1.0,
+                    athlete_level="intermediate",  # TODO: make dynamic from DB profile
+                    db_baseline_adj=db_baseline_pre
+                )
             
-            # UI Helpers & Gaming
-            rnk, _ = self.engine.get_rank(score)
-            quality = self.engine.run_quality(score)
+                # UI Helpers & Gaming
+                rnk, _ = self.engine.get_rank(score)
+                quality = self.engine.run_quality(score)
             
-            # Update History
-            current_history.append(score)
-            gaming = self.engine.gaming_feedback(current_history)
+                # Update History (O(1) per corsa)
+                gaming = insights.push(score)
 
-            # Reconstruct details for UI
-            db_baseline = self.db.get_athlete_baseline(athlete_id, dist_label)
+                # Reconstruct details for UI (la baseline non cambia durante lo scoring)
+                db_baseline = db_baseline_pre
             
-            run_obj = {
-                "id": s['id'],
-                "name": s.get('name', 'Untitled Run'),  # NEW: activity name from Strava
-                "Data": dt.strftime("%Y-%m-%d"),
-                "Dist (km)": round(m.distance_meters / 1000, 2),
-                "Power": int(m.avg_power),
-                "HR": int(m.avg_hr),
-                "Decoupling": round(dec * 100, 1),
-                "SCORE": round(score, 2),
-                "WCF": round(details['wcf'], 2), 
-                "WR_Pct": 0.0, # Deprecated in v5
-                "Rank": rnk,
-                "Quality": quality,
-                "Meteo": f"{t}°C", 
-                "SCORE_DETAIL": {
-                    "W/kg": round(m.w_kg, 2),
-                    "Nominal": round(details['nominal_pwr'], 2),
-                    "Mech Eff": round(details['mech_eff'], 2),
-                    "Metabolic Eff": round(details['metabolic_eff'], 2),
-                    "WCF": round(details['wcf'], 2),
-                    "Stability": round(details['stability'], 2),
-                    "Target T_adj": round(db_baseline, 1) if db_baseline else "N/A"
-                },
-                "Device": s.get("device_name", "Unknown"),
-                "raw_watts": watts_stream,
-                "raw_hr": hr_stream,
-                "Achievements": gaming["achievements"],
-                "Trend": gaming["trend"],
-                "Comparison": gaming["comparison"],
-                "is_weather_real": is_real
-            }
-
-            if self.db.save_run(run_obj, athlete_id):
-                count_new += 1
-                logger.info(f"✅ Saved run {s['id']}: SCORE={score:.1f}, Rank={rnk}")
-            else:
-                logger.error(f"❌ Failed to save run {s['id']}")
-            
-            # Simpler rate limit sleep
-            time.sleep(0.5)
+                run_obj = {
+                    "id": s['id'],
+                    "name": s.get('name', 'Untitled Run'),  # NEW: activity name from Strava
+                    "Data": dt.strftime("%Y-%m-%d"),
+                    "Moving Time": m.moving_time,
+                    "Dist (km)": round(m.distance_meters / 1000, 2),
+                    "Power": int(m.avg_power),
+                    "HR": int(m.avg_hr),
+                    "Decoupling": round(dec * 100, 1),
+                    "SCORE": round(score, 2),
+                    "WCF": round(details['wcf'], 2), 
+                    "WR_Pct": 0.0, # Deprecated in v5
+                    "Rank": rnk,
+                    "Quality": quality,
+                    "Meteo": f"{t}°C", 
+                    "SCORE_DETAIL": self.engine.score_detail(m.w_kg, details, db_baseline),
+                    "SCORE_INPUTS": {
+                        "moving_time": m.moving_time,
+                        "distance_m": m.distance_meters,
+                        "temp": t,
+                        "humidity": h,
+                        "decoupling": dec,
+                        "normalized_power": round(m.normalized_power, 1),
+                        "variability_index": round(m.variability_index, 3),
+                        "intensity_factor": round(m.intensity_factor, 3),
+                        "avg_cadence": round(m.avg_cadence, 1),
+                        "avg_grade": round(m.avg_grade, 2)
+                    },
+                    "Load": run_load(watts_stream, hr_stream, hr_max, hr_rest, ftp, sex,
+                                     avg_hr=m.avg_hr, duration_sec=m.moving_time),
+                    "Device": s.get("device_name", "Unknown"),
+                    "raw_watts": watts_stream,
+                    "raw_hr": hr_stream,
+                    "Achievements": gaming["achievements"],
+                    "Trend": gaming["trend"],
+                    "Comparison": gaming["comparison"],
+                    "is_weather_real": is_real
+                }
+
+                writer.add(run_obj)
+        except Exception as e:
+            logger.error(f"Sync interrotta dopo {len(run_t_adj)}/{total} corse elaborate, salvo quelle completate: {e}")
+            raise
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            writer.flush()
+            # Un solo upsert per le baseline migliorate dalle corse effettivamente salvate
+            improved = {}
+            for run in writer.saved:
+                dist_label, t_adj = run_t_adj[run['id']]
+                if t_adj < improved.get(dist_label, stored_baselines.get(dist_label, float("inf"))):
+                    improved[dist_label] = t_adj
+            if improved:
+                self.db.save_athlete_baselines(athlete_id, improved)
+
+        count_new = len(writer.saved)
+        failed = [s for s, _ in candidates if s['id'] in writer.failed]
+        # TRIMP/TSS delle corse salvate, applicati al modello ATL/CTL/TSB
+        new_loads = [{"date": r["Data"], **r["Load"]} for r in writer.saved]
+
+        # I cursori non superano le corse non salvate: verranno ripescate dalla prossima sync
+        backfill_ids = {a['id'] for a in backfill}
+        failed_new = [activity_epoch(a) for a in failed if a['id'] not in backfill_ids]
+        failed_old = [activity_epoch(a) for a in failed if a['id'] in backfill_ids]
+        if failed_new and cursor.get("last_activity_at"):
+            cursor["last_activity_at"] = min(cursor["last_activity_at"], min(failed_new) - 1)
+        if failed_old:
+            cursor["backfill_before"] = max(cursor.get("backfill_before") or 0, max(failed_old) + 1)
+            cursor["backfill_done"] = False
+        self.db.save_sync_cursor(athlete_id, cursor)
 
         if count_new > 0:
             self.db.update_streak(athlete_id)
+
+            try:
+                from controllers.training_load_controller import TrainingLoadController
+                TrainingLoadController(self.db).apply(athlete_id, new_loads)
+            except Exception as e:
+                logger.error(f"Training load update failed: {e}")
             
             # Update session state with fresh data after sync
             try:
                 import streamlit as st
                 # Refresh the data in session state immediately
-                fresh_data = self.db.get_history(athlete_id)
+                fresh_data = self.db.get_history_summary(athlete_id)
                 st.session_state.data = fresh_data
             except:
                 pass
         
-        return count_new, f"Sync terminata: {count_new} nuove attività (Streams utilizzati: {stream_count})"
+        return count_new, f"Sync terminata: {count_new} nuove attività (Streams utilizzati: {stream_count}/{stream_budget})"
+
+    def _fetch_activity_list(self, token, cursor: Dict[str, Any], mode: str) -> Tuple[Optional[List[Dict[str, Any]]], List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Attività da Strava secondo il cursore dell'atleta: le nuove dopo l'high-water mark (after=)
+        e, finché il backfill non è finito, una tornata di storico all'indietro (before=) a ogni sync.
+        Ritorna (nuove, backfill, cursore aggiornato); nuove = None se Strava non risponde.
+        """
+        cursor = dict(cursor)
+        hwm = cursor.get("last_activity_at")
+        new, old = [], []
+
+        if mode == "incremental" and hwm:
+            # Una sola chiamata nel caso comune (nessuna o poche attività nuove)
+            new = self.auth.fetch_activities_after(token, hwm)
+            if new is None:
+                logger.warning("Incremental fetch failed, cursor unchanged")
+                return None, [], cursor
+
+        if not cursor.get("backfill_done"):
+            before = cursor.get("backfill_before") or int(time.time())
+            old, exhausted = self.auth.fetch_activities_before(token, before)
+            if not old and not exhausted:
+                # Prima pagina fallita: senza altre attività è un errore Strava, non "niente di nuovo"
+                logger.warning(f"Backfill fetch failed before {before}, cursor unchanged")
+                if not hwm:
+                    return None, [], cursor
+            else:
+                if old:
+                    cursor["backfill_before"] = min(activity_epoch(a) for a in old)
+                cursor["backfill_done"] = exhausted
+                logger.info(f"Backfill: {len(old)} activities before {before} (done={exhausted})")
+
+        if new or old:
+            cursor["last_activity_at"] = max([hwm or 0] + [activity_epoch(a) for a in new + old])
+        return new, old, cursor
+
+    def _fetch_activity_data(self, token, s: Dict[str, Any], dt: datetime, with_streams: bool) -> Optional[Dict[str, Any]]:
+        """
+        Stage di fetch (eseguito nei worker): streams con retry per una attività.
+        Ritorna None se l'attività non ha né dati summary né streams (da skippare).
+        """
+        RETRY = 3
+        watts_stream, hr_stream, has_streams = [], [], False
+        cadence_stream, grade_stream = [], []
+        
+        if with_streams:
+            for r in range(RETRY):
+                try:
+                    st_raw = self.auth.fetch_streams(token, s['id'])
+                    if st_raw:
+                        watts_stream = st_raw.get('watts', {}).get('data', [])
+                        hr_stream = st_raw.get('heartrate', {}).get('data', [])
+                        cadence_stream = st_raw.get('cadence', {}).get('data', [])
+                        grade_stream = st_raw.get('grade_smooth', {}).get('data', [])
+                        has_streams = True
+                        logger.info(f"Streams fetched for {s['id']}: {len(watts_stream)} watts, {len(hr_stream)} HR")
+                        break
+                except Exception as e:
+                    logger.warning(f"Stream fetch attempt {r+1} failed for {s['id']}: {e}")
+                    time.sleep(2 ** (r + 1))
+        else:
+            logger.info(f"Stream budget exhausted, using summary data only for {s['id']}")
+        
+        # Se NON ci sono dati summary e nemmeno streams, skippa
+        if not (s.get('average_watts') or s.get('average_heartrate') or watts_stream or hr_stream):
+            logger.warning(f"Skipping {s['id']}: No power or HR data (summary or streams)")
+            return None
+        
+        return {"watts": watts_stream, "hr": hr_stream, "cadence": cadence_stream, "grade": grade_stream,
+                "has_streams": has_streams}
+
+    @staticmethod
+    def _fetch_weather_batch(candidates) -> List[Tuple[float, float, bool]]:
+        """Meteo (t, h, is_real) per ogni candidato, allineato all'ordine di candidates."""
+        weather = [(20.0, 50.0, False)] * len(candidates)
+        points, idx = [], []
+        for i, (s, dt) in enumerate(candidates):
+            latlng = s.get('start_latlng')
+            if latlng and isinstance(latlng, list) and len(latlng) == 2:
+                points.append((latlng[0], latlng[1], dt.strftime("%Y-%m-%d"), dt.hour))
+                idx.append(i)
+        try:
+            for i, w in zip(idx, WeatherService.get_weather_batch(points)):
+                weather[i] = w
+            logger.info(f"Weather fetched for {len(points)} activities ({sum(1 for w in weather if w[2])} real)")
+        except Exception as e:
+            logger.warning(f"Weather batch fetch failed: {e}")
+        return weather
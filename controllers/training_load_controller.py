@@ -0,0 +1,104 @@
+import logging
+from datetime import date
+from typing import Dict, Any, List, Optional
+from config import Config
+from engine import training_load as tl
+
+logger = logging.getLogger("sCore.TrainingLoad")
+
+class TrainingLoadController:
+    """
+    Modello di carico ATL/CTL/TSB persistito in training_load (una riga per giorno con carico).
+    Le corse nuove avanzano l'ultimo stato salvato in O(1); solo le corse più vecchie
+    dell'ultimo giorno (backfill) fanno ricalcolare i giorni successivi, una volta per batch.
+    """
+    def __init__(self, db_svc, metric: Optional[str] = None):
+        self.db = db_svc
+        self.metric = metric or Config.TRAINING_LOAD_METRIC
+
+    def athlete_params(self, athlete_id: int) -> Dict[str, Any]:
+        profile = self.db.get_athlete_profile(athlete_id) or {}
+        return {
+            "hr_max": profile.get("hr_max") or Config.DEFAULT_HR_MAX,
+            "hr_rest": profile.get("hr_rest") or Config.DEFAULT_HR_REST,
+            "ftp": profile.get("ftp") or Config.DEFAULT_FTP,
+            "sex": profile.get("sex") or "M"
+        }
+
+    def apply(self, athlete_id: int, runs: List[Dict[str, Any]]) -> int:
+        """
+        Aggiunge al modello le corse [{"date", "trimp", "tss"}] appena salvate.
+        Ritorna il numero di giorni riscritti. Al primo stato di un atleta con storico fa rebuild.
+        """
+        days = self._daily(runs)
+        if not days:
+            return 0
+        first = min(days)
+        last = self.db.get_last_load_state(athlete_id)
+
+        # Nessuno stato ma corse già salvate oltre a queste (atleta precedente al modello):
+        # si ricostruisce dallo storico invece di partire da zero
+        if last is None and len(self.db.get_run_ids_for_athlete(athlete_id)) > len(runs):
+            return self.rebuild(athlete_id)
+
+        if last is None or first >= last["day"][:10]:
+            # Caso comune: corse successive all'ultimo stato, avanzamento O(1) per giorno
+            rows, state = [], last
+            for day in sorted(days):
+                state = tl.advance(state, day, days[day]["trimp"], days[day]["tss"], days[day]["load"])
+                rows.append(state)
+        else:
+            # Corse nel passato: si riparte dallo stato precedente e si rigiocano i giorni successivi
+            for row in self.db.get_load_rows(athlete_id, since_day=first):
+                day = self._merge(days, row["day"][:10])
+                for k in ("load", "trimp", "tss"):
+                    day[k] += row.get(k) or 0.0
+            prev = self.db.get_last_load_state(athlete_id, before_day=first)
+            rows = tl.replay(prev, [dict(v, day=d) for d, v in days.items()])
+            logger.info(f"Training load {athlete_id}: replay of {len(rows)} days from {first}")
+
+        self.db.save_load_rows(athlete_id, rows)
+        return len(rows)
+
+    def rebuild(self, athlete_id: int) -> int:
+        """
+        Ricostruisce da zero il modello dell'atleta dai TRIMP/TSS salvati sulle corse;
+        le corse senza carico salvato lo ricavano dagli stream (o dalla FC media).
+        """
+        params = self.athlete_params(athlete_id)
+        runs = []
+        for row in self.db.get_run_loads(athlete_id):
+            load = row.get("load")
+            if not load:
+                streams = self.db.get_run_streams(row["id"])
+                load = tl.run_load(streams["watts"], streams["hr"], params["hr_max"], params["hr_rest"], params["ftp"],
+                                   params["sex"], avg_hr=row.get("avg_hr") or 0, duration_sec=row.get("duration_sec") or 0)
+            runs.append({"date": row["date"], **load})
+        days = self._daily(runs)
+        rows = tl.replay(None, [dict(v, day=d) for d, v in days.items()])
+        self.db.clear_training_load(athlete_id)
+        self.db.save_load_rows(athlete_id, rows)
+        logger.info(f"Training load {athlete_id}: rebuilt {len(rows)} days from {len(runs)} runs")
+        return len(rows)
+
+    def series(self, athlete_id: int, days: int = 120, until: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Serie giornaliera continua ATL/CTL/TSB degli ultimi `days` giorni, per il grafico."""
+        until = until or date.today()
+        start = date.fromordinal(until.toordinal() - days + 1).isoformat()
+        rows = self.db.get_load_rows(athlete_id, since_day=start)
+        prev = self.db.get_last_load_state(athlete_id, before_day=start)
+        series = tl.expand_series(([prev] if prev else []) + rows, until)
+        return [r for r in series if r["day"] >= start]
+
+    def _daily(self, runs: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+        days: Dict[str, Dict[str, float]] = {}
+        for run in runs:
+            day = self._merge(days, str(run["date"])[:10])
+            day["trimp"] += run.get("trimp") or 0.0
+            day["tss"] += run.get("tss") or 0.0
+            day["load"] += run.get(self.metric) or 0.0
+        return days
+
+    @staticmethod
+    def _merge(days: Dict[str, Dict[str, float]], day: str) -> Dict[str, float]:
+        return days.setdefault(day, {"load": 0.0, "trimp": 0.0, "tss": 0.0})
@@ -5,8 +5,9 @@ from config import Config
 
 # Components
 from .metrics import RunMetrics, MetricsCalculator
+from .reference import best_effort_distance
 from .scoring import ScoringSystem
-from .insights import InsightsEngine
+from .insights import InsightsEngine, InsightsState
 
 logger = logging.getLogger("sCore.Engine")
 
@@ -22,9 +23,25 @@ class ScoreEngine:
         self.insights = InsightsEngine()
 
     # --- DELEGATED TO METRICS CALCULATOR ---
-    def calculate_decoupling(self, power: List[float], hr: List[float], window: int = 300) -> float:
-        return self.metrics.calculate_decoupling(power, hr)
+    def calculate_decoupling(self, power: List[float], hr: List[float], window: int = 300,
+                             warmup_sec: int = 0, drop_pauses: bool = False) -> float:
+        """
+        Decoupling Pw:HR a metà corsa. Senza warm-up né pause da scartare (default) è il calcolo
+        classico O(n), che non dipende da `window` e divide ciascuno stream per la propria lunghezza;
+        altrimenti viene dal drift engine, sui campioni tenuti (stream troncati alla lunghezza comune).
+        """
+        if warmup_sec <= 0 and not drop_pauses:
+            return self.metrics.calculate_decoupling(power, hr)
+        return self.metrics.calculate_drift_timeline(power, hr, window, warmup_sec, drop_pauses)["decoupling"]
+
+    def calculate_drift_timeline(self, power: List[float], hr: List[float], window: int = 300,
+                                 warmup_sec: int = 0, drop_pauses: bool = False) -> Dict[str, Any]:
+        return self.metrics.calculate_drift_timeline(power, hr, window, warmup_sec, drop_pauses)
     
+    def calculate_stream_stats(self, watts: List[float], hr: List[float], ftp: float = 0,
+                               cadence: Optional[List[float]] = None, grade: Optional[List[float]] = None) -> Dict[str, Any]:
+        return self.metrics.calculate_stream_stats(watts, hr, ftp, cadence, grade)
+
     def calculate_zones(self, watts: List[float], ftp: int) -> Dict[str, float]:
         return self.metrics.calculate_zones(watts, ftp)
         
@@ -40,6 +57,23 @@ class ScoreEngine:
     def compute_score_v6_darkritual_wrapper(self, metrics: RunMetrics, nominal_power: float, target_hr_eff: float, athlete_level: str = "intermediate", db_baseline_adj: Optional[float] = None) -> Tuple[float, Dict[str, Any]]:
         """Wrapper for darkritual algorithm with athlete level parameter"""
         return self.scoring.compute_score_v6_darkritual(metrics, nominal_power, target_hr_eff, athlete_level)
+
+    def compute_scores_batch(self, runs: pd.DataFrame, nominal_power: Optional[float] = None, target_hr_eff: float = 1.0, athlete_level: str = "intermediate") -> pd.DataFrame:
+        """SCORE 4.1 vettoriale su un frame di corse (vedi ScoringSystem.compute_scores_batch)"""
+        return self.scoring.compute_scores_batch(runs, nominal_power, target_hr_eff, athlete_level)
+        
+    @staticmethod
+    def score_detail(w_kg: float, details: Dict[str, Any], target_t_adj: Optional[float] = None) -> Dict[str, Any]:
+        """Formato SCORE_DETAIL salvato in raw_data.details e mostrato in UI"""
+        return {
+            "W/kg": round(w_kg, 2),
+            "Nominal": round(details.get('nominal_pwr', 0), 2),
+            "Mech Eff": round(details.get('mech_eff', 0), 2),
+            "Metabolic Eff": round(details.get('metabolic_eff', 0), 2),
+            "WCF": round(details.get('wcf', 1.0), 2),
+            "Stability": round(details.get('stability', 0), 2),
+            "Target T_adj": round(target_t_adj, 1) if target_t_adj else "N/A"
+        }
         
     def get_rank(self, score: float) -> Tuple[str, str]:
         return self.scoring.get_rank(score)
@@ -98,16 +132,25 @@ class ScoreEngine:
         
         return score, details, wcf, wr_pct, quality
 
+    # Tolleranza relativa sulla distanza per considerare un record comparabile
+    BEST_DISTANCE_TOLERANCE = 0.10
+
     def _find_relevant_best(self, distance: float, bests: List[Dict]) -> Optional[Dict]:
-        """Helper per trovare il record personale più pertinente alla distanza attuale"""
-        # Tolleranza del 10% sulla distanza per considerare un record comparabile
+        """
+        Helper per trovare il record personale più pertinente alla distanza attuale.
+        Confronto per distanza sui best effort Strava: le curve mean-max (watts/HR per
+        durata, services.curve_store) non entrano in questa ricerca.
+        """
+        # Distanza del record: 'distance_m' se presente, altrimenti dedotta dal nome (tabella/parsing)
+        best, best_gap = None, None
         for b in bests:
-            # Esempio: se distanza è ~5000m e abbiamo un record '5k'
-            d_type = b.get('distance_type', '').lower()
-            if "5k" in d_type and 4500 <= distance <= 5500: return b
-            if "10k" in d_type and 9000 <= distance <= 11000: return b
-            if ("half" in d_type or "hm" in d_type) and 20000 <= distance <= 22000: return b
-        return None
+            d = b.get('distance_m') or best_effort_distance(b.get('distance_type'))
+            if not d:
+                continue
+            gap = abs(distance - d) / d
+            if gap <= self.BEST_DISTANCE_TOLERANCE and (best_gap is None or gap < best_gap):
+                best, best_gap = b, gap
+        return best
 
     # --- DELEGATED TO INSIGHTS ENGINE ---
     def achievements(self, scores_history):
@@ -119,6 +162,9 @@ class ScoreEngine:
     def calculate_consistency_score(self, df):
         return self.insights.calculate_consistency_score(df)
 
+    def consistency_from_weeks(self, weekly_counts):
+        return self.insights.consistency_from_weeks(weekly_counts)
+
     def calculate_trend_metrics(self, df):
         if df.empty or 'SCORE' not in df.columns: return df
         result = df.copy().sort_values("Data")
@@ -127,6 +173,10 @@ class ScoreEngine:
         return result
 
     # --- COMPOSED METHODS ---
+    def insights_state(self, scores_history: List[float] = ()) -> InsightsState:
+        """Gaming feedback incrementale: push(score) equivale a gaming_feedback(storico + [score])."""
+        return InsightsState(self.run_quality).extend(scores_history)
+
     def gaming_feedback(self, scores_history: List[float], activities_df: pd.DataFrame = None) -> Dict[str, Any]:
         """Composed method aggregating insights"""
         if not scores_history: return {}
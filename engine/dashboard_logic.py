@@ -1,5 +1,6 @@
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional
 from engine.core import ScoreEngine
 from engine.metrics import MetricsCalculator
 
@@ -8,8 +9,13 @@ class DashboardLogic:
     Logic layer for the Dashboard view.
     Handles data transformation and preparation before visualization.
     """
-    def __init__(self, engine: ScoreEngine):
+    # Un punto ogni SCATTER_STEP secondi nel grafico Power vs HR
+    SCATTER_STEP = 10
+
+    def __init__(self, engine: ScoreEngine, derived_cache=None):
         self.engine = engine
+        # Cache persistente delle metriche derivate per corsa (services.derived_cache)
+        self.derived_cache = derived_cache
 
     def prepare_trend_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -19,6 +25,23 @@ class DashboardLogic:
         df = self.engine.calculate_trend_metrics(df)
         return df.sort_values("Data", ascending=False)
 
+    def trend_frame(self, trend_rows: List[Dict[str, Any]]) -> pd.DataFrame:
+        """
+        Righe run_score_ma (MA7/MA28 calcolate lato server) nel formato di prepare_trend_data:
+        Data, SCORE, SCORE_MA_7, SCORE_MA_28, dalla più recente.
+        """
+        df = pd.DataFrame(trend_rows, columns=["run_id", "date", "score", "ma7", "ma28"]).rename(columns={
+            "run_id": "id", "date": "Data", "score": "SCORE", "ma7": "SCORE_MA_7", "ma28": "SCORE_MA_28"})
+        df['Data'] = pd.to_datetime(df['Data'], errors='coerce', utc=True).dt.tz_localize(None)
+        return df.sort_values("Data", ascending=False)
+
+    def consistency_from_weekly(self, weekly_rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Score di costanza dalle righe athlete_weekly_stats, con le settimane senza corse a 0 come nel resample."""
+        if not weekly_rows: return {"score": 0.0}
+        counts = pd.Series({pd.Timestamp(r["week_end"]): r["runs"] for r in weekly_rows}).sort_index()
+        weeks = pd.date_range(counts.index[0], counts.index[-1], freq="7D")
+        return self.engine.consistency_from_weeks(counts.reindex(weeks, fill_value=0).tolist())
+
     def calculate_delta(self, df: pd.DataFrame) -> float:
         """
         Calculates the delta between current and previous run's MA7.
@@ -45,9 +68,10 @@ class DashboardLogic:
         if 'Dist (km)' in cons_df.columns: 
             cons_df['distance_km'] = cons_df['Dist (km)']
         
-        # Calculate Moving Time Logic
+        # Calculate Moving Time Logic (Moving Time dallo storico, stream solo come fallback)
         cons_df['moving_time_min'] = cons_df.apply(
-            lambda x: len(x.get('raw_watts') or [])/60 if x.get('raw_watts') else (x.get('Dist (km)', 0) * 5), 
+            lambda x: x.get('Moving Time')/60 if x.get('Moving Time') else
+                      (len(x.get('raw_watts'))/60 if isinstance(x.get('raw_watts'), list) and x.get('raw_watts') else (x.get('Dist (km)', 0) * 5)),
             axis=1
         )
 
@@ -61,6 +85,36 @@ class DashboardLogic:
         """Calculates efficiency factor (EF)."""
         return MetricsCalculator.calculate_efficiency_factor(run_data.get('raw_watts', []), run_data.get('raw_hr', []))
 
+    def compute_run_derived(self, watts, hr, ftp: int) -> Dict[str, Any]:
+        """EF, zone di potenza e campione dello scatter di una corsa (payload serializzabile)."""
+        watts = np.asarray(watts if watts is not None else [])
+        hr = np.asarray(hr if hr is not None else [])
+        return {
+            "ef": MetricsCalculator.calculate_efficiency_factor(watts, hr),
+            "zones": self.engine.calculate_zones(watts, ftp),
+            "scatter": {
+                "watts": watts[::self.SCATTER_STEP].tolist(),
+                "hr": hr[::self.SCATTER_STEP].tolist()
+            }
+        }
+
+    def get_run_derived(self, run_id: int, ftp: int, hr_zones: Optional[Dict] = None,
+                        load_streams: Optional[Callable[[], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Metriche derivate della corsa dalla cache; gli stream vengono caricati
+        (load_streams) e le metriche ricalcolate solo se manca la voce per
+        (run_id, ENGINE_VERSION, FTP/zone).
+        """
+        if self.derived_cache is not None:
+            cached = self.derived_cache.get(run_id, ftp, hr_zones)
+            if cached is not None:
+                return cached
+        streams = load_streams() if load_streams else {}
+        derived = self.compute_run_derived(streams.get("watts"), streams.get("hr"), ftp)
+        if self.derived_cache is not None:
+            self.derived_cache.put(run_id, ftp, hr_zones, derived)
+        return derived
+
     def get_run_quality(self, score: float) -> Dict[str, Any]:
         """Determines run quality label/color based on score."""
         return self.engine.run_quality(score)
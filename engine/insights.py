@@ -1,9 +1,25 @@
 import numpy as np
 import pandas as pd
 import math
-from typing import List, Dict, Any
+from collections import Counter, deque
+from typing import Callable, Dict, Any, Iterable, List, Optional
 from config import Config
 
+# Finestre del trend qualità: medie mobili corta/lunga e storico per la volatilità
+TREND_MA_SHORT = 7
+TREND_MA_LONG = 28
+TREND_VOLATILITY_WINDOW = 30
+# Le achievements guardano al massimo le ultime 10 corse
+ACHIEVEMENTS_WINDOW = 10
+
+def _classify_trend(delta: float, threshold: float) -> Dict[str, Any]:
+    if abs(delta) <= threshold:
+        return {"direction": "flat", "symbol": "=", "message": "Trend Stabile", "delta": delta}
+    elif delta > threshold:
+        return {"direction": "up", "symbol": "+", "message": "Trend Positivo", "delta": delta}
+    else:
+        return {"direction": "down", "symbol": "-", "message": "Trend Negativo", "delta": delta}
+
 class InsightsEngine:
     
     @staticmethod
@@ -43,11 +59,11 @@ class InsightsEngine:
         data = df.copy().sort_values("Data")
         
         if 'SCORE_MA_7' not in data.columns:
-            data["SCORE_MA_7"] = data["SCORE"].rolling(7, min_periods=1).mean()
+            data["SCORE_MA_7"] = data["SCORE"].rolling(TREND_MA_SHORT, min_periods=1).mean()
         if 'SCORE_MA_28' not in data.columns:
-            data["SCORE_MA_28"] = data["SCORE"].rolling(28, min_periods=1).mean()
+            data["SCORE_MA_28"] = data["SCORE"].rolling(TREND_MA_LONG, min_periods=1).mean()
 
-        recent_history = data['SCORE'].tail(30)
+        recent_history = data['SCORE'].tail(TREND_VOLATILITY_WINDOW)
         smart_threshold = 2.0
         if len(recent_history) >= 5:
             volatility = recent_history.std()
@@ -57,13 +73,7 @@ class InsightsEngine:
         ma_short = last_row['SCORE_MA_7']
         ma_long = last_row['SCORE_MA_28']
         delta = ma_short - ma_long
-
-        if abs(delta) <= smart_threshold:
-            return {"direction": "flat", "symbol": "=", "message": "Trend Stabile", "delta": delta}
-        elif delta > smart_threshold:
-            return {"direction": "up", "symbol": "+", "message": "Trend Positivo", "delta": delta}
-        else:
-            return {"direction": "down", "symbol": "-", "message": "Trend Negativo", "delta": delta}
+        return _classify_trend(delta, smart_threshold)
 
     @staticmethod
     def calculate_consistency_score(activities_df: pd.DataFrame) -> Dict[str, Any]:
@@ -103,15 +113,18 @@ class InsightsEngine:
             'moving_time_min': ['count', 'sum']
         }).fillna(0)
         weekly_stats.columns = ['count', 'min_sum']
+        return InsightsEngine.consistency_from_weeks(weekly_stats['count'].tolist())
 
-        if len(weekly_stats) < 1: return {"score": 0.0}
+    @staticmethod
+    def consistency_from_weeks(weekly_counts: List[float]) -> Dict[str, Any]:
+        """Score di costanza dai conteggi corse per settimana (W-MON, settimane vuote a 0), in ordine cronologico."""
+        if len(weekly_counts) < 1: return {"score": 0.0}
 
-        current = weekly_stats.iloc[-1]
-        N_curr = current['count']
+        N_curr = weekly_counts[-1]
         
         # Simple weighted target logic
-        history = weekly_stats.iloc[:-1].tail(3)
-        target_count = N_curr if len(history) == 0 else history['count'].mean() # Simplified for brevity
+        history = weekly_counts[:-1][-3:]
+        target_count = N_curr if len(history) == 0 else sum(history) / len(history) # Simplified for brevity
 
         delta = abs(N_curr - target_count)
         sigma = max(1.0, target_count * 0.5)
@@ -125,3 +138,86 @@ class InsightsEngine:
         final_score = 100 * (log_val / (log_val + K))
 
         return {"score": round(final_score, 1)}
+
+class _RollingWindow:
+    """Finestra mobile di n valori con somma, media e varianza (Welford) aggiornate in O(1)."""
+    def __init__(self, size: int):
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, x: float):
+        if len(self.values) == self.values.maxlen:
+            old = self.values[0]
+            self.total -= old
+            n = len(self.values) - 1
+            if n == 0:
+                self.mean, self.m2 = 0.0, 0.0
+            else:
+                d = old - self.mean
+                self.mean -= d / n
+                self.m2 -= d * (old - self.mean)
+        self.values.append(x)
+        self.total += x
+        d = x - self.mean
+        self.mean += d / len(self.values)
+        self.m2 += d * (x - self.mean)
+
+    def avg(self) -> float:
+        return self.total / len(self.values)
+
+    def std(self) -> float:
+        n = len(self.values)
+        return math.sqrt(max(self.m2, 0.0) / (n - 1)) if n > 1 else float("nan")
+
+class InsightsState:
+    """
+    Stato incrementale del gaming feedback durante una sync: medie mobili MA7/MA28,
+    volatilità delle ultime 30 corse e ultime 10 per le achievements, aggiornati in O(1)
+    per ogni score aggiunto. push(score) restituisce lo stesso risultato di
+    ScoreEngine.gaming_feedback(storico + [score]) senza ricostruire DataFrame.
+    """
+    def __init__(self, quality_fn: Optional[Callable[[float], Dict[str, Any]]] = None):
+        self.quality_fn = quality_fn
+        self.count = 0
+        self.ma_short = _RollingWindow(TREND_MA_SHORT)
+        self.ma_long = _RollingWindow(TREND_MA_LONG)
+        self.recent = _RollingWindow(TREND_VOLATILITY_WINDOW)
+        self.last_runs = deque(maxlen=ACHIEVEMENTS_WINDOW)
+        # Quante volte è stata assegnata ogni achievement (sulle corse aggiunte con push)
+        self.achievement_counts: Counter = Counter()
+
+    def extend(self, scores: Iterable[float]) -> "InsightsState":
+        """Carica lo storico esistente (senza contare achievements)."""
+        for score in scores:
+            self._add(score)
+        return self
+
+    def _add(self, score: float):
+        score = float(score)
+        self.count += 1
+        self.ma_short.push(score)
+        self.ma_long.push(score)
+        self.recent.push(score)
+        self.last_runs.append(score)
+
+    def trend(self) -> Dict[str, Any]:
+        if self.count == 0:
+            return {"direction": "flat", "symbol": "=", "message": "Insufficient Data", "delta": 0.0}
+        threshold = 2.0
+        if len(self.recent.values) >= 5:
+            volatility = self.recent.std()
+            threshold = max(1.0, (0.0 if math.isnan(volatility) else volatility) * 0.5)
+        return _classify_trend(self.ma_short.avg() - self.ma_long.avg(), threshold)
+
+    def push(self, score: float) -> Dict[str, Any]:
+        self._add(score)
+        achievs = InsightsEngine.achievements(list(self.last_runs))
+        self.achievement_counts.update(achievs)
+        return {
+            "quality": self.quality_fn(float(score)) if self.quality_fn else {},
+            "achievements": achievs,
+            "trend": self.trend(),
+            "comparison": {}
+        }
@@ -1,5 +1,6 @@
 import numpy as np
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 import logging
 from dataclasses import dataclass, field
 from datetime import datetime
@@ -18,35 +19,43 @@ class MeteoData:
         Factory Method: Crea un oggetto MeteoData partendo dai dati grezzi dell'attività.
         Si occupa lui di chiamare il servizio esterno se i dati sono disponibili.
         """
-        # 1. Estrazione dati geospaziali
-        latlng = activity_data.get('start_latlng')
-        date_str = activity_data.get('start_date_local')
+        return cls.fetch_for_activities([activity_data])[0]
+
+    @classmethod
+    def fetch_for_activities(cls, activities: List[dict]) -> List["MeteoData"]:
+        """
+        Versione batch: una richiesta Open-Meteo a intervallo per cella invece di una per attività.
+        Attività senza coordinate o data ricevono l'oggetto "Default" (20°, 50%, False).
+        """
+        results = [cls() for _ in activities]
+        points, idx = [], []
         
-        # 2. Se mancano i dati, restituisce un oggetto "Default" (vuoto)
-        if not latlng or not date_str:
-            return cls()  # Chiama il costruttore coi default (20°, 50%, False)
+        # 1. Estrazione dati geospaziali
+        for i, activity_data in enumerate(activities):
+            latlng = activity_data.get('start_latlng')
+            date_str = activity_data.get('start_date_local')
+            if not latlng or not date_str:
+                continue
+            try:
+                dt_obj = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ")
+                points.append((latlng[0], latlng[1], dt_obj.strftime("%Y-%m-%d"), dt_obj.hour))
+                idx.append(i)
+            except Exception as e:
+                logger.warning(f"Meteo: invalid activity date {date_str}: {e}")
 
-        # 3. Tentativo di Fetch
+        if not points:
+            return results
+
+        # 2. Fetch batch
         try:
             # Import locale per evitare cicli: L'Engine usa il Service solo qui
             from services.meteo_svc import WeatherService
-            
-            dt_obj = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ")
-            
-            # Chiamata al servizio
-            t, h, is_real = WeatherService.get_weather(
-                lat=latlng[0], 
-                lon=latlng[1], 
-                date_str=dt_obj.strftime("%Y-%m-%d"), 
-                hour=dt_obj.hour
-            )
-            
-            # Restituisce l'oggetto popolato
-            return cls(temperature=t, humidity=h, is_real=is_real)
-            
+            for i, (t, h, is_real) in zip(idx, WeatherService.get_weather_batch(points)):
+                results[i] = cls(temperature=t, humidity=h, is_real=is_real)
         except Exception as e:
             logger.warning(f"Meteo fetch failed: {e}")
-            return cls()  # Fallback sicuro in caso di errore
+        
+        return results
 
 logger = logging.getLogger("sCore.Engine.Metrics")
 
@@ -68,6 +77,20 @@ class RunMetrics:
         self.age = age
         self.sex = sex
         self.decoupling = 0.0
+        # Statistiche dagli stream al secondo (calculate_stream_stats), vuote se la corsa non ha stream
+        self.stream_stats: Dict[str, Any] = {}
+
+    def apply_stream_stats(self, stats: Dict[str, Any]) -> "RunMetrics":
+        """
+        Aggancia le statistiche degli stream. Le medie del summary Strava restano quelle
+        usate dallo score; se mancano (0) si usano le medie ripulite degli stream.
+        """
+        self.stream_stats = stats or {}
+        if not self.avg_power and self.stream_stats.get("avg_power_clean"):
+            self.avg_power = self.stream_stats["avg_power_clean"]
+        if not self.avg_hr and self.stream_stats.get("avg_hr_clean"):
+            self.avg_hr = self.stream_stats["avg_hr_clean"]
+        return self
 
     @property
     def hr_avg(self): return self.avg_hr
@@ -88,6 +111,16 @@ class RunMetrics:
     def ascent(self): return self.elevation_gain
     @property
     def distance_m(self): return self.distance_meters
+    @property
+    def normalized_power(self): return self.stream_stats.get("normalized_power") or self.avg_power
+    @property
+    def variability_index(self): return self.stream_stats.get("variability_index") or 1.0
+    @property
+    def intensity_factor(self): return self.stream_stats.get("intensity_factor", 0.0)
+    @property
+    def avg_cadence(self): return self.stream_stats.get("avg_cadence", 0.0)
+    @property
+    def avg_grade(self): return self.stream_stats.get("avg_grade", 0.0)
 
 @dataclass
 class FullActivityRecord:
@@ -117,14 +150,69 @@ class AthleteBests:
     activity_id: int
     achieved_at: str
 
+# Campioni considerati pausa dal drift engine (stesse soglie del filtro EF)
+PAUSE_POWER_W = 10
+PAUSE_HR_BPM = 40
+
+# Finestra della Normalized Power (media mobile a 30 s, poi media quarta)
+NP_WINDOW_SEC = 30
+# Pendenza (%) oltre la quale un campione conta come salita / discesa
+GRADE_FLAT_PCT = 1.0
+
+# Soglie Coggan in frazione di FTP (Z1..Z7)
+POWER_ZONE_LIMITS = (0.55, 0.75, 0.90, 1.05, 1.20, 1.50)
+
+def _power_edges(ftp: float) -> np.ndarray:
+    return np.array([ftp * limit for limit in POWER_ZONE_LIMITS])
+
+def _hr_limits(zones_def: List[Dict]) -> Tuple[Tuple[float, float], ...]:
+    """(min, max) inclusivi per zona; max == -1 (ultima zona Strava) vale 300."""
+    limits = []
+    for z in zones_def:
+        mn, mx = z.get('min', 0), z.get('max', 250)
+        limits.append((mn, 300 if mx == -1 else mx))
+    return tuple(limits)
+
+@lru_cache(maxsize=64)
+def _hr_zone_table(limits: Tuple[Tuple[float, float], ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Precalcola i bordi per np.digitize: tra due bordi consecutivi l'appartenenza alle zone
+    è costante, quindi basta etichettare ogni intervallo con la prima zona che contiene il
+    suo estremo sinistro (stessa semantica "prima zona che matcha" del ciclo originale).
+    Etichetta len(limits) = nessuna zona.
+    """
+    none = len(limits)
+    # max inclusivo: il bordo è il float successivo
+    edges = np.unique([float(mn) for mn, _ in limits] + [np.nextafter(float(mx), np.inf) for _, mx in limits])
+    labels = np.full(len(edges) + 1, none, dtype=np.intp)
+    for k, left in enumerate(edges):
+        labels[k + 1] = next((i for i, (mn, mx) in enumerate(limits) if mn <= left <= mx), none)
+    return edges, labels
+
+def _is_empty(stream) -> bool:
+    """Stream assente o vuoto (liste o array NumPy dall'archivio stream)."""
+    return stream is None or len(stream) == 0
+
+def normalized_power(watts: Sequence[float]) -> float:
+    """NP: media quarta della potenza mediata su 30 s (somme cumulative, O(n))."""
+    w = np.nan_to_num(np.asarray(watts, dtype=np.float64), nan=0.0)
+    if len(w) == 0:
+        return 0.0
+    if len(w) < NP_WINDOW_SEC:
+        return float(w.mean())
+    csum = np.concatenate(([0.0], np.cumsum(w)))
+    rolling = (csum[NP_WINDOW_SEC:] - csum[:-NP_WINDOW_SEC]) / NP_WINDOW_SEC
+    return float(np.mean(rolling ** 4) ** 0.25)
+
 class MetricsCalculator:
     @staticmethod
     def calculate_decoupling(power_stream: List[float], hr_stream: List[float]) -> float:
         """Drift Fisiologico (PW:HR)"""
-        if not power_stream or not hr_stream: return 0.0
+        if _is_empty(power_stream) or _is_empty(hr_stream): return 0.0
         
-        power = np.array(power_stream)
-        hr = np.array(hr_stream)
+        # asarray: viste dell'archivio mmap restano zero-copy
+        power = np.asarray(power_stream)
+        hr = np.asarray(hr_stream)
 
         if len(power) < 120 or len(hr) < 120: return 0.0
 
@@ -142,13 +230,123 @@ class MetricsCalculator:
         
         return float(max(0.0, drift))
 
+    @staticmethod
+    def calculate_drift_timeline(power_stream: Sequence[float], hr_stream: Sequence[float], window: int = 300,
+                                 warmup_sec: int = 0, drop_pauses: bool = False, step: int = 10) -> Dict[str, Any]:
+        """
+        Drift Pw:HR in un solo passaggio O(n) con somme cumulative.
+        - cost: HR/Potenza sulla finestra mobile di `window` secondi (di movimento)
+        - drift_pct: variazione % del cost rispetto alla prima finestra completa
+        - decoupling: stesso confronto tra metà corsa del calcolo classico, sui campioni tenuti
+        warmup_sec scarta i primi secondi; drop_pauses scarta i campioni fermi
+        (potenza <= PAUSE_POWER_W o HR <= PAUSE_HR_BPM) ricucendo i segmenti.
+        Il timeline è campionato ogni `step` secondi; 't' è il tempo trascorso a fine finestra.
+        """
+        empty = {"t": np.zeros(0, dtype=np.int64), "cost": np.zeros(0), "drift_pct": np.zeros(0),
+                 "decoupling": 0.0, "samples": 0, "dropped": 0}
+        if _is_empty(power_stream) or _is_empty(hr_stream): return empty
+        n = min(len(power_stream), len(hr_stream))
+        power = np.asarray(power_stream, dtype=np.float64)[:n]
+        hr = np.asarray(hr_stream, dtype=np.float64)[:n]
+
+        keep = np.ones(n, dtype=bool)
+        keep[:max(0, int(warmup_sec))] = False
+        if drop_pauses:
+            keep &= (power > PAUSE_POWER_W) & (hr > PAUSE_HR_BPM)
+        t = np.flatnonzero(keep)
+        power, hr = power[keep], hr[keep]
+        m = len(power)
+        result = dict(empty, samples=m, dropped=n - m)
+        if m == 0: return result
+
+        cp = np.concatenate(([0.0], np.cumsum(power)))
+        ch = np.concatenate(([0.0], np.cumsum(hr)))
+
+        # Decoupling a metà corsa (stessa regola di calculate_decoupling)
+        if m >= 120:
+            split = int(m * 0.5)
+            p1, h1 = cp[split] / split, ch[split] / split
+            p2, h2 = (cp[m] - cp[split]) / (m - split), (ch[m] - ch[split]) / (m - split)
+            if p1 > 0 and p2 > 0 and h1 > 0 and h2 > 0:
+                result["decoupling"] = float(max(0.0, (h2 / p2 - h1 / p1) / (h1 / p1)))
+
+        w = int(window)
+        if w <= 0 or m < w: return result
+        p_win = cp[w:] - cp[:-w]
+        h_win = ch[w:] - ch[:-w]
+        idx = np.arange(0, len(p_win), max(1, int(step)))
+        p_win, h_win = p_win[idx], h_win[idx]
+        valid = p_win > 0
+        cost = np.divide(h_win, p_win, out=np.full(len(idx), np.nan), where=valid)
+        ref = cost[valid][0] if valid.any() else np.nan
+        result["t"] = t[idx + w - 1] + 1
+        result["cost"] = cost
+        result["drift_pct"] = (cost / ref - 1) * 100 if ref and ref > 0 else np.full(len(idx), np.nan)
+        return result
+
+    @staticmethod
+    def calculate_stream_stats(watts: Sequence[float], hr: Sequence[float], ftp: float = 0,
+                               cadence: Optional[Sequence[float]] = None,
+                               grade: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """
+        Statistiche degli stream al secondo in un solo passaggio vettoriale:
+        - normalized_power, variability_index (NP / media), intensity_factor (NP / FTP)
+        - avg_power_clean / avg_hr_clean con la maschera di calculate_efficiency_factor
+          (potenza > PAUSE_POWER_W e HR > PAUSE_HR_BPM, stream allineati)
+        - cadenza media (campioni > 0) e pendenza media / massima / % salita e discesa
+        Ogni chiave vale 0.0 se lo stream relativo manca.
+        """
+        stats = dict.fromkeys(("avg_power", "max_power", "normalized_power", "variability_index", "intensity_factor",
+                               "avg_power_clean", "avg_hr_clean", "avg_hr", "max_hr", "avg_cadence", "max_cadence",
+                               "avg_grade", "max_grade", "uphill_pct", "downhill_pct"), 0.0)
+        stats["samples"] = 0
+
+        if not _is_empty(watts):
+            w = np.nan_to_num(np.asarray(watts, dtype=np.float64), nan=0.0)
+            stats["samples"] = len(w)
+            stats["avg_power"] = float(w.mean())
+            stats["max_power"] = float(w.max())
+            np_w = normalized_power(w)
+            stats["normalized_power"] = np_w
+            if stats["avg_power"] > 0:
+                stats["variability_index"] = np_w / stats["avg_power"]
+            if ftp and ftp > 0:
+                stats["intensity_factor"] = np_w / ftp
+
+        if not _is_empty(hr):
+            h = np.nan_to_num(np.asarray(hr, dtype=np.float64), nan=0.0)
+            stats["samples"] = max(stats["samples"], len(h))
+            stats["avg_hr"] = float(h.mean())
+            stats["max_hr"] = float(h.max())
+            if not _is_empty(watts) and len(h) == len(w):
+                mask = (w > PAUSE_POWER_W) & (h > PAUSE_HR_BPM)
+                if mask.any():
+                    stats["avg_power_clean"] = float(w[mask].mean())
+                    stats["avg_hr_clean"] = float(h[mask].mean())
+
+        if not _is_empty(cadence):
+            c = np.nan_to_num(np.asarray(cadence, dtype=np.float64), nan=0.0)
+            moving = c > 0
+            if moving.any():
+                stats["avg_cadence"] = float(c[moving].mean())
+                stats["max_cadence"] = float(c.max())
+
+        if not _is_empty(grade):
+            g = np.nan_to_num(np.asarray(grade, dtype=np.float64), nan=0.0)
+            stats["avg_grade"] = float(g.mean())
+            stats["max_grade"] = float(g.max())
+            stats["uphill_pct"] = float((g > GRADE_FLAT_PCT).mean() * 100)
+            stats["downhill_pct"] = float((g < -GRADE_FLAT_PCT).mean() * 100)
+
+        return stats
+
     @staticmethod
     def calculate_efficiency_factor(watts: List[float], hr: List[float]) -> Dict[str, Any]:
         """
         Calcola l'Efficiency Factor (EF) come rapporto Potenza/HR.
         """
         # 1. Creazione DataFrame per allineare i dati
-        if not watts or not hr or len(watts) != len(hr):
+        if _is_empty(watts) or _is_empty(hr) or len(watts) != len(hr):
             return {"ef": 0.0, "interpretation": "N/A", "avg_power_clean": 0.0, "avg_hr_clean": 0}
 
         # Use numpy for faster filtering if possible, but pandas is robust
@@ -160,11 +358,11 @@ class MetricsCalculator:
         # Wait, core.py imports pandas. metrics.py does NOT.
         # I should use numpy for filtering.
         
-        w_arr = np.array(watts)
-        h_arr = np.array(hr)
+        w_arr = np.asarray(watts)
+        h_arr = np.asarray(hr)
         
-        # Valid mask: watts > 10 AND hr > 40
-        mask = (w_arr > 10) & (h_arr > 40)
+        # Valid mask: watts > 10 AND hr > 40 (stessa maschera di calculate_stream_stats)
+        mask = (w_arr > PAUSE_POWER_W) & (h_arr > PAUSE_HR_BPM)
         
         valid_w = w_arr[mask]
         valid_h = h_arr[mask]
@@ -197,36 +395,26 @@ class MetricsCalculator:
     @staticmethod
     def calculate_zones(watts_stream: List[int], ftp: int) -> Dict[str, float]:
         """Coggan Zones Distribution"""
-        if not watts_stream or not ftp: return {}
-        zones = [0]*7
-        limits = [0.55, 0.75, 0.90, 1.05, 1.20, 1.50] 
-        for w in watts_stream:
-            if w < ftp * limits[0]: zones[0]+=1
-            elif w < ftp * limits[1]: zones[1]+=1
-            elif w < ftp * limits[2]: zones[2]+=1
-            elif w < ftp * limits[3]: zones[3]+=1
-            elif w < ftp * limits[4]: zones[4]+=1
-            elif w < ftp * limits[5]: zones[5]+=1
-            else: zones[6]+=1
-        total = len(watts_stream)
-        return {f"Z{i+1}": round(c/total*100, 1) for i, c in enumerate(zones)}
+        if _is_empty(watts_stream) or not ftp: return {}
+        w = np.asarray(watts_stream, dtype=np.float64)
+        # digitize: numero di soglie <= w, cioè la prima zona con w < ftp * limite (NaN -> Z7)
+        counts = np.bincount(np.digitize(w, _power_edges(ftp)), minlength=len(POWER_ZONE_LIMITS) + 1)
+        total = len(w)
+        return {f"Z{i+1}": round(int(c)/total*100, 1) for i, c in enumerate(counts)}
 
     @staticmethod
     def calculate_hr_zones(hr_stream: List[int], zones_config: Dict) -> Dict[str, float]:
         """Time in HR Zones"""
-        if not hr_stream or not zones_config or 'zones' not in zones_config: return {}
+        if _is_empty(hr_stream) or not zones_config or 'zones' not in zones_config: return {}
         zones_def = zones_config['zones']
-        counts = [0] * len(zones_def)
-        limits = [(z.get('min', 0), z.get('max', 250)) for z in zones_def]
-        
-        for h in hr_stream:
-            for i, (mn, mx) in enumerate(limits):
-                if mx == -1: mx = 300
-                if mn <= h <= mx:
-                     counts[i] += 1
-                     break
-        total = len(hr_stream)
-        return {f"Z{i+1}": round(c/total*100, 1) if total > 0 else 0 for i, c in enumerate(counts)}
+        edges, labels = _hr_zone_table(_hr_limits(zones_def))
+        h = np.asarray(hr_stream, dtype=np.float64)
+        # Campioni fuori da tutte le zone (o NaN) finiscono nel bin extra, scartato
+        zone = labels[np.digitize(h, edges)]
+        zone[np.isnan(h)] = len(zones_def)
+        counts = np.bincount(zone, minlength=len(zones_def) + 1)[:len(zones_def)]
+        total = len(h)
+        return {f"Z{i+1}": round(int(c)/total*100, 1) if total > 0 else 0 for i, c in enumerate(counts)}
 
     @staticmethod
     def calculate_t_adj(m: RunMetrics) -> float:
@@ -0,0 +1,95 @@
+import numpy as np
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+# Griglia delle durate (s): ogni secondo fino a 20 s, poi progressione geometrica (~4%)
+# fino a 6 h, più le durate di riferimento esatte. Oltre le 6 h (ultra) la stessa
+# progressione prosegue fino alla durata della corsa: la griglia di una corsa più lunga
+# estende quella base senza cambiarne i punti, quindi le curve si fondono elemento per
+# elemento sul prefisso comune.
+MAX_CURVE_SEC = 6 * 60 * 60
+KEY_DURATIONS = (5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 5400, 7200)
+_GEOM_START, _GEOM_POINTS = 21, 160
+_GEOM_RATIO = (MAX_CURVE_SEC / _GEOM_START) ** (1 / (_GEOM_POINTS - 1))
+
+def _duration_grid() -> np.ndarray:
+    dense = np.arange(1, 21)
+    sparse = np.round(np.geomspace(_GEOM_START, MAX_CURVE_SEC, _GEOM_POINTS)).astype(np.int64)
+    return np.union1d(np.union1d(dense, sparse), KEY_DURATIONS)
+
+CURVE_DURATIONS = _duration_grid()
+CURVE_CHANNELS = ("watts", "hr")
+
+def _extension(count: int) -> np.ndarray:
+    """I primi `count` punti della progressione geometrica oltre le 6 h."""
+    k = np.arange(_GEOM_POINTS, _GEOM_POINTS + max(count, 0))
+    return np.round(_GEOM_START * _GEOM_RATIO ** k).astype(np.int64)
+
+def curve_durations(n: int) -> np.ndarray:
+    """Griglia per una corsa di n secondi: quella base, estesa fino a n se la corsa supera le 6 h."""
+    if n <= MAX_CURVE_SEC:
+        return CURVE_DURATIONS
+    count = int(np.floor(np.log(n / _GEOM_START) / np.log(_GEOM_RATIO))) - _GEOM_POINTS + 1
+    ext = _extension(count)
+    return np.concatenate((CURVE_DURATIONS, ext[ext <= n]))
+
+def durations_of(curve: np.ndarray) -> np.ndarray:
+    """Durate corrispondenti ai punti di una curva (base o estesa)."""
+    extra = len(curve) - len(CURVE_DURATIONS)
+    return CURVE_DURATIONS[:len(curve)] if extra <= 0 else np.concatenate((CURVE_DURATIONS, _extension(extra)))
+
+Curves = Dict[str, np.ndarray]
+
+def mean_max(stream: Sequence[float], durations: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Curva mean-maximal: per ogni durata d della griglia, la migliore media su d secondi
+    consecutivi. Somme cumulative + finestra scorrevole: O(n) per durata, quindi O(n·G)
+    con G ≈ 180 durate (più i punti oltre le 6 h per le ultra) invece di O(n²) su tutte
+    le finestre. Griglia di default: curve_durations(len(stream)); NaN per durate più
+    lunghe della corsa.
+    """
+    x = np.nan_to_num(np.asarray(stream, dtype=np.float64), nan=0.0)
+    n = len(x)
+    if durations is None:
+        durations = curve_durations(n)
+    out = np.full(len(durations), np.nan)
+    if n == 0:
+        return out
+    csum = np.concatenate(([0.0], np.cumsum(x)))
+    for i, d in enumerate(durations):
+        if d > n:
+            break
+        out[i] = (csum[d:] - csum[:-d]).max() / d
+    return out
+
+def compute_curves(watts: Sequence[float], hr: Sequence[float]) -> Curves:
+    """Curve mean-max di potenza e frequenza cardiaca di una corsa."""
+    return {"watts": mean_max(watts), "hr": mean_max(hr)}
+
+def _pad(curve: np.ndarray, size: int) -> np.ndarray:
+    return curve if len(curve) >= size else np.concatenate((curve, np.full(size - len(curve), np.nan)))
+
+def merge_envelope(envelope: Optional[np.ndarray], curve: np.ndarray) -> np.ndarray:
+    """Inviluppo (massimo per durata) aggiornato con una nuova curva, in O(griglia)."""
+    if envelope is None:
+        return curve.copy()
+    size = max(len(envelope), len(curve))
+    return np.fmax(_pad(envelope, size), _pad(curve, size))
+
+def envelope_of(curves: Iterable[np.ndarray]) -> np.ndarray:
+    """Inviluppo di più curve (es. tutte le corse degli ultimi 90 giorni)."""
+    stack = [c for c in curves]
+    if not stack:
+        return np.full(len(CURVE_DURATIONS), np.nan)
+    size = max(len(c) for c in stack)
+    return np.fmax.reduce(np.vstack([_pad(c, size) for c in stack]), axis=0)
+
+def value_at(curve: np.ndarray, seconds: int) -> Optional[float]:
+    """Valore della curva alla durata della griglia più vicina (None se non coperta)."""
+    i = int(np.abs(durations_of(curve) - seconds).argmin())
+    v = curve[i]
+    return None if np.isnan(v) else float(v)
+
+def curve_points(curve: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(durate, valori) senza le durate non coperte, pronti per un grafico."""
+    mask = ~np.isnan(curve)
+    return durations_of(curve)[mask], curve[mask]
@@ -0,0 +1,167 @@
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger("sCore.Engine.Reference")
+
+WR_PATH = Path(__file__).parent.parent / "assets" / "bestwr.json"
+
+# Distanza nominale (m) -> chiave in assets/bestwr.json ('5k', '10k', 'hm', 'm')
+DIST_MAP: Mapping[int, str] = MappingProxyType({
+    5000: "5k",
+    10000: "10k",
+    21097: "hm",
+    42195: "m"
+})
+
+# Nomi dei best effort Strava (e alias) -> distanza in metri
+BEST_EFFORT_DISTANCES: Mapping[str, float] = MappingProxyType({
+    "400m": 400.0,
+    "1/2 mile": 804.67,
+    "1k": 1000.0,
+    "1 mile": 1609.34,
+    "2 mile": 3218.69,
+    "5k": 5000.0,
+    "10k": 10000.0,
+    "15k": 15000.0,
+    "10 mile": 16093.4,
+    "20k": 20000.0,
+    "half-marathon": 21097.5,
+    "half marathon": 21097.5,
+    "half": 21097.5,
+    "hm": 21097.5,
+    "30k": 30000.0,
+    "marathon": 42195.0,
+    "50k": 50000.0
+})
+_DISTANCE_NAME = re.compile(r"^(\d+(?:[.,]\d+)?)\s*(k|km|m|mi|mile|miles)$")
+_UNIT_METERS = {"k": 1000.0, "km": 1000.0, "m": 1.0, "mi": 1609.34, "mile": 1609.34, "miles": 1609.34}
+
+def best_effort_distance(name: Optional[str]) -> Optional[float]:
+    """Distanza (m) di un best effort dal suo nome ('5K', 'Half-Marathon', '3000m', '10 mile'...)."""
+    if not name:
+        return None
+    key = str(name).strip().lower()
+    if key in BEST_EFFORT_DISTANCES:
+        return BEST_EFFORT_DISTANCES[key]
+    m = _DISTANCE_NAME.match(key)
+    if not m:
+        return None
+    return float(m.group(1).replace(",", ".")) * _UNIT_METERS[m.group(2)]
+
+# Fattore di livello atletico (F_level) per il tempo di riferimento
+LEVEL_FACTORS: Mapping[str, float] = MappingProxyType({
+    "elite": 1.00,
+    "sub_elite": 1.05,
+    "advanced": 1.12,
+    "intermediate": 1.20,
+    "amateur": 1.35
+})
+DEFAULT_LEVEL_FACTOR = 1.20
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    """
+    Snapshot immutabile dei record mondiali (assets/bestwr.json).
+    Le distanze sono pre-ordinate per il lookup con bisect.
+    """
+    records: Mapping[str, Mapping[str, float]]
+    age_groups: Mapping[str, Mapping[str, float]]
+    dist_keys: Tuple[int, ...]
+    last_updated: Optional[str]
+    mtime: float
+
+    @classmethod
+    def from_dict(cls, wr_data: Dict, mtime: float = 0.0) -> "ReferenceData":
+        records = {}
+        age_groups = {}
+        for key, rec in wr_data.get("records", {}).items():
+            records[key] = MappingProxyType({k: float(v) for k, v in rec.items() if k != "age_groups"})
+            age_groups[key] = MappingProxyType({k: float(v) for k, v in rec.get("age_groups", {}).items()})
+
+        return cls(
+            records=MappingProxyType(records),
+            age_groups=MappingProxyType(age_groups),
+            dist_keys=tuple(sorted(d for d, k in DIST_MAP.items() if k in records)),
+            last_updated=wr_data.get("last_updated"),
+            mtime=mtime
+        )
+
+    def closest_distance(self, distance_m: float) -> int:
+        """Distanza nominale più vicina (a parità di scarto vince la più corta, come min())."""
+        keys = self.dist_keys
+        i = bisect.bisect_left(keys, distance_m)
+        if i == 0: return keys[0]
+        if i == len(keys): return keys[-1]
+        lo, hi = keys[i - 1], keys[i]
+        return lo if abs(lo - distance_m) <= abs(hi - distance_m) else hi
+
+    def closest_key(self, distance_m: float) -> str:
+        return DIST_MAP[self.closest_distance(distance_m)]
+
+    def wr_time(self, wr_key: str, category: str = "men_elite") -> float:
+        return self.records[wr_key][category]
+
+    def age_group_time(self, wr_key: str, sex: str, age: int) -> Optional[float]:
+        """
+        Record di categoria master (es. 'M45', 'W50') per la fascia d'età dell'atleta.
+        Ritorna None sotto i 35 anni (nessuna fascia master).
+        """
+        groups = self.age_groups.get(wr_key, {})
+        if not groups or age < 35: return None
+        prefix = "M" if str(sex).upper() == "M" else "W"
+        band = min(70, (int(age) // 5) * 5)
+        return groups.get(f"{prefix}{band}")
+
+
+class ReferenceRegistry:
+    """
+    Registry process-wide: carica bestwr.json una sola volta e lo ricarica
+    solo quando cambia l'mtime del file (controllato al massimo ogni `check_interval` s).
+    """
+    def __init__(self, path: Path = WR_PATH, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data: Optional[ReferenceData] = None
+        self._next_check = 0.0
+
+    def get(self) -> ReferenceData:
+        data = self._data
+        now = time.monotonic()
+        if data is not None and now < self._next_check:
+            return data
+        self._next_check = now + self.check_interval
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            if self._data is not None:
+                return self._data
+            raise FileNotFoundError(f"World records file not found: {self.path}") from e
+
+        if data is not None and data.mtime == mtime:
+            return data
+
+        with self._lock:
+            if self._data is None or self._data.mtime != mtime:
+                with open(self.path, 'r') as f:
+                    self._data = ReferenceData.from_dict(json.load(f), mtime)
+                logger.info(f"World records loaded from {self.path.name} (updated {self._data.last_updated})")
+            return self._data
+
+
+_registry = ReferenceRegistry()
+
+def get_reference_data() -> ReferenceData:
+    """Accessor per il registry condiviso dei record mondiali."""
+    return _registry.get()
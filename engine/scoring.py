@@ -1,8 +1,11 @@
+import math
 import numpy as np
+import pandas as pd
 import logging
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, Optional, List, Mapping, Union
 from config import Config
 from .metrics import RunMetrics
+from .reference import get_reference_data, DIST_MAP, LEVEL_FACTORS, DEFAULT_LEVEL_FACTOR
 
 logger = logging.getLogger("sCore.Engine.Scoring")
 
@@ -31,140 +34,119 @@ class ScoringSystem:
             target_hr_eff: Target HR efficiency
             athlete_level: "elite"|"sub_elite"|"advanced"|"intermediate"|"amateur"
         """
-        import json
-        import math
-        from pathlib import Path
+        # === 1-2. CLOSEST WORLD RECORD (registry condiviso, niente I/O per chiamata) ===
+        ref = get_reference_data()
+        wr_key = ref.closest_key(metrics.distance_meters)
         
-        # === 1. LOAD WORLD RECORDS ===
-        wr_path = Path(__file__).parent.parent / "assets" / "bestwr.json"
-        with open(wr_path, 'r') as f:
-            wr_data = json.load(f)
+        # === 3-5. Kernel condiviso con compute_scores_batch (identico bit a bit) ===
+        v = _darkritual_kernel(
+            _ScalarOps,
+            T_WR=ref.wr_time(wr_key, "men_elite"),
+            power=metrics.avg_power, weight=metrics.weight,
+            hr=metrics.hr_avg, hr_max=metrics.hr_max, hr_rest=metrics.hr_rest,
+            moving_time=metrics.duration_sec, temp=metrics.temp_c, humidity=metrics.humidity,
+            decoupling=metrics.decoupling, age=metrics.age,
+            is_male=metrics.sex.upper() == "M",
+            f_level=LEVEL_FACTORS.get(athlete_level.lower(), DEFAULT_LEVEL_FACTOR),
+            nominal_power=nominal_power, target_hr_eff=target_hr_eff
+        )
+        if not v["valid"]:
+            logger.error(f"SCORE 4.1 calculation error: invalid log score (decoupling={metrics.decoupling})")
+        score = v["score"]
+        details = _build_details(v, wr_key)
         
-        # === 2. FIND CLOSEST WORLD RECORD ===
-        dist_m = metrics.distance_meters
-        # New distance mapping for assets/bestwr.json (which uses '5k', '10k', 'hm', 'm')
-        dist_map = {
-            5000: "5k",
-            10000: "10k",
-            21097: "hm",
-            42195: "m"
-        }
-        closest_dist = min(dist_map.keys(), key=lambda x: abs(x - dist_m))
-        wr_key = dist_map[closest_dist]
-        
-        # T_WR is the base record (men_elite used as baseline before factors)
-        T_WR = wr_data["records"][wr_key]["men_elite"]
-        
-        # === 3. CALCULATE DYNAMIC REFERENCE TIME ===
-        # F_age: minimum at 30 years, quadratic growth
-        k_a = 0.15
-        F_age = 1 + k_a * ((metrics.age - 30) / 30) ** 2
-        
-        # F_sex: gender gap from world records
-        F_sex = 1.0 if metrics.sex.upper() == "M" else 1.10
-        
-        # F_level: athletic level factor
-        level_factors = {
-            "elite": 1.00,
-            "sub_elite": 1.05,
-            "advanced": 1.12,
-            "intermediate": 1.20,
-            "amateur": 1.35
-        }
-        F_level = level_factors.get(athlete_level.lower(), 1.20)
-        
-        # F_env: environmental penalty (temperature only, humidity in WCF)
-        F_env = 1 + 0.01 * max(0, metrics.temp_c - 15)
-        
-        # T_ref calculation (F_surface removed as requested)
-        T_ref = T_WR * F_age * F_sex * F_level * F_env
-        T_act = metrics.duration_sec
+        return score, details
+
+    def compute_scores_batch(self, runs: Union[pd.DataFrame, Mapping[str, Any]],
+                             nominal_power: Optional[float] = None,
+                             target_hr_eff: float = 1.0,
+                             athlete_level: str = "intermediate") -> pd.DataFrame:
+        """
+        SCORE 4.1 colonnare: calcola score e dettagli per N corse in un solo passaggio.
+        Aritmetica NumPy; log/exp restano math.* elemento per elemento (parità bit a bit
+        con il path scalare), quindi non è un kernel completamente vettoriale.
         
-        # === 4. EFFICIENCY COMPONENTS ===
-        # 4a. Mechanical Efficiency (W_eff)
-        if nominal_power <= 0:
-            nominal_power = 1.0
-        power_ratio = metrics.w_kg / nominal_power
-        W_eff = max(0.01, power_ratio)  # Prevent log(0)
+        Args:
+            runs: DataFrame (o dict di array) con colonne
+                  power, hr, distance, moving_time  (obbligatorie)
+                  weight, hr_max, hr_rest, temp, humidity, decoupling, age, sex, level,
+                  nominal_power, target_hr_eff      (opzionali, default per colonna)
+            nominal_power / target_hr_eff / athlete_level: default se la colonna manca
         
-        # 4b. Heart Rate Reserve Efficiency
-        hr_reserve = metrics.hr_max - metrics.hr_rest
-        if hr_reserve <= 0:
-            hr_reserve = 60  # Safe default
-        hrr = (metrics.hr_avg - metrics.hr_rest) / hr_reserve
+        Returns:
+            DataFrame allineato all'input con 'score' identico bit a bit al path scalare
+            e le componenti del dettaglio NON arrotondate (il path scalare arrotonda per la UI).
+        """
+        df = runs if isinstance(runs, pd.DataFrame) else pd.DataFrame(runs)
+        n = len(df)
+        missing = [c for c in BATCH_REQUIRED_COLUMNS if c not in df.columns]
+        if missing:
+            raise ValueError(f"compute_scores_batch: missing columns {missing}")
         
-        if target_hr_eff <= 0:
-            target_hr_eff = 0.75
-        HRR_eff = max(0.01, hrr / target_hr_eff)
+        if nominal_power is None:
+            nominal_power = Config.W_REF
         
-        # 4c. Weather Correction Factor
-        temp_penalty = max(0, 0.012 * (metrics.temp_c - 20))
-        hum_penalty = max(0, 0.005 * (metrics.humidity - 60))
-        WCF = 1 + temp_penalty + hum_penalty
+        def col(name: str, default: Any) -> np.ndarray:
+            if name in df.columns:
+                return df[name].to_numpy(dtype=float)
+            return np.full(n, default, dtype=float)
         
-        # 4d. Performance Efficiency
-        P_eff = max(0.01, T_ref / T_act)  # Prevent log(0 or neg)
+        sex = df["sex"].astype(str).str.upper() if "sex" in df.columns else pd.Series(["M"] * n, index=df.index)
+        level = df["level"].astype(str).str.lower() if "level" in df.columns else pd.Series([athlete_level.lower()] * n, index=df.index)
         
-        # 4e. Aerobic Stability Penalty
-        alpha = 0.15  # Stability coefficient
-        D = metrics.decoupling  # Decoupling percentage
-        T = max(1, T_act / 60)  # Time in minutes
-        stability_penalty = alpha * math.sqrt(D / T)
+        # Closest WR: searchsorted con lo stesso tie-break di ReferenceData.closest_distance
+        ref = get_reference_data()
+        keys = np.asarray(ref.dist_keys, dtype=float)
+        distance = col("distance", 0.0)
+        i = np.clip(np.searchsorted(keys, distance, side="left"), 1, len(keys) - 1)
+        lo, hi = keys[i - 1], keys[i]
+        wr_idx = np.where(np.abs(lo - distance) <= np.abs(hi - distance), i - 1, i)
+        wr_idx = np.where(distance <= keys[0], 0, np.where(distance > keys[-1], len(keys) - 1, wr_idx))
+        wr_names = np.array([DIST_MAP[d] for d in ref.dist_keys], dtype=object)
+        wr_times = np.array([ref.wr_time(DIST_MAP[d], "men_elite") for d in ref.dist_keys])
         
-        # === 5. FINAL SCORE CALCULATION (LOG-LINEAR FORM) ===
-        try:
-            log_score = (
-                math.log(W_eff)
-                - math.log(HRR_eff)
-                + math.log(WCF)
-                + math.log(P_eff)
-                - stability_penalty
+        weight = col("weight", Config.DEFAULT_WEIGHT)
+        with np.errstate(all="ignore"):
+            k = _darkritual_kernel(
+                _ArrayOps,
+                T_WR=wr_times[wr_idx],
+                power=col("power", 0.0), weight=np.where(weight > 0, weight, 70.0),
+                hr=col("hr", 0.0), hr_max=col("hr_max", Config.DEFAULT_HR_MAX), hr_rest=col("hr_rest", Config.DEFAULT_HR_REST),
+                moving_time=col("moving_time", 0.0), temp=col("temp", 20.0), humidity=col("humidity", 50.0),
+                decoupling=col("decoupling", 0.0), age=col("age", Config.DEFAULT_AGE),
+                is_male=(sex == "M").to_numpy(),
+                f_level=level.map(LEVEL_FACTORS).fillna(DEFAULT_LEVEL_FACTOR).to_numpy(dtype=float),
+                nominal_power=col("nominal_power", nominal_power),
+                target_hr_eff=col("target_hr_eff", target_hr_eff)
             )
-            raw_score = math.exp(log_score)
-            
-            # Normalize to 0-100 scale with saturation
-            score = 100 * (1 - math.exp(-1.8 * raw_score))
-            score = np.clip(score, 0, 100)
-            
-        except (ValueError, OverflowError) as e:
-            logger.error(f"SCORE 4.1 calculation error: {e}")
-            score = 0.0
-            raw_score = 0.0
-        
-        # === 6. DETAILED BREAKDOWN ===
-        details = {
-            "algo": "score_4.1_darkritual",
-            "version": "4.1",
-            # Reference Time Components
-            "T_WR": round(T_WR, 1),
-            "T_ref": round(T_ref, 1),
-            "T_act": round(T_act, 1),
-            "closest_wr_dist": wr_key,
-            # Factors
-            "F_age": round(F_age, 3),
-            "F_sex": F_sex,
-            "F_level": F_level,
-            "F_env": round(F_env, 3),
-            # Efficiencies (native keys)
-            "W_eff": round(W_eff, 3),
-            "HRR_eff": round(HRR_eff, 3),
-            "WCF": round(WCF, 3),
-            "P_eff": round(P_eff, 3),
-            "stability_penalty": round(stability_penalty, 3),
-            # Final
-            "raw_score": round(raw_score, 3),
-            "normalized_score": round(score, 1),
-            
-            # === COMPATIBILITY LAYER FOR sync_controller.py ===
-            # These keys ensure backward compatibility with UI expectations
-            "nominal_pwr": nominal_power,           # Expected by SCORE_DETAIL
-            "mech_eff": round(W_eff, 3),           # Alias for W_eff
-            "metabolic_eff": round(HRR_eff, 3),    # Alias for HRR_eff
-            "wcf": round(WCF, 3),                  # Lowercase alias
-            "stability": max(0, 1 - round(stability_penalty, 3))  # Invert penalty to positive metric
-        }
+        k["closest_wr_dist"] = wr_names[wr_idx]
         
-        return score, details
+        out = pd.DataFrame(k, index=df.index)
+        out["stability"] = np.fmax(0.0, 1 - out["stability_penalty"])
+        return out
+
+    @staticmethod
+    def batch_details(row: Mapping[str, Any]) -> Dict[str, Any]:
+        """Dettaglio SCORE_DETAIL (stesso formato del path scalare) da una riga di compute_scores_batch."""
+        return _build_details(row, row["closest_wr_dist"])
+
+    @staticmethod
+    def metrics_frame(metrics_list: List[RunMetrics]) -> pd.DataFrame:
+        """Converte una lista di RunMetrics nel formato colonnare di compute_scores_batch."""
+        return pd.DataFrame({
+            "power": [m.avg_power for m in metrics_list],
+            "hr": [m.hr_avg for m in metrics_list],
+            "distance": [m.distance_meters for m in metrics_list],
+            "moving_time": [m.duration_sec for m in metrics_list],
+            "weight": [m.weight for m in metrics_list],
+            "hr_max": [m.hr_max for m in metrics_list],
+            "hr_rest": [m.hr_rest for m in metrics_list],
+            "temp": [m.temp_c for m in metrics_list],
+            "humidity": [m.humidity for m in metrics_list],
+            "decoupling": [m.decoupling for m in metrics_list],
+            "age": [m.age for m in metrics_list],
+            "sex": [m.sex for m in metrics_list]
+        })
 
     @staticmethod
     def get_rank(score: float) -> Tuple[str, str]:
@@ -189,3 +171,161 @@ class ScoringSystem:
         if score >= t.GREAT: return {"label": "💎 Great Run", "color": c.SCORE_GREAT}     
         if score >= t.SOLID: return {"label": "⚡ Solid Run", "color": c.SCORE_SOLID}     
         return {"label": "🐌 Weak Run", "color": c.SCORE_WEAK}
+
+
+BATCH_REQUIRED_COLUMNS = ("power", "hr", "distance", "moving_time")
+
+def _build_details(v: Mapping[str, Any], wr_key: str) -> Dict[str, Any]:
+    """=== 6. DETAILED BREAKDOWN === (valori del kernel arrotondati per UI/DB)"""
+    score = float(v["score"])
+    stability_penalty = float(v["stability_penalty"])
+    return {
+        "algo": "score_4.1_darkritual",
+        "version": "4.1",
+        # Reference Time Components
+        "T_WR": round(float(v["T_WR"]), 1),
+        "T_ref": round(float(v["T_ref"]), 1),
+        "T_act": round(v["T_act"], 1),
+        "closest_wr_dist": wr_key,
+        # Factors
+        "F_age": round(float(v["F_age"]), 3),
+        "F_sex": float(v["F_sex"]),
+        "F_level": float(v["F_level"]),
+        "F_env": round(float(v["F_env"]), 3),
+        # Efficiencies (native keys)
+        "W_eff": round(float(v["W_eff"]), 3),
+        "HRR_eff": round(float(v["HRR_eff"]), 3),
+        "WCF": round(float(v["WCF"]), 3),
+        "P_eff": round(float(v["P_eff"]), 3),
+        "stability_penalty": round(stability_penalty, 3),
+        # Final
+        "raw_score": round(float(v["raw_score"]), 3),
+        "normalized_score": round(score, 1),
+        
+        # === COMPATIBILITY LAYER FOR sync_controller.py ===
+        # These keys ensure backward compatibility with UI expectations
+        "nominal_pwr": float(v["nominal_pwr"]),           # Expected by SCORE_DETAIL
+        "mech_eff": round(float(v["W_eff"]), 3),           # Alias for W_eff
+        "metabolic_eff": round(float(v["HRR_eff"]), 3),    # Alias for HRR_eff
+        "wcf": round(float(v["WCF"]), 3),                  # Lowercase alias
+        "stability": max(0, 1 - round(stability_penalty, 3))  # Invert penalty to positive metric
+    }
+
+def _safe(fn):
+    """math.* che ritorna NaN invece di sollevare (log di negativi, overflow di exp)."""
+    def wrapped(x):
+        try:
+            return fn(x)
+        except (ValueError, OverflowError):
+            return math.nan
+    return wrapped
+
+def _vectorize(fn):
+    """Applica una funzione math.* elemento per elemento: stessi bit del path scalare su ogni piattaforma."""
+    safe = _safe(fn)
+    def apply(arr):
+        values = np.asarray(arr, dtype=float).tolist()
+        try:
+            return np.fromiter(map(fn, values), dtype=float, count=len(values))
+        except (ValueError, OverflowError):
+            return np.fromiter(map(safe, values), dtype=float, count=len(values))
+    return apply
+
+class _ScalarOps:
+    """Primitive per una singola corsa (float Python)."""
+    log = staticmethod(_safe(math.log))
+    exp = staticmethod(_safe(math.exp))
+    sqrt = staticmethod(_safe(math.sqrt))
+    isfinite = staticmethod(math.isfinite)
+    fmax = staticmethod(lambda a, b: b if b > a else a)
+    where = staticmethod(lambda cond, a, b: a if cond else b)
+    clip = staticmethod(lambda x, lo, hi: min(max(x, lo), hi))
+
+class _ArrayOps:
+    """Primitive colonnari: aritmetica NumPy, trascendenti via math per la parità bit a bit."""
+    log = staticmethod(_vectorize(math.log))
+    exp = staticmethod(_vectorize(math.exp))
+    sqrt = staticmethod(np.sqrt)  # IEEE 754: sqrt correttamente arrotondata come math.sqrt
+    isfinite = staticmethod(np.isfinite)
+    fmax = staticmethod(np.fmax)
+    where = staticmethod(np.where)
+    clip = staticmethod(np.clip)
+
+def _darkritual_kernel(ops, T_WR, power, weight, hr, hr_max, hr_rest, moving_time,
+                       temp, humidity, decoupling, age, is_male, f_level,
+                       nominal_power, target_hr_eff) -> Dict[str, Any]:
+    """
+    Kernel di SCORE 4.1, scritto una sola volta per scalari (_ScalarOps) e colonne (_ArrayOps).
+    Stesse operazioni nello stesso ordine: i due path producono gli stessi bit.
+    """
+    # === 3. CALCULATE DYNAMIC REFERENCE TIME ===
+    # F_age: minimum at 30 years, quadratic growth
+    k_a = 0.15
+    age_dev = (age - 30) / 30
+    F_age = 1 + k_a * (age_dev * age_dev)
+    
+    # F_sex: gender gap from world records
+    F_sex = ops.where(is_male, 1.0, 1.10)
+    
+    # F_env: environmental penalty (temperature only, humidity in WCF)
+    F_env = 1 + 0.01 * ops.fmax(0.0, temp - 15)
+    
+    # T_ref calculation (F_surface removed as requested)
+    T_ref = T_WR * F_age * F_sex * f_level * F_env
+    T_act = moving_time
+    # Corsa senza durata: score 0 in entrambi i path (niente divisione per zero nello scalare)
+    has_time = T_act > 0
+    T_div = ops.where(has_time, T_act, 1.0)
+    
+    # === 4. EFFICIENCY COMPONENTS ===
+    # 4a. Mechanical Efficiency (W_eff)
+    nominal_power = ops.where(nominal_power <= 0, 1.0, nominal_power)
+    W_eff = ops.fmax(0.01, (power / weight) / nominal_power)  # Prevent log(0)
+    
+    # 4b. Heart Rate Reserve Efficiency
+    hr_reserve = hr_max - hr_rest
+    hr_reserve = ops.where(hr_reserve <= 0, 60, hr_reserve)  # Safe default
+    hrr = (hr - hr_rest) / hr_reserve
+    target_hr_eff = ops.where(target_hr_eff <= 0, 0.75, target_hr_eff)
+    HRR_eff = ops.fmax(0.01, hrr / target_hr_eff)
+    
+    # 4c. Weather Correction Factor
+    temp_penalty = ops.fmax(0.0, 0.012 * (temp - 20))
+    hum_penalty = ops.fmax(0.0, 0.005 * (humidity - 60))
+    WCF = 1 + temp_penalty + hum_penalty
+    
+    # 4d. Performance Efficiency
+    P_eff = ops.fmax(0.01, T_ref / T_div)  # Prevent log(0 or neg)
+    
+    # 4e. Aerobic Stability Penalty
+    alpha = 0.15  # Stability coefficient
+    T = ops.fmax(1.0, T_div / 60)  # Time in minutes
+    stability_penalty = alpha * ops.sqrt(decoupling / T)
+    
+    # === 5. FINAL SCORE CALCULATION (LOG-LINEAR FORM) ===
+    log_score = ops.log(W_eff) - ops.log(HRR_eff) + ops.log(WCF) + ops.log(P_eff) - stability_penalty
+    raw_score = ops.exp(log_score)
+    valid = ops.isfinite(log_score) & ops.isfinite(raw_score) & has_time
+    raw_score = ops.where(valid, raw_score, 0.0)
+    
+    # Normalize to 0-100 scale with saturation
+    score = ops.where(valid, ops.clip(100 * (1 - ops.exp(-1.8 * raw_score)), 0.0, 100.0), 0.0)
+    
+    return {
+        "score": score,
+        "raw_score": raw_score,
+        "valid": valid,
+        "T_WR": T_WR,
+        "T_ref": T_ref,
+        "T_act": T_act,
+        "F_age": F_age,
+        "F_sex": F_sex,
+        "F_level": f_level,
+        "F_env": F_env,
+        "W_eff": W_eff,
+        "HRR_eff": HRR_eff,
+        "WCF": WCF,
+        "P_eff": P_eff,
+        "stability_penalty": stability_penalty,
+        "nominal_pwr": nominal_power
+    }
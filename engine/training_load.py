@@ -0,0 +1,130 @@
+import math
+import numpy as np
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+from engine.metrics import normalized_power
+
+# Modello a due costanti di tempo (Banister / PMC): fatica (ATL) e forma di fondo (CTL)
+ATL_DAYS = 7
+CTL_DAYS = 42
+K_ATL = 1 - math.exp(-1 / ATL_DAYS)
+K_CTL = 1 - math.exp(-1 / CTL_DAYS)
+
+# Pesi esponenziali della TRIMP di Banister per sesso
+TRIMP_WEIGHTS = {"M": (0.64, 1.92), "F": (0.86, 1.67)}
+
+LoadState = Dict[str, Union[str, float]]
+Day = Union[str, date]
+
+def _day(value: Day) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+def trimp(hr: Sequence[float], hr_max: float, hr_rest: float, sex: str = "M") -> float:
+    """
+    TRIMP di Banister dallo stream FC al secondo: somma su ogni secondo di
+    HRr · a · e^(b · HRr) / 60, con HRr = riserva cardiaca frazionaria. I campioni a 0
+    (sensore staccato) non contano.
+    """
+    x = np.asarray(hr, dtype=np.float64)
+    x = x[x > 0]
+    if len(x) == 0 or hr_max <= hr_rest:
+        return 0.0
+    a, b = TRIMP_WEIGHTS.get(str(sex).upper()[:1], TRIMP_WEIGHTS["M"])
+    hrr = np.clip((x - hr_rest) / (hr_max - hr_rest), 0.0, 1.0)
+    return float((hrr * a * np.exp(b * hrr)).sum() / 60)
+
+def trimp_from_avg(avg_hr: float, duration_sec: float, hr_max: float, hr_rest: float, sex: str = "M") -> float:
+    """TRIMP dalla sola FC media (corse senza stream)."""
+    if not avg_hr or not duration_sec or hr_max <= hr_rest:
+        return 0.0
+    a, b = TRIMP_WEIGHTS.get(str(sex).upper()[:1], TRIMP_WEIGHTS["M"])
+    hrr = min(max((avg_hr - hr_rest) / (hr_max - hr_rest), 0.0), 1.0)
+    return float(duration_sec / 60 * hrr * a * math.exp(b * hrr))
+
+def tss(watts: Sequence[float], ftp: float) -> float:
+    """Training Stress Score: durata · NP · IF / (FTP · 3600) · 100, con IF = NP / FTP."""
+    if not ftp or len(watts) == 0:
+        return 0.0
+    np_w = normalized_power(watts)
+    return float(len(watts) * np_w * (np_w / ftp) / (ftp * 3600) * 100)
+
+def run_load(watts: Sequence[float], hr: Sequence[float], hr_max: float, hr_rest: float, ftp: float,
+             sex: str = "M", avg_hr: float = 0, duration_sec: float = 0) -> Dict[str, float]:
+    """TRIMP e TSS di una corsa; TRIMP dalla FC media se manca lo stream FC."""
+    t = trimp(hr, hr_max, hr_rest, sex) if hr is not None and len(hr) else 0.0
+    if not t:
+        t = trimp_from_avg(avg_hr, duration_sec, hr_max, hr_rest, sex)
+    s = tss(watts, ftp) if watts is not None and len(watts) else 0.0
+    return {"trimp": round(t, 2), "tss": round(s, 2)}
+
+def advance(state: Optional[LoadState], day: Day, trimp_val: float, tss_val: float, load: float) -> LoadState:
+    """
+    Stato del giorno `day` dopo aver aggiunto un carico, in O(1) dall'ultimo stato salvato.
+    Stesso giorno: il carico si somma a quello già presente. Giorni di pausa nel mezzo:
+    decadimento (1 - k)^giorni. TSB è la forma con cui si arriva al giorno (CTL - ATL del
+    giorno prima). `day` non può precedere quello dello stato (serve un replay).
+    """
+    d = _day(day)
+    if state is None:
+        atl_prev = ctl_prev = 0.0
+    else:
+        last = _day(state["day"])
+        if d < last:
+            raise ValueError(f"Giorno {d} precedente all'ultimo stato ({last})")
+        if d == last:
+            return {
+                "day": d.isoformat(),
+                "load": state["load"] + load,
+                "trimp": state["trimp"] + trimp_val,
+                "tss": state["tss"] + tss_val,
+                "atl": state["atl"] + K_ATL * load,
+                "ctl": state["ctl"] + K_CTL * load,
+                "tsb": state["tsb"]
+            }
+        gap = (d - last).days - 1
+        atl_prev = state["atl"] * (1 - K_ATL) ** gap
+        ctl_prev = state["ctl"] * (1 - K_CTL) ** gap
+    return {
+        "day": d.isoformat(),
+        "load": load,
+        "trimp": trimp_val,
+        "tss": tss_val,
+        "atl": atl_prev * (1 - K_ATL) + K_ATL * load,
+        "ctl": ctl_prev * (1 - K_CTL) + K_CTL * load,
+        "tsb": ctl_prev - atl_prev
+    }
+
+def replay(state: Optional[LoadState], days: Iterable[Dict[str, float]]) -> List[LoadState]:
+    """Ricalcola in ordine i giorni (con i carichi giornalieri già sommati) a partire da `state`."""
+    out = []
+    for row in sorted(days, key=lambda r: _day(r["day"])):
+        state = advance(state, row["day"], row.get("trimp", 0.0), row.get("tss", 0.0), row.get("load", 0.0))
+        out.append(state)
+    return out
+
+def expand_series(rows: Sequence[LoadState], until: Optional[Day] = None) -> List[LoadState]:
+    """
+    Serie giornaliera continua (per i grafici) dalle sole righe dei giorni con carico:
+    i giorni di riposo vengono riempiti con il decadimento, fino a `until` incluso.
+    """
+    out: List[LoadState] = []
+    state = None
+    for row in sorted(rows, key=lambda r: _day(r["day"])):
+        d = _day(row["day"])
+        if state is not None:
+            out.extend(_rest_days(state, d - timedelta(days=1)))
+        state = dict(row)
+        out.append(state)
+    if state is not None and until is not None:
+        out.extend(_rest_days(state, _day(until)))
+    return out
+
+def _rest_days(state: LoadState, until: date) -> List[LoadState]:
+    out = []
+    d, atl, ctl = _day(state["day"]), state["atl"], state["ctl"]
+    while d < until:
+        d += timedelta(days=1)
+        tsb = ctl - atl
+        atl, ctl = atl * (1 - K_ATL), ctl * (1 - K_CTL)
+        out.append({"day": d.isoformat(), "load": 0.0, "trimp": 0.0, "tss": 0.0, "atl": atl, "ctl": ctl, "tsb": tsb})
+    return out
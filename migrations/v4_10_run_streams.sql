@@ -0,0 +1,6 @@
+-- Migration v4.10: Stream al secondo compressi su Supabase
+-- Copia di riferimento degli stream (watts, hr) nello stesso formato dell'archivio locale:
+-- {canale: {dtype, length, data}} con data = base64(zlib(delta(valori))).
+-- .cache/streams.sqlite resta solo una cache: un redeploy non perde gli stream.
+
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS streams JSONB;
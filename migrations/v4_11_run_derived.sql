@@ -0,0 +1,6 @@
+-- Migration v4.11: Metriche derivate persistite con la corsa
+-- Documento {engine_version, fingerprint, data} con data = EF, zone di potenza e campione scatter.
+-- Valido solo per la stessa ENGINE_VERSION e impronta FTP/zone FC; .cache/derived.sqlite resta
+-- solo una cache read-through: un redeploy non obbliga a ricaricare gli stream.
+
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS derived JSONB;
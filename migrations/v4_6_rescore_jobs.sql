@@ -0,0 +1,16 @@
+-- Migration v4.6: Rescore job (ricalcolo storico al cambio di ENGINE_VERSION)
+-- Checkpoint per atleta: il job riparte da last_run_id se interrotto.
+
+CREATE TABLE IF NOT EXISTS rescore_jobs (
+    athlete_id BIGINT PRIMARY KEY REFERENCES athletes(id),
+    target_version TEXT NOT NULL,
+    status TEXT DEFAULT 'running',      -- 'running' | 'done'
+    last_run_id BIGINT,                 -- ultimo id processato (ordine crescente)
+    processed INTEGER DEFAULT 0,
+    updated INTEGER DEFAULT 0,
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Lookup delle corse da ricalcolare
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_version ON runs(athlete_id, score_version);
@@ -0,0 +1,6 @@
+-- Migration v4.7: Sync incrementale Strava
+-- High-water mark per atleta (after=) e cursore del backfill storico (before=).
+
+ALTER TABLE athletes ADD COLUMN IF NOT EXISTS last_activity_at TIMESTAMP WITH TIME ZONE;  -- start_date più recente importata
+ALTER TABLE athletes ADD COLUMN IF NOT EXISTS backfill_before TIMESTAMP WITH TIME ZONE;   -- start_date più vecchia vista dal backfill
+ALTER TABLE athletes ADD COLUMN IF NOT EXISTS backfill_done BOOLEAN DEFAULT FALSE;
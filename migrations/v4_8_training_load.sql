@@ -0,0 +1,19 @@
+-- Migration v4.8: Training load (ATL / CTL / TSB)
+-- Una riga per atleta e giorno con carico: somme giornaliere di TRIMP/TSS e stato del modello
+-- dopo quel giorno. L'ultima riga è lo stato da cui si aggiorna in O(1) la corsa successiva.
+-- TRIMP/TSS della singola corsa restano in runs.raw_data->load.
+
+CREATE TABLE IF NOT EXISTS training_load (
+    athlete_id BIGINT NOT NULL,
+    day DATE NOT NULL,
+    load FLOAT DEFAULT 0,     -- carico del giorno nella metrica configurata (TRIMP o TSS)
+    trimp FLOAT DEFAULT 0,
+    tss FLOAT DEFAULT 0,
+    atl FLOAT DEFAULT 0,      -- fatica, media esponenziale 7 gg
+    ctl FLOAT DEFAULT 0,      -- forma di fondo, media esponenziale 42 gg
+    tsb FLOAT DEFAULT 0,      -- forma in ingresso al giorno (CTL - ATL del giorno prima)
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (athlete_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_training_load_athlete_day ON training_load (athlete_id, day DESC);
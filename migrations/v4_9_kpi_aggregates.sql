@@ -0,0 +1,133 @@
+-- Migration v4.9: Aggregati KPI della dashboard calcolati lato server
+-- run_score_ma: MA7/MA28 dello SCORE per corsa (finestre di 7/28 corse in ordine di data, come
+--   ScoreEngine.calculate_trend_metrics). athlete_weekly_stats / athlete_monthly_stats: corse,
+--   minuti, km e score medio per settimana (bucket pandas 'W-MON', chiusa dal lunedì) e mese.
+-- Tabelle mantenute dai trigger su runs: ogni scrittura ricalcola solo la propria settimana,
+-- il proprio mese e le 28 corse la cui finestra la contiene (niente REFRESH MATERIALIZED VIEW completo).
+
+CREATE TABLE IF NOT EXISTS run_score_ma (
+    run_id BIGINT PRIMARY KEY REFERENCES runs(id) ON DELETE CASCADE,
+    athlete_id BIGINT NOT NULL,
+    date TIMESTAMP WITH TIME ZONE NOT NULL,
+    score FLOAT,
+    ma7 FLOAT,
+    ma28 FLOAT
+);
+
+CREATE INDEX IF NOT EXISTS idx_run_score_ma_athlete_date ON run_score_ma (athlete_id, date DESC);
+
+CREATE TABLE IF NOT EXISTS athlete_weekly_stats (
+    athlete_id BIGINT NOT NULL,
+    week_end DATE NOT NULL,           -- lunedì che chiude la settimana (mar..lun)
+    runs INTEGER NOT NULL,
+    moving_min FLOAT DEFAULT 0,
+    distance_km FLOAT DEFAULT 0,
+    avg_score FLOAT,
+    PRIMARY KEY (athlete_id, week_end)
+);
+
+CREATE TABLE IF NOT EXISTS athlete_monthly_stats (
+    athlete_id BIGINT NOT NULL,
+    month_start DATE NOT NULL,
+    runs INTEGER NOT NULL,
+    moving_min FLOAT DEFAULT 0,
+    distance_km FLOAT DEFAULT 0,
+    avg_score FLOAT,
+    PRIMARY KEY (athlete_id, month_start)
+);
+
+-- Lunedì che chiude la settimana del giorno (lo stesso giorno se è lunedì)
+CREATE OR REPLACE FUNCTION kpi_week_end(p_day DATE) RETURNS DATE AS $$
+    SELECT p_day + ((8 - EXTRACT(ISODOW FROM p_day)::INT) % 7);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- MA delle 28 corse a partire da p_from (le sole la cui finestra contiene una corsa in p_from)
+CREATE OR REPLACE FUNCTION refresh_run_score_ma(p_athlete BIGINT, p_from TIMESTAMP WITH TIME ZONE) RETURNS void AS $$
+DECLARE
+    v_window_start TIMESTAMP WITH TIME ZONE;
+BEGIN
+    SELECT date::TIMESTAMP WITH TIME ZONE INTO v_window_start FROM runs
+    WHERE athlete_id = p_athlete AND date::TIMESTAMP WITH TIME ZONE < p_from
+    ORDER BY date DESC, id DESC OFFSET 26 LIMIT 1;
+
+    INSERT INTO run_score_ma (run_id, athlete_id, date, score, ma7, ma28)
+    SELECT id, p_athlete, d, score, ma7, ma28 FROM (
+        SELECT id, d, score,
+               AVG(score) OVER (ORDER BY d, id ROWS BETWEEN 6 PRECEDING AND CURRENT ROW) AS ma7,
+               AVG(score) OVER (ORDER BY d, id ROWS BETWEEN 27 PRECEDING AND CURRENT ROW) AS ma28
+        FROM (SELECT id, date::TIMESTAMP WITH TIME ZONE AS d, score FROM runs WHERE athlete_id = p_athlete) r
+        WHERE d >= COALESCE(v_window_start, '-infinity')
+    ) w
+    WHERE d >= p_from
+    ORDER BY d, id
+    LIMIT 28
+    ON CONFLICT (run_id) DO UPDATE
+        SET athlete_id = EXCLUDED.athlete_id, date = EXCLUDED.date, score = EXCLUDED.score,
+            ma7 = EXCLUDED.ma7, ma28 = EXCLUDED.ma28;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Settimana e mese del giorno ricalcolati dalle sole corse del periodo
+CREATE OR REPLACE FUNCTION refresh_period_stats(p_athlete BIGINT, p_day DATE) RETURNS void AS $$
+DECLARE
+    v_week_end DATE := kpi_week_end(p_day);
+    v_month DATE := date_trunc('month', p_day)::DATE;
+BEGIN
+    DELETE FROM athlete_weekly_stats WHERE athlete_id = p_athlete AND week_end = v_week_end;
+    INSERT INTO athlete_weekly_stats (athlete_id, week_end, runs, moving_min, distance_km, avg_score)
+    SELECT p_athlete, v_week_end, COUNT(*), COALESCE(SUM(duration_sec), 0) / 60.0, COALESCE(SUM(distance_km), 0), AVG(score)
+    FROM runs WHERE athlete_id = p_athlete AND date::DATE BETWEEN v_week_end - 6 AND v_week_end
+    HAVING COUNT(*) > 0;
+
+    DELETE FROM athlete_monthly_stats WHERE athlete_id = p_athlete AND month_start = v_month;
+    INSERT INTO athlete_monthly_stats (athlete_id, month_start, runs, moving_min, distance_km, avg_score)
+    SELECT p_athlete, v_month, COUNT(*), COALESCE(SUM(duration_sec), 0) / 60.0, COALESCE(SUM(distance_km), 0), AVG(score)
+    FROM runs WHERE athlete_id = p_athlete AND date::DATE >= v_month AND date::DATE < (v_month + INTERVAL '1 month')::DATE
+    HAVING COUNT(*) > 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION runs_kpi_refresh() RETURNS trigger AS $$
+BEGIN
+    -- Vecchia posizione: solo se la corsa sparisce o cambia data/atleta
+    IF (TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (NEW.date IS DISTINCT FROM OLD.date OR NEW.athlete_id IS DISTINCT FROM OLD.athlete_id)))
+       AND OLD.athlete_id IS NOT NULL AND OLD.date IS NOT NULL THEN
+        PERFORM refresh_run_score_ma(OLD.athlete_id, OLD.date::TIMESTAMP WITH TIME ZONE);
+        PERFORM refresh_period_stats(OLD.athlete_id, OLD.date::DATE);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.athlete_id IS NOT NULL AND NEW.date IS NOT NULL THEN
+        IF TG_OP = 'INSERT' OR NEW.date IS DISTINCT FROM OLD.date OR NEW.athlete_id IS DISTINCT FROM OLD.athlete_id
+           OR NEW.score IS DISTINCT FROM OLD.score THEN
+            PERFORM refresh_run_score_ma(NEW.athlete_id, NEW.date::TIMESTAMP WITH TIME ZONE);
+        END IF;
+        PERFORM refresh_period_stats(NEW.athlete_id, NEW.date::DATE);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_runs_kpi_refresh ON runs;
+CREATE TRIGGER trg_runs_kpi_refresh
+    AFTER INSERT OR DELETE OR UPDATE OF athlete_id, date, score, duration_sec, distance_km ON runs
+    FOR EACH ROW EXECUTE FUNCTION runs_kpi_refresh();
+
+-- Popolamento iniziale dallo storico esistente
+INSERT INTO run_score_ma (run_id, athlete_id, date, score, ma7, ma28)
+SELECT id, athlete_id, d, score,
+       AVG(score) OVER (PARTITION BY athlete_id ORDER BY d, id ROWS BETWEEN 6 PRECEDING AND CURRENT ROW),
+       AVG(score) OVER (PARTITION BY athlete_id ORDER BY d, id ROWS BETWEEN 27 PRECEDING AND CURRENT ROW)
+FROM (SELECT id, athlete_id, date::TIMESTAMP WITH TIME ZONE AS d, score FROM runs
+      WHERE athlete_id IS NOT NULL AND date IS NOT NULL) r
+ON CONFLICT (run_id) DO NOTHING;
+
+INSERT INTO athlete_weekly_stats (athlete_id, week_end, runs, moving_min, distance_km, avg_score)
+SELECT athlete_id, kpi_week_end(date::DATE), COUNT(*), COALESCE(SUM(duration_sec), 0) / 60.0, COALESCE(SUM(distance_km), 0), AVG(score)
+FROM runs WHERE athlete_id IS NOT NULL AND date IS NOT NULL
+GROUP BY athlete_id, kpi_week_end(date::DATE)
+ON CONFLICT (athlete_id, week_end) DO NOTHING;
+
+INSERT INTO athlete_monthly_stats (athlete_id, month_start, runs, moving_min, distance_km, avg_score)
+SELECT athlete_id, date_trunc('month', date::DATE)::DATE, COUNT(*), COALESCE(SUM(duration_sec), 0) / 60.0, COALESCE(SUM(distance_km), 0), AVG(score)
+FROM runs WHERE athlete_id IS NOT NULL AND date IS NOT NULL
+GROUP BY athlete_id, date_trunc('month', date::DATE)::DATE
+ON CONFLICT (athlete_id, month_start) DO NOTHING;
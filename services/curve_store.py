@@ -0,0 +1,138 @@
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from engine.power_curve import CURVE_CHANNELS, CURVE_DURATIONS, Curves, envelope_of, merge_envelope
+
+logger = logging.getLogger("sCore.Curves")
+
+STORE_PATH = Path(__file__).parent.parent / ".cache" / "curves.sqlite"
+
+def _to_blob(curve: np.ndarray) -> bytes:
+    return np.asarray(curve, dtype="<f4").tobytes()
+
+def _from_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<f4").astype(np.float64)
+
+class CurveStore:
+    """
+    Cache (SQLite) delle curve mean-max per corsa e dell'inviluppo all-time per atleta.
+    L'inviluppo si aggiorna in O(griglia) a ogni nuova corsa; quello mobile (es. 90 gg)
+    si ricava dalle curve delle sole corse nella finestra.
+    """
+    def __init__(self, path: Union[str, Path] = STORE_PATH):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS run_curves (
+                    run_id INTEGER NOT NULL,
+                    athlete_id INTEGER NOT NULL,
+                    start_ts INTEGER NOT NULL,
+                    channel TEXT NOT NULL,
+                    curve BLOB NOT NULL,        -- float32 sulla griglia curve_durations(durata corsa)
+                    PRIMARY KEY (run_id, channel)
+                );
+                CREATE INDEX IF NOT EXISTS run_curves_athlete_ts ON run_curves (athlete_id, start_ts);
+                CREATE TABLE IF NOT EXISTS athlete_envelopes (
+                    athlete_id INTEGER NOT NULL,
+                    channel TEXT NOT NULL,
+                    grid_size INTEGER NOT NULL, -- griglia base (CURVE_DURATIONS) con cui è stato calcolato
+                    curve BLOB NOT NULL,
+                    PRIMARY KEY (athlete_id, channel)
+                );
+            """)
+            self._conn.commit()
+
+    def get(self, run_id: int) -> Optional[Curves]:
+        with self._lock:
+            rows = self._conn.execute("SELECT channel, curve FROM run_curves WHERE run_id = ?", (int(run_id),)).fetchall()
+        if not rows:
+            return None
+        return {channel: _from_blob(blob) for channel, blob in rows}
+
+    def has(self, run_id: int) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM run_curves WHERE run_id = ? LIMIT 1", (int(run_id),)).fetchone() is not None
+
+    def add(self, athlete_id: int, run_id: int, start_ts: int, curves: Curves):
+        """Salva le curve della corsa e le fonde nell'inviluppo all-time dell'atleta."""
+        with self._lock:
+            known = self._conn.execute("SELECT 1 FROM run_curves WHERE run_id = ? LIMIT 1", (int(run_id),)).fetchone()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO run_curves (run_id, athlete_id, start_ts, channel, curve) VALUES (?, ?, ?, ?, ?)",
+                [(int(run_id), int(athlete_id), int(start_ts), ch, _to_blob(curves[ch])) for ch in CURVE_CHANNELS if ch in curves]
+            )
+            for ch in CURVE_CHANNELS:
+                if ch not in curves:
+                    continue
+                if known:
+                    # Curva sostituita: l'inviluppo potrebbe dover scendere, si ricalcola
+                    env = self._envelope_from_runs(athlete_id, ch)
+                else:
+                    env = merge_envelope(self._load_envelope(athlete_id, ch), curves[ch])
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO athlete_envelopes (athlete_id, channel, grid_size, curve) VALUES (?, ?, ?, ?)",
+                    (int(athlete_id), ch, len(CURVE_DURATIONS), _to_blob(env))
+                )
+            self._conn.commit()
+
+    def _load_envelope(self, athlete_id: int, channel: str) -> Optional[np.ndarray]:
+        row = self._conn.execute(
+            "SELECT grid_size, curve FROM athlete_envelopes WHERE athlete_id = ? AND channel = ?", (int(athlete_id), channel)
+        ).fetchone()
+        # Griglia cambiata: inviluppo non confrontabile, si ricostruisce dalle corse
+        if row is None or row[0] != len(CURVE_DURATIONS):
+            return None
+        return _from_blob(row[1])
+
+    def _envelope_from_runs(self, athlete_id: int, channel: str, since_ts: Optional[int] = None) -> np.ndarray:
+        query = "SELECT curve FROM run_curves WHERE athlete_id = ? AND channel = ?"
+        params: List = [int(athlete_id), channel]
+        if since_ts is not None:
+            query += " AND start_ts >= ?"
+            params.append(int(since_ts))
+        curves = [_from_blob(b) for (b,) in self._conn.execute(query, params).fetchall()]
+        # Curve più lunghe della base: ultra, griglia estesa oltre le 6 h
+        return envelope_of(c for c in curves if len(c) >= len(CURVE_DURATIONS))
+
+    def all_time(self, athlete_id: int) -> Curves:
+        with self._lock:
+            out = {}
+            for ch in CURVE_CHANNELS:
+                env = self._load_envelope(athlete_id, ch)
+                out[ch] = env if env is not None else self._envelope_from_runs(athlete_id, ch)
+            return out
+
+    def rolling(self, athlete_id: int, since_ts: int) -> Curves:
+        """Inviluppo delle corse con start_ts >= since_ts (finestra mobile)."""
+        with self._lock:
+            return {ch: self._envelope_from_runs(athlete_id, ch, since_ts) for ch in CURVE_CHANNELS}
+
+    def drop_athlete(self, athlete_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM run_curves WHERE athlete_id = ?", (int(athlete_id),))
+            self._conn.execute("DELETE FROM athlete_envelopes WHERE athlete_id = ?", (int(athlete_id),))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            runs = self._conn.execute("SELECT COUNT(DISTINCT run_id) FROM run_curves").fetchone()[0]
+        return {"runs": runs}
+
+_store: Optional[CurveStore] = None
+_store_lock = threading.Lock()
+
+def get_curve_store() -> CurveStore:
+    """Cache curve di processo su disco (.cache/curves.sqlite)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CurveStore()
+        return _store
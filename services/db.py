@@ -1,16 +1,53 @@
 from supabase import create_client, Client
 import streamlit as st
 import logging
-from typing import Optional, Dict, List, Any, Tuple
-from datetime import datetime
+import numpy as np
+from typing import Optional, Callable, Dict, Iterator, List, Any, Tuple
+from datetime import datetime, timezone
 from config import Config
+from engine.power_curve import Curves, compute_curves
+from services.curve_store import CurveStore, get_curve_store
+from services.derived_cache import DerivedCache, RunDerivedStore, get_derived_cache
+from services.local_db import get_local_client
+from services.stream_archive import StreamArchive, get_stream_archive
+from services.stream_store import StreamStore, get_stream_store, pack_streams, unpack_streams
 
 # Setup Logger
 logger = logging.getLogger("sCore.DB")
 
 class DatabaseService:
-    def __init__(self, url: str, key: str):
-        self.client: Client = create_client(url, key)
+    # None = archivio stream di processo su disco (get_stream_store)
+    stream_store: Optional[StreamStore] = None
+    # None = archivio mmap di processo su disco (get_stream_archive)
+    stream_archive: Optional[StreamArchive] = None
+    # None = cache curve mean-max di processo su disco (get_curve_store)
+    curve_store: Optional[CurveStore] = None
+    # None = cache metriche derivate di processo su disco (get_derived_cache)
+    derived_cache: Optional[DerivedCache] = None
+
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, backend: Optional[str] = None):
+        # "supabase" (Postgres remoto) o "sqlite" (file locale, stessa interfaccia del client)
+        backend = backend or Config.get_db_backend()
+        if backend == "sqlite":
+            self.client = get_local_client(Config.get_local_db_path())
+        else:
+            self.client: Client = create_client(url, key)
+
+    def get_stream_store(self) -> StreamStore:
+        return self.stream_store or get_stream_store()
+
+    def get_stream_archive(self) -> StreamArchive:
+        return self.stream_archive or get_stream_archive()
+
+    def get_curve_store(self) -> CurveStore:
+        return self.curve_store or get_curve_store()
+
+    def get_derived_cache(self) -> DerivedCache:
+        return self.derived_cache or get_derived_cache()
+
+    def get_derived_store(self) -> RunDerivedStore:
+        """Metriche derivate su runs.derived, con la cache locale davanti"""
+        return RunDerivedStore(self, self.get_derived_cache())
 
     # --- GESTIONE PROFILO ---
     def save_athlete_profile(self, profile_data: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
@@ -62,43 +99,115 @@ class DatabaseService:
     # --- GESTIONE CORSE (RUNS) ---
     def save_run(self, run_data: Dict[str, Any], athlete_id: int) -> bool:
         """Salva una corsa mappando i dati Python -> SQL Supabase"""
+        return run_data.get('id') in self.save_runs_bulk([run_data], athlete_id)["saved"]
+
+    def save_runs_bulk(self, runs: List[Dict[str, Any]], athlete_id: int,
+                       chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Salva più corse con un upsert ogni chunk_size righe (default Config.DB_BATCH_SIZE).
+        Se un chunk fallisce lo si riprova riga per riga per isolare le righe invalide.
+        Cache locali (stream, metriche derivate, curve) aggiornate solo per le corse salvate.
+        Ritorna {"saved": [id], "failed": {id: errore}}.
+        """
+        chunk_size = max(1, chunk_size or Config.DB_BATCH_SIZE)
+        saved: List[int] = []
+        failed: Dict[Any, str] = {}
+        payloads = []
+        for run_data in runs:
+            try:
+                payloads.append(self._run_payload(run_data, athlete_id))
+            except Exception as e:
+                logger.error(f"Error preparing run {run_data.get('id')}: {e}")
+                failed[run_data.get('id')] = str(e)
+
+        for i in range(0, len(payloads), chunk_size):
+            chunk = payloads[i:i + chunk_size]
+            try:
+                self.client.table("runs").upsert(chunk).execute()
+                saved.extend(p["id"] for p in chunk)
+                continue
+            except Exception as e:
+                if len(chunk) == 1:
+                    logger.error(f"Error DB Save Run: {e}")
+                    logger.error(f"Payload: {chunk[0]}")  # Debug info
+                    failed[chunk[0]["id"]] = str(e)
+                    continue
+                logger.error(f"Error DB Save Runs (chunk of {len(chunk)}), retrying row by row: {e}")
+            for payload in chunk:
+                try:
+                    self.client.table("runs").upsert(payload).execute()
+                    saved.append(payload["id"])
+                except Exception as e:
+                    logger.error(f"Error DB Save Run {payload['id']}: {e}")
+                    failed[payload["id"]] = str(e)
+
+        saved_ids = set(saved)
+        self._cache_saved_runs([r for r in runs if r.get('id') in saved_ids], athlete_id)
+        return {"saved": saved, "failed": failed}
+
+    def _run_payload(self, run_data: Dict[str, Any], athlete_id: int) -> Dict[str, Any]:
+        """Riga 'runs' di una corsa (stream compressi in runs.streams), senza effetti collaterali."""
+        raw_data = {
+            "details": run_data.get('SCORE_DETAIL', {}),
+            # Input dello score (meteo, tempo) per il rescore offline
+            "inputs": run_data.get('SCORE_INPUTS', {})
+        }
+        if run_data.get('Load'):
+            # TRIMP/TSS della corsa per il modello di carico (ATL/CTL/TSB)
+            raw_data["load"] = run_data['Load']
+        # Stream al secondo compressi: copia di riferimento in runs.streams
+        streams = {"watts": run_data.get('raw_watts') or [], "hr": run_data.get('raw_hr') or []}
+
+        # MAPPATURA: Chiavi App -> Colonne SQL
+        return {
+            "id": run_data['id'],
+            "athlete_id": athlete_id,
+            "name": run_data.get('name', 'Untitled Run'),  # NEW: activity name
+            "date": run_data['Data'],             
+            "distance_km": run_data['Dist (km)'],
+            "duration_sec": run_data.get('Moving Time') or (len(run_data.get('raw_watts', [])) if run_data.get('raw_watts') else 0),
+            "avg_power": run_data['Power'],
+            "avg_hr": run_data['HR'],
+            "decoupling": run_data['Decoupling'],
+            "score": run_data['SCORE'],
+            "wcf": run_data['WCF'],
+            "wr_pct": run_data['WR_Pct'],
+            "rank": run_data['Rank'],
+            "meteo_desc": run_data['Meteo'],
+            "is_weather_real": run_data.get('is_weather_real', False),
+            "score_version": Config.ENGINE_VERSION,
+            # Gaming Layer
+            "quality": (run_data.get("Quality") or {}).get("label"),
+            "achievements": run_data.get("Achievements", []),
+            "trend": run_data.get("Trend", {}),
+            "comparison": run_data.get("Comparison", {}),
+            # Dati complessi
+            "streams": pack_streams(streams),
+            # Metriche derivate ricalcolate alla prima apertura (come la cache locale, svuotata al salvataggio)
+            "derived": None,
+            "raw_data": raw_data
+        }
+
+    def _cache_saved_runs(self, runs: List[Dict[str, Any]], athlete_id: int):
+        """Cache locali delle corse appena salvate su DB (best-effort): stream, metriche derivate, curve."""
+        if not runs:
+            return
+        ids = [r['id'] for r in runs]
         try:
-            # MAPPATURA: Chiavi App -> Colonne SQL
-            payload = {
-                "id": run_data['id'],
-                "athlete_id": athlete_id,
-                "name": run_data.get('name', 'Untitled Run'),  # NEW: activity name
-                "date": run_data['Data'],             
-                "distance_km": run_data['Dist (km)'],
-                "duration_sec": len(run_data.get('raw_watts', [])) if run_data.get('raw_watts') else 0,
-                "avg_power": run_data['Power'],
-                "avg_hr": run_data['HR'],
-                "decoupling": run_data['Decoupling'],
-                "score": run_data['SCORE'],
-                "wcf": run_data['WCF'],
-                "wr_pct": run_data['WR_Pct'],
-                "rank": run_data['Rank'],
-                "meteo_desc": run_data['Meteo'],
-                "is_weather_real": run_data.get('is_weather_real', False),
-                "score_version": Config.ENGINE_VERSION,
-                # Gaming Layer
-                "quality": run_data.get("Quality", {}).get("label"),
-                "achievements": run_data.get("Achievements", []),
-                "trend": run_data.get("Trend", {}),
-                "comparison": run_data.get("Comparison", {}),
-                # Dati complessi
-                "raw_data": {
-                    "watts": run_data['raw_watts'],
-                    "hr": run_data['raw_hr'],
-                    "details": run_data.get('SCORE_DETAIL', {})
-                }
-            }
-            self.client.table("runs").upsert(payload).execute()
-            return True
+            self.get_stream_store().put_many({r['id']: {"watts": r.get('raw_watts') or [], "hr": r.get('raw_hr') or []} for r in runs})
+            # Stream (ri)scritti: le metriche derivate in cache non valgono più
+            self.get_derived_cache().delete(ids)
         except Exception as e:
-            logger.error(f"Error DB Save Run: {e}")
-            logger.error(f"Payload: {payload}")  # Debug info
-            return False
+            logger.error(f"Error caching streams for runs {ids}: {e}")
+
+        # Curve mean-max della corsa e inviluppo all-time dell'atleta
+        for run_data in runs:
+            try:
+                if run_data.get('raw_watts') or run_data.get('raw_hr'):
+                    self.get_curve_store().add(athlete_id, run_data['id'], _to_epoch(run_data['Data']) or 0,
+                                               compute_curves(run_data.get('raw_watts') or [], run_data.get('raw_hr') or []))
+            except Exception as e:
+                logger.error(f"Error updating curves for run {run_data['id']}: {e}")
 
     def run_exists(self, run_id: int) -> bool:
         try:
@@ -109,14 +218,75 @@ class DatabaseService:
             return False
 
     def get_run_ids_for_athlete(self, athlete_id: int) -> List[int]:
-        """Recupera tutti gli ID delle corse per un atleta specifico"""
+        """Recupera tutti gli ID delle corse per un atleta specifico (a pagine, senza il tetto di righe di PostgREST)"""
         try:
-            res = self.client.table("runs").select("id").eq("athlete_id", athlete_id).execute()
-            return [row['id'] for row in res.data] if res.data else []
+            return [row['id'] for page in self.iter_runs(athlete_id, "id", keys=("id",), desc=False) for row in page]
         except Exception as e:
             logger.error(f"Error getting run IDs for athlete: {e}")
             return []
 
+    # --- PAGINAZIONE KEYSET ---
+    # Cursore = valori delle chiavi dell'ultima riga della pagina precedente; (date, id) rende
+    # l'ordine totale anche con più corse alla stessa data. Niente OFFSET: ogni pagina usa l'indice.
+    RUN_KEYS = ("date", "id")
+
+    def get_runs_page(self, athlete_id: Optional[int], columns: str = "*", after: Optional[Tuple] = None,
+                      page_size: Optional[int] = None, keys: Tuple[str, ...] = RUN_KEYS,
+                      desc: bool = True) -> List[Dict[str, Any]]:
+        """
+        Una pagina di righe 'runs' in ordine di keys (di default dalla più recente) dopo il cursore `after`.
+        Non inghiotte gli errori: una pagina persa troncherebbe in silenzio lo storico.
+        """
+        return self._get_page("runs", columns, _athlete_filter(athlete_id), after, page_size, keys, desc)
+
+    def iter_runs(self, athlete_id: Optional[int], columns: str = "*", page_size: Optional[int] = None,
+                  after: Optional[Tuple] = None, keys: Tuple[str, ...] = RUN_KEYS,
+                  desc: bool = True) -> Iterator[List[Dict[str, Any]]]:
+        """Pagine di righe 'runs' lette una alla volta solo quando il consumatore avanza"""
+        return self._iter_pages("runs", columns, _athlete_filter(athlete_id), page_size, after, keys, desc)
+
+    def _get_page(self, table: str, columns: str, where: Callable, after: Optional[Tuple],
+                  page_size: Optional[int], keys: Tuple[str, ...], desc: bool) -> List[Dict[str, Any]]:
+        """Pagina keyset generica: where(query) applica i filtri, le chiavi del cursore sono aggiunte alla select"""
+        if columns.strip() != "*":
+            listed = {c.strip() for c in columns.split(",")}
+            columns = ", ".join([columns] + [k for k in keys if k not in listed])
+        query = where(self.client.table(table).select(columns))
+        if after is not None:
+            query = _keyset_filter(query, keys, after, desc)
+        for key in keys:
+            query = query.order(key, desc=desc)
+        return query.limit(page_size or Config.DB_PAGE_SIZE).execute().data or []
+
+    def _iter_pages(self, table: str, columns: str, where: Callable, page_size: Optional[int] = None,
+                    after: Optional[Tuple] = None, keys: Tuple[str, ...] = RUN_KEYS,
+                    desc: bool = True) -> Iterator[List[Dict[str, Any]]]:
+        size = page_size or Config.DB_PAGE_SIZE
+        while True:
+            page = self._get_page(table, columns, where, after, size, keys, desc)
+            if not page:
+                return
+            yield page
+            if len(page) < size:
+                return
+            after = tuple(page[-1][k] for k in keys)
+
+    def get_history_page(self, athlete_id: int, after: Optional[Tuple] = None,
+                         page_size: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple]]:
+        """Pagina dello storico (colonne summary) dalla più recente e cursore della successiva (None a fine storico)"""
+        try:
+            size = page_size or Config.DB_PAGE_SIZE
+            rows = self.get_runs_page(athlete_id, self.SUMMARY_COLUMNS, after, size)
+            cursor = tuple(rows[-1][k] for k in self.RUN_KEYS) if len(rows) == size else None
+            return [_map_run_row(row) for row in rows], cursor
+        except Exception as e:
+            logger.error(f"Error DB Get History Page: {e}")
+            return [], None
+
+    # Colonne scalari usate da trend chart, KPI grid e tabella storico (niente stream)
+    SUMMARY_COLUMNS = ("id, date, name, duration_sec, distance_km, avg_power, avg_hr, decoupling, score, wcf, wr_pct, "
+                       "rank, meteo_desc, ai_feedback, quality, achievements, trend, comparison, details:raw_data->details")
+
     def get_history(self, athlete_id: int = None) -> List[Dict[str, Any]]:
         """Carica lo storico mappando SQL Supabase -> Dati Python
         
@@ -125,59 +295,306 @@ class DatabaseService:
                        If None, returns all runs (for admin/debugging).
         """
         try:
-            query = self.client.table("runs").select("*")
-            
-            # Filter by athlete if specified
-            if athlete_id is not None:
-                query = query.eq("athlete_id", athlete_id)
-                
-            response = query.order("date", desc=True).execute()
-            data = response.data if response.data else []
-            
-            processed = []
-            for row in data:
-                # Estrazione sicura dal JSON raw_data
-                raw = row.get('raw_data', {}) or {}
-                
-                # MAPPATURA INVERSA: Colonne SQL -> Chiavi App
-                processed.append({
-                    "id": row['id'],
-                    "Data": row['date'],
-                    "Moving Time": row.get('moving_time', 0),
-                    "Dist (km)": row['distance_km'],
-                    "Power": row['avg_power'],
-                    "HR": row['avg_hr'],
-                    "Decoupling": row['decoupling'],
-                    "SCORE": row['score'],
-                    "WCF": row.get('wcf', 1.0),
-                    "WR_Pct": row.get('wr_pct', 0.0),
-                    "Rank": row['rank'],
-                    "Meteo": row['meteo_desc'],
-                    "ai_feedback": row.get('ai_feedback'),
-                    # Gaming Layer
-                    "Quality": row.get("quality"),
-                    "Achievements": row.get("achievements", []),
-                    "Trend": row.get("trend", {}),
-                    "Comparison": row.get("comparison", {}),
-                    # Dati complessi
-                    "SCORE_DETAIL": raw.get('details', {}),
-                    "raw_watts": raw.get('watts', []),
-                    "raw_hr": raw.get('hr', [])
-                })
-            return processed
+            runs = [_map_run_row(row) for page in self.iter_runs(athlete_id) for row in page]
+            # Corse senza stream nella riga (strip locale pre-v4_10): solo la cache locale li ha
+            stored = self.get_stream_store().get_many(r['id'] for r in runs if not len(r.get('raw_watts', [])))
+            for run in runs:
+                if run['id'] in stored:
+                    run["raw_watts"] = stored[run['id']]['watts']
+                    run["raw_hr"] = stored[run['id']]['hr']
+            return runs
         except Exception as e:
             logger.error(f"Error DB Get History: {e}")
             return []
-            
+
+    def get_history_summary(self, athlete_id: int = None) -> List[Dict[str, Any]]:
+        """Come get_history ma senza gli stream al secondo: usare get_run_streams per la corsa ispezionata"""
+        try:
+            return [_map_run_row(row) for page in self.iter_runs(athlete_id, self.SUMMARY_COLUMNS) for row in page]
+        except Exception as e:
+            logger.error(f"Error DB Get History Summary: {e}")
+            return []
+
+    def get_run_streams(self, run_id: int) -> Dict[str, np.ndarray]:
+        """Stream al secondo (watts, hr) di una singola corsa: cache locale, poi runs.streams o raw_data (legacy)"""
+        empty = {"watts": np.zeros(0, dtype=np.int16), "hr": np.zeros(0, dtype=np.uint8)}
+        try:
+            store = self.get_stream_store()
+            streams = store.get(run_id)
+            if streams is not None:
+                return streams
+            res = self.client.table("runs").select("streams, watts:raw_data->watts, hr:raw_data->hr").eq("id", run_id).execute()
+            row = res.data[0] if res.data else {}
+            if row.get("streams"):
+                streams = unpack_streams(row["streams"])
+            elif row.get("watts") or row.get("hr"):
+                streams = {"watts": row.get("watts") or [], "hr": row.get("hr") or []}
+            else:
+                return empty
+            # Riempie la cache locale (persa a ogni redeploy)
+            store.put(run_id, streams)
+            return store.get(run_id) or empty
+        except Exception as e:
+            logger.error(f"Error loading streams for run {run_id}: {e}")
+            return empty
+
+    def sync_stream_archive(self, athlete_id: int) -> StreamArchive:
+        """
+        Accoda all'archivio mmap dell'atleta le corse che ancora non contiene
+        (stream dall'archivio colonnare, o da raw_data per le righe legacy).
+        """
+        archive = self.get_stream_archive()
+        added = 0
+        try:
+            # A pagine in ordine cronologico: oltre il tetto di righe di PostgREST
+            for page in self.iter_runs(athlete_id, "id, date", desc=False):
+                missing = [r for r in page if not archive.has(athlete_id, r["id"])]
+                stored = self.get_stream_store().get_many(r["id"] for r in missing)
+                for row in missing:
+                    streams = stored.get(row["id"]) or self.get_run_streams(row["id"])
+                    archive.append(athlete_id, row["id"], _to_epoch(row["date"]) or 0, streams)
+                added += len(missing)
+        except Exception as e:
+            logger.error(f"Error listing runs for stream archive: {e}")
+        if added:
+            logger.info(f"Stream archive athlete {athlete_id}: +{added} runs")
+        return archive
+
+    def get_run_curves(self, run_id: int) -> Optional[Curves]:
+        """Curve mean-max (watts, hr) di una corsa dalla cache, calcolate dagli stream se mancano"""
+        store = self.get_curve_store()
+        curves = store.get(run_id)
+        if curves is not None:
+            return curves
+        streams = self.get_run_streams(run_id)
+        if len(streams["watts"]) == 0 and len(streams["hr"]) == 0:
+            return None
+        return compute_curves(streams["watts"], streams["hr"])
+
+    def build_curves(self, athlete_id: int) -> int:
+        """Calcola (dall'archivio mmap) le curve delle corse che non le hanno ancora in cache"""
+        store = self.get_curve_store()
+        added = 0
+        for run_id, start_ts, views in self.sync_stream_archive(athlete_id).iter_views(athlete_id):
+            if store.has(run_id):
+                continue
+            store.add(athlete_id, run_id, start_ts, compute_curves(views["watts"], views["hr"]))
+            added += 1
+        if added:
+            logger.info(f"Curves athlete {athlete_id}: +{added} runs")
+        return added
+
+    def get_athlete_curves(self, athlete_id: int, days: int = 90) -> Dict[str, Curves]:
+        """Inviluppi mean-max dell'atleta: all-time e ultimi `days` giorni"""
+        store = self.get_curve_store()
+        since = int(datetime.now(timezone.utc).timestamp()) - days * 86400
+        return {"all_time": store.all_time(athlete_id), "rolling": store.rolling(athlete_id, since)}
+
+    def migrate_streams(self, athlete_id: Optional[int] = None, page_size: int = 100, strip: bool = False) -> Dict[str, int]:
+        """
+        Copia gli stream JSON di raw_data nella colonna compressa runs.streams (e nella cache
+        locale), a pagine ordinate per id. Con strip=True li rimuove da raw_data nella stessa
+        scrittura: la copia compressa su Supabase resta quella di riferimento.
+        """
+        store = self.get_stream_store()
+        stats = {"scanned": 0, "migrated": 0, "stripped": 0}
+        after_id = None
+        while True:
+            try:
+                query = self.client.table("runs").select("id, athlete_id, date, streams, raw_data")
+                if athlete_id is not None:
+                    query = query.eq("athlete_id", athlete_id)
+                if after_id is not None:
+                    query = query.gt("id", after_id)
+                rows = query.order("id").limit(page_size).execute().data or []
+            except Exception as e:
+                logger.error(f"Error loading runs for stream migration: {e}")
+                break
+            if not rows:
+                break
+            after_id = rows[-1]["id"]
+            stats["scanned"] += len(rows)
+
+            legacy = [r for r in rows if "watts" in (r.get("raw_data") or {}) or "hr" in (r.get("raw_data") or {})]
+            if not legacy:
+                continue
+            streams = {r["id"]: {"watts": r["raw_data"].get("watts") or [], "hr": r["raw_data"].get("hr") or []} for r in legacy}
+            store.put_many(streams)
+
+            # Righe già con la colonna compressa: da riscrivere solo per togliere il JSON
+            pending = [r for r in legacy if strip or not r.get("streams")]
+            updates = [{
+                "id": r["id"],
+                "athlete_id": r["athlete_id"],
+                "date": r["date"],
+                "streams": r.get("streams") or pack_streams(streams[r["id"]]),
+                "raw_data": {k: v for k, v in r["raw_data"].items() if k not in ("watts", "hr")} if strip else r["raw_data"]
+            } for r in pending]
+            if not updates:
+                continue
+            try:
+                self.client.table("runs").upsert(updates).execute()
+                stats["migrated"] += len(updates)
+                if strip:
+                    stats["stripped"] += len(updates)
+            except Exception as e:
+                logger.error(f"Error writing compressed streams: {e}")
+        logger.info(f"Stream migration: {stats}")
+        return stats
+
+    # --- CURSORE SYNC STRAVA ---
+    def get_sync_cursor(self, athlete_id: int) -> Dict[str, Any]:
+        """High-water mark (ultima start_date importata) e stato del backfill, in epoch UTC"""
+        try:
+            res = self.client.table("athletes").select("last_activity_at, backfill_before, backfill_done")\
+                .eq("id", athlete_id).execute()
+            row = res.data[0] if res.data else {}
+            return {
+                "last_activity_at": _to_epoch(row.get("last_activity_at")),
+                "backfill_before": _to_epoch(row.get("backfill_before")),
+                "backfill_done": bool(row.get("backfill_done"))
+            }
+        except Exception as e:
+            logger.error(f"Error loading sync cursor: {e}")
+            return {"last_activity_at": None, "backfill_before": None, "backfill_done": False}
+
+    def save_sync_cursor(self, athlete_id: int, cursor: Dict[str, Any]) -> bool:
+        try:
+            payload = {
+                "last_activity_at": _from_epoch(cursor.get("last_activity_at")),
+                "backfill_before": _from_epoch(cursor.get("backfill_before")),
+                "backfill_done": bool(cursor.get("backfill_done"))
+            }
+            self.client.table("athletes").update(payload).eq("id", athlete_id).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving sync cursor: {e}")
+            return False
+
+    # --- TRAINING LOAD (ATL / CTL / TSB) ---
+    def get_last_load_state(self, athlete_id: int, before_day: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Ultima riga training_load dell'atleta (o l'ultima prima di before_day): stato da cui ripartire"""
+        try:
+            query = self.client.table("training_load").select("day, load, trimp, tss, atl, ctl, tsb").eq("athlete_id", athlete_id)
+            if before_day is not None:
+                query = query.lt("day", before_day)
+            res = query.order("day", desc=True).limit(1).execute()
+            return res.data[0] if res.data else None
+        except Exception as e:
+            logger.error(f"Error loading training load state: {e}")
+            return None
+
+    def get_load_rows(self, athlete_id: int, since_day: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Righe training_load dell'atleta in ordine di giorno (da since_day incluso), a pagine"""
+        try:
+            def where(query):
+                query = query.eq("athlete_id", athlete_id)
+                return query.gte("day", since_day) if since_day is not None else query
+            pages = self._iter_pages("training_load", "day, load, trimp, tss, atl, ctl, tsb", where, keys=("day",), desc=False)
+            return [row for page in pages for row in page]
+        except Exception as e:
+            logger.error(f"Error loading training load: {e}")
+            return []
+
+    def save_load_rows(self, athlete_id: int, rows: List[Dict[str, Any]]) -> bool:
+        """Upsert massivo degli stati giornalieri"""
+        if not rows: return True
+        try:
+            payload = [dict(r, athlete_id=athlete_id) for r in rows]
+            self.client.table("training_load").upsert(payload, on_conflict="athlete_id, day").execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving training load: {e}")
+            return False
+
+    def clear_training_load(self, athlete_id: int) -> bool:
+        try:
+            self.client.table("training_load").delete().eq("athlete_id", athlete_id).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing training load: {e}")
+            return False
+
+    def get_run_loads(self, athlete_id: int) -> List[Dict[str, Any]]:
+        """id, data, durata, FC media e TRIMP/TSS salvati (raw_data->load) di tutte le corse dell'atleta, a pagine"""
+        try:
+            pages = self.iter_runs(athlete_id, "id, date, duration_sec, avg_hr, load:raw_data->load", desc=False)
+            return [row for page in pages for row in page]
+        except Exception as e:
+            logger.error(f"Error loading run loads: {e}")
+            return []
+
+    # --- AGGREGATI KPI (migrazione v4_9, mantenuti dai trigger su runs) ---
+    def get_score_trend(self, athlete_id: int, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """MA7/MA28 per corsa (run_score_ma) in ordine di data, a pagine; [] se gli aggregati non ci sono"""
+        try:
+            def where(query):
+                query = query.eq("athlete_id", athlete_id)
+                return query.gte("date", str(since)) if since is not None else query
+            pages = self._iter_pages("run_score_ma", "run_id, date, score, ma7, ma28", where, keys=("date", "run_id"), desc=False)
+            return [row for page in pages for row in page]
+        except Exception as e:
+            logger.error(f"Error loading score trend: {e}")
+            return []
+
+    def get_weekly_stats(self, athlete_id: int, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Corse/minuti/km/score medio per settimana W-MON (athlete_weekly_stats), in ordine cronologico"""
+        try:
+            query = self.client.table("athlete_weekly_stats").select("week_end, runs, moving_min, distance_km, avg_score")\
+                .eq("athlete_id", athlete_id)
+            if since is not None:
+                query = query.gte("week_end", str(since))
+            return query.order("week_end").execute().data or []
+        except Exception as e:
+            logger.error(f"Error loading weekly stats: {e}")
+            return []
+
+    def get_monthly_stats(self, athlete_id: int, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Corse/minuti/km/score medio per mese (athlete_monthly_stats), in ordine cronologico"""
+        try:
+            query = self.client.table("athlete_monthly_stats").select("month_start, runs, moving_min, distance_km, avg_score")\
+                .eq("athlete_id", athlete_id)
+            if since is not None:
+                query = query.gte("month_start", str(since))
+            return query.order("month_start").execute().data or []
+        except Exception as e:
+            logger.error(f"Error loading monthly stats: {e}")
+            return []
+
     def reset_history(self, athlete_id: int) -> bool:
         """Cancella tutte le corse di un atleta per forzare un ricaricamento pulito."""
         try:
+            run_ids = self.get_run_ids_for_athlete(athlete_id)
             self.client.table("runs").delete().eq("athlete_id", athlete_id).execute()
+            self.get_stream_store().delete(run_ids)
+            self.get_stream_archive().drop(athlete_id)
+            self.get_curve_store().drop_athlete(athlete_id)
+            self.get_derived_cache().delete(run_ids)
+            self.clear_training_load(athlete_id)
+            # Senza corse il cursore non ha senso: la prossima sync riparte dal backfill
+            self.save_sync_cursor(athlete_id, {})
             return True
         except Exception as e:
             logger.error(f"Error resetting history: {e}")
             return False
 
+    def get_run_derived(self, run_id: int) -> Optional[Dict[str, Any]]:
+        """Documento runs.derived della corsa: {engine_version, fingerprint, data} o None"""
+        try:
+            res = self.client.table("runs").select("derived").eq("id", run_id).execute()
+            return res.data[0].get("derived") if res.data else None
+        except Exception as e:
+            logger.error(f"Error loading derived metrics for run {run_id}: {e}")
+            return None
+
+    def save_run_derived(self, run_id: int, doc: Dict[str, Any]) -> bool:
+        try:
+            self.client.table("runs").update({"derived": doc}).eq("id", run_id).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving derived metrics for run {run_id}: {e}")
+            return False
+
     def update_ai_feedback(self, run_id: int, feedback_text: str) -> bool:
         try:
             self.client.table("runs").update({"ai_feedback": feedback_text}).eq("id", run_id).execute()
@@ -228,6 +645,73 @@ class DatabaseService:
             logger.error(f"Error saving replay: {e}")
             return False
 
+    def save_replays(self, replays: List[Dict[str, Any]]) -> bool:
+        """Insert massivo di righe score_replay (audit del rescore)"""
+        if not replays: return True
+        try:
+            self.client.table("score_replay").insert(replays).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving replays: {e}")
+            return False
+
+    # --- RESCORE (ENGINE_VERSION) ---
+    RESCORE_COLUMNS = "id, athlete_id, date, distance_km, duration_sec, avg_power, avg_hr, decoupling, score, wcf, rank, quality, meteo_desc, score_version, streams, raw_data"
+
+    def count_stale_runs(self, athlete_id: int, engine_version: str) -> int:
+        """Numero di corse calcolate con una versione del motore diversa da quella corrente (o senza versione)"""
+        try:
+            # neq da solo escluderebbe le righe legacy con score_version NULL
+            res = self.client.table("runs").select("id", count="exact")\
+                .eq("athlete_id", athlete_id)\
+                .or_(f'score_version.is.null,score_version.neq."{engine_version}"')\
+                .limit(1).execute()
+            return res.count or 0
+        except Exception as e:
+            logger.error(f"Error counting stale runs: {e}")
+            return 0
+
+    def iter_rescore_pages(self, athlete_id: int, after_id: Optional[int] = None,
+                           page_size: int = 200) -> Iterator[List[Dict[str, Any]]]:
+        """Pagine di righe 'runs' grezze (ordinate per id, ripartibili da after_id) per il job di rescore"""
+        after = (after_id,) if after_id is not None else None
+        for rows in self.iter_runs(athlete_id, self.RESCORE_COLUMNS, page_size, after, keys=("id",), desc=False):
+            # Stream da runs.streams; cache locale per le righe senza (le legacy li hanno in raw_data)
+            stored = self.get_stream_store().get_many(r["id"] for r in rows if not r.get("streams"))
+            for row in rows:
+                if row.get("streams"):
+                    row["streams"] = unpack_streams(row["streams"])
+                elif row["id"] in stored:
+                    row["streams"] = stored[row["id"]]
+            yield rows
+
+    def save_rescored_runs(self, rows: List[Dict[str, Any]]) -> bool:
+        """Upsert massivo delle sole colonne di score ricalcolate"""
+        if not rows: return True
+        try:
+            self.client.table("runs").upsert(rows).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving rescored runs: {e}")
+            return False
+
+    def get_rescore_checkpoint(self, athlete_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            res = self.client.table("rescore_jobs").select("*").eq("athlete_id", athlete_id).execute()
+            return res.data[0] if res.data else None
+        except Exception as e:
+            logger.error(f"Error loading rescore checkpoint: {e}")
+            return None
+
+    def save_rescore_checkpoint(self, checkpoint: Dict[str, Any]) -> bool:
+        try:
+            payload = dict(checkpoint, updated_at=datetime.now().isoformat())
+            self.client.table("rescore_jobs").upsert(payload, on_conflict="athlete_id").execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving rescore checkpoint: {e}")
+            return False
+
     def log_achievement(self, log_data: Dict[str, Any]) -> bool:
         try:
             self.client.table("achievements_log").insert(log_data).execute()
@@ -255,47 +739,58 @@ class DatabaseService:
 
     def update_athlete_baseline(self, athlete_id: int, distance_label: str, new_time_adj: float):
         """
-        Aggiorna (o crea) la baseline per una distanza specifica.
-        Usa UPSERT per evitare errori di duplicati.
+        Aggiorna (o crea) la baseline per una distanza specifica solo se migliora (T_adj più basso).
+        Per la sync usare get_athlete_baselines + save_athlete_baselines (un solo round-trip).
         """
+        current = self.get_athlete_baseline(athlete_id, distance_label)
+        if current is not None and current <= new_time_adj:
+            return None
+        if self.save_athlete_baselines(athlete_id, {distance_label: new_time_adj}):
+            logger.info(f"🏆 Baseline aggiornata per {distance_label}: {new_time_adj:.2f}s")
+            return {distance_label: new_time_adj}
+        return None
+
+    def get_athlete_baselines(self, athlete_id: int) -> Dict[str, float]:
+        """Tutte le baseline (distance_label -> best_time_adj) dell'atleta in una query."""
         try:
-            data = {
+            res = self.client.table("athlete_baselines") \
+                .select("distance_label, best_time_adj") \
+                .eq("athlete_id", athlete_id) \
+                .execute()
+            return {r["distance_label"]: r["best_time_adj"] for r in (res.data or []) if r.get("best_time_adj") is not None}
+        except Exception as e:
+            logger.error(f"Errore recupero baseline: {e}")
+            return {}
+
+    def save_athlete_baselines(self, athlete_id: int, baselines: Dict[str, float]) -> bool:
+        """Upsert massivo delle baseline (distance_label -> best_time_adj)."""
+        if not baselines: return True
+        try:
+            now = datetime.now().isoformat()
+            rows = [{
                 "athlete_id": athlete_id,
-                "distance_label": distance_label,
-                "best_time_adj": new_time_adj,
-                "updated_at": datetime.now().isoformat()
-            }
-            
-            # Upsert con gestione conflitti
-            response = self.client.table("athlete_baselines").upsert(
-                data, 
-                on_conflict="athlete_id, distance_label"
-            ).execute()
-            
-            logger.info(f"🏆 Baseline aggiornata per {distance_label}: {new_time_adj:.2f}s")
-            return response.data
-            
+                "distance_label": label,
+                "best_time_adj": t_adj,
+                "updated_at": now
+            } for label, t_adj in baselines.items()]
+            self.client.table("athlete_baselines").upsert(rows, on_conflict="athlete_id, distance_label").execute()
+            return True
         except Exception as e:
             logger.error(f"Errore aggiornamento baseline: {e}")
-            return None
+            return False
 
-    def get_weather_audit(self, limit: int = 15) -> List[Dict[str, Any]]:
+    def get_weather_audit(self, limit: int = 15, after: Optional[Tuple] = None) -> List[Dict[str, Any]]:
         """
         Recupera dati per audit meteo: Date, Name, Temp, Hum, is_weather_real
+        (una pagina dalla più recente; after = (date, id) dell'ultima corsa della pagina precedente)
         """
         try:
             # Recuperiamo tutto per flessibilità (o specificare colonne se schema è certo)
             # Assumiamo che le colonne 'is_weather_real' e 'name' esistano o siano in raw_data
             # Se la colonna non esiste nella select standard, Supabase potrebbe ignorarla o errorare.
             # Usiamo * e processiamo in python per sicurezza
-            res = self.client.table("runs")\
-                .select("*")\
-                .order("date", desc=True)\
-                .limit(limit)\
-                .execute()
-            
             data = []
-            for r in res.data:
+            for r in self.get_runs_page(None, "*", after, page_size=limit):
                 # Estrazione sicura
                 raw = r.get("raw_data", {}) or {}
                 
@@ -317,6 +812,7 @@ class DatabaseService:
                 if hum is None: hum = raw.get("humidity", 50.0)
 
                 data.append({
+                    "id": r.get("id"),
                     "start_time": r.get("date"),
                     "name": name,
                     "temperature": temp,
@@ -329,3 +825,63 @@ class DatabaseService:
             logger.error(f"Errore audit meteo: {e}")
             return []
 
+def _athlete_filter(athlete_id: Optional[int]) -> Callable:
+    return lambda query: query.eq("athlete_id", athlete_id) if athlete_id is not None else query
+
+def _keyset_filter(query, keys: Tuple[str, ...], after: Tuple, desc: bool):
+    """Righe strettamente dopo il cursore nell'ordine (keys, desc): (k1 < v1) OR (k1 = v1 AND k2 < v2) ..."""
+    op = "lt" if desc else "gt"
+    # Stringhe tra virgolette (date ISO con ':' e '+'), numeri senza
+    fmt = lambda v: str(v) if isinstance(v, (int, float)) else f'"{v}"'
+    if len(keys) == 1:
+        return getattr(query, op)(keys[0], after[0])
+    terms = []
+    for i, key in enumerate(keys):
+        conds = [f"{k}.eq.{fmt(v)}" for k, v in zip(keys[:i], after[:i])] + [f"{key}.{op}.{fmt(after[i])}"]
+        terms.append(conds[0] if len(conds) == 1 else f"and({','.join(conds)})")
+    return query.or_(",".join(terms))
+
+def _to_epoch(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+
+def _from_epoch(value: Optional[int]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, tz=timezone.utc).isoformat()
+
+def _map_run_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """MAPPATURA INVERSA: Colonne SQL -> Chiavi App (riga completa o summary)"""
+    # Estrazione sicura dal JSON raw_data (assente nelle righe summary)
+    raw = row.get('raw_data', {}) or {}
+    run = {
+        "id": row['id'],
+        "name": row.get('name'),
+        "Data": row['date'],
+        "Moving Time": row.get('moving_time') or row.get('duration_sec', 0),
+        "Dist (km)": row['distance_km'],
+        "Power": row['avg_power'],
+        "HR": row['avg_hr'],
+        "Decoupling": row['decoupling'],
+        "SCORE": row['score'],
+        "WCF": row.get('wcf', 1.0),
+        "WR_Pct": row.get('wr_pct', 0.0),
+        "Rank": row['rank'],
+        "Meteo": row['meteo_desc'],
+        "ai_feedback": row.get('ai_feedback'),
+        # Gaming Layer
+        "Quality": row.get("quality"),
+        "Achievements": row.get("achievements", []),
+        "Trend": row.get("trend", {}),
+        "Comparison": row.get("comparison", {}),
+        # Dati complessi
+        "SCORE_DETAIL": row.get('details') or raw.get('details', {})
+    }
+    if row.get('streams'):
+        streams = unpack_streams(row['streams'])
+        run["raw_watts"], run["raw_hr"] = streams['watts'], streams['hr']
+    elif 'raw_data' in row:
+        run["raw_watts"] = raw.get('watts', [])
+        run["raw_hr"] = raw.get('hr', [])
+    return run
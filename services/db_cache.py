@@ -0,0 +1,159 @@
+import copy
+import inspect
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from config import Config
+
+logger = logging.getLogger("sCore.DBCache")
+
+# Gruppi di letture per atleta invalidati insieme da una scrittura
+READ_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "profile": ("get_athlete_profile",),
+    "runs": ("get_history", "get_history_summary", "get_run_ids_for_athlete",
+             "get_score_trend", "get_weekly_stats", "get_monthly_stats"),
+    "baselines": ("get_athlete_baselines", "get_athlete_baseline"),
+}
+ALL = object()  # scrittura non riconducibile a un atleta: invalida il gruppo per tutti
+
+def _cacheable(value: Any) -> bool:
+    """
+    Le letture di DatabaseService in errore ripiegano su None/[]/{}: indistinguibili da
+    un risultato vuoto, quindi i vuoti non si memorizzano (altrimenti un errore transitorio
+    verrebbe servito per tutto il TTL, es. get_run_ids_for_athlete vuoto = primo sync).
+    """
+    return value is not None and not (hasattr(value, "__len__") and len(value) == 0)
+
+def _athlete_arg(args: Dict[str, Any]) -> Any:
+    return args.get("athlete_id")
+
+def _profile_id(args: Dict[str, Any]) -> Any:
+    return (args.get("profile_data") or {}).get("id", ALL)
+
+def _rows_athletes(args: Dict[str, Any]) -> Any:
+    athletes = {r.get("athlete_id") for r in args.get("rows") or []}
+    return ALL if not athletes or None in athletes else athletes
+
+# Scritture write-through: metodo -> (atleta/i coinvolti, gruppi da invalidare)
+WRITES: Dict[str, Tuple[Callable[[Dict[str, Any]], Any], Tuple[str, ...]]] = {
+    "save_run": (_athlete_arg, ("runs",)),
+    "save_runs_bulk": (_athlete_arg, ("runs",)),
+    "save_rescored_runs": (_rows_athletes, ("runs",)),
+    "migrate_streams": (lambda a: a.get("athlete_id") or ALL, ("runs",)),
+    "update_ai_feedback": (lambda a: ALL, ("runs",)),
+    "save_athlete_profile": (_profile_id, ("profile",)),
+    "update_athlete_zones": (_athlete_arg, ("profile",)),
+    "save_sync_cursor": (_athlete_arg, ("profile",)),
+    "update_streak": (_athlete_arg, ("profile",)),
+    "update_athlete_baseline": (_athlete_arg, ("baselines",)),
+    "save_athlete_baselines": (_athlete_arg, ("baselines",)),
+    "reset_history": (_athlete_arg, tuple(READ_GROUPS)),
+}
+
+class DBCache:
+    """
+    Store di processo delle letture memorizzate: chiave (metodo, argomenti), scadenza per TTL,
+    indicizzato per atleta per l'invalidazione. Contatori hit/miss per metodo.
+    """
+    def __init__(self):
+        self._entries: Dict[Tuple, Tuple[float, Any, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses[key[0]] += 1
+                return False, None
+            self.hits[key[0]] += 1
+            return True, copy.deepcopy(entry[2])
+
+    def put(self, key: Tuple, athlete_id: Any, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, athlete_id, copy.deepcopy(value))
+
+    def invalidate(self, athletes: Any, methods: Iterable[str]):
+        """Scarta le letture dei metodi per gli atleti indicati (ALL = tutti); anche quelle senza atleta."""
+        methods = set(methods)
+        if athletes is not ALL and not isinstance(athletes, (set, list, tuple)):
+            athletes = {athletes}
+        with self._lock:
+            stale = [k for k, (_, a, _) in self._entries.items()
+                     if k[0] in methods and (athletes is ALL or a is None or a in athletes)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+        methods = sorted(set(self.hits) | set(self.misses))
+        return {
+            "entries": entries,
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "methods": {m: {"hits": self.hits[m], "misses": self.misses[m]} for m in methods},
+        }
+
+class CachedDatabaseService:
+    """
+    Decoratore read-through di DatabaseService: i metodi in Config.DB_CACHE_TTL sono
+    memorizzati per (metodo, atleta, argomenti) fino al TTL (risultati vuoti esclusi); le scritture in WRITES
+    passano al DB e poi invalidano le letture dell'atleta. Tutto il resto è delegato.
+    """
+    def __init__(self, db, cache: Optional[DBCache] = None, ttls: Optional[Dict[str, float]] = None):
+        self._db = db
+        self._cache = cache or get_db_cache()
+        self._ttls = Config.DB_CACHE_TTL if ttls is None else ttls
+
+    @property
+    def db(self):
+        return self._db
+
+    def _bind(self, fn: Callable, args: tuple, kwargs: dict) -> Dict[str, Any]:
+        bound = inspect.signature(fn).bind(*args, **kwargs)
+        bound.apply_defaults()
+        return dict(bound.arguments)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._db, name)
+        if name in self._ttls and callable(attr):
+            def cached(*args, **kwargs):
+                bound = self._bind(attr, args, kwargs)
+                key = (name,) + tuple(sorted(bound.items(), key=lambda kv: kv[0]))
+                found, value = self._cache.get(key)
+                if found:
+                    return value
+                value = attr(*args, **kwargs)
+                if _cacheable(value):
+                    self._cache.put(key, bound.get("athlete_id"), value, self._ttls[name])
+                return value
+            return cached
+        if name in WRITES and callable(attr):
+            def write_through(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                athletes, groups = WRITES[name]
+                self._cache.invalidate(athletes(self._bind(attr, args, kwargs)),
+                                       [m for g in groups for m in READ_GROUPS[g]])
+                return result
+            return write_through
+        return attr
+
+_cache: Optional[DBCache] = None
+_cache_lock = threading.Lock()
+
+def get_db_cache() -> DBCache:
+    """Cache letture DB di processo (in memoria, condivisa tra i rerun Streamlit)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DBCache()
+        return _cache
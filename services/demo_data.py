@@ -98,15 +98,7 @@ def generate_demo_data():
             "Quality": quality,
             "Meteo": f"{temp}°C",
             "ai_feedback": None,
-            "SCORE_DETAIL": {
-                "W/kg": round(metrics.w_kg, 2),
-                "Nominal": round(details.get('nominal_pwr', 0), 2),
-                "Mech Eff": round(details.get('mech_eff', 0), 2),
-                "Metabolic Eff": round(details.get('metabolic_eff', 0), 2),
-                "WCF": round(details.get('wcf', 1.0), 2),
-                "Stability": round(details.get('stability', 0), 2),
-                "Target T_adj": "N/A"
-            },
+            "SCORE_DETAIL": engine.score_detail(metrics.w_kg, details),
             "raw_watts": raw_watts,
             "raw_hr": raw_hr,
             "Achievements": ["🎯 Personal Best 5K"] if i == 5 else [],
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+from config import Config
+
+logger = logging.getLogger("sCore.DerivedCache")
+
+CACHE_PATH = Path(__file__).parent.parent / ".cache" / "derived.sqlite"
+# Budget su disco delle metriche derivate (payload compressi); oltre si sfrattano le meno usate
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+def profile_fingerprint(ftp: Any, hr_zones: Any = None) -> str:
+    """Impronta dei parametri atleta che influenzano le metriche derivate (FTP e zone FC)."""
+    blob = json.dumps({"ftp": ftp, "hr_zones": hr_zones}, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+class DerivedCache:
+    """
+    Cache (SQLite) delle metriche derivate di una corsa (EF, zone, campione scatter),
+    una voce per corsa valida solo per la stessa (ENGINE_VERSION, impronta FTP/zone):
+    se cambia uno dei due la voce non combacia e viene ricalcolata e sostituita.
+    Sfratto LRU quando i payload superano max_bytes.
+    """
+    def __init__(self, path: Union[str, Path] = CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS run_derived (
+                    run_id INTEGER PRIMARY KEY,
+                    engine_version TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    payload BLOB NOT NULL,      -- JSON compresso (zlib)
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS run_derived_lru ON run_derived (last_access);
+            """)
+            self._conn.commit()
+
+    @staticmethod
+    def _key(ftp: Any, hr_zones: Any) -> Tuple[str, str]:
+        return Config.ENGINE_VERSION, profile_fingerprint(ftp, hr_zones)
+
+    def get(self, run_id: int, ftp: Any, hr_zones: Any = None) -> Optional[Dict[str, Any]]:
+        engine_version, fingerprint = self._key(ftp, hr_zones)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM run_derived WHERE run_id = ? AND engine_version = ? AND fingerprint = ?",
+                (int(run_id), engine_version, fingerprint)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._conn.execute("UPDATE run_derived SET last_access = ? WHERE run_id = ?", (time.time(), int(run_id)))
+            self._conn.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, run_id: int, ftp: Any, hr_zones: Any, derived: Dict[str, Any]):
+        engine_version, fingerprint = self._key(ftp, hr_zones)
+        blob = zlib.compress(json.dumps(derived, default=float).encode(), 6)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO run_derived (run_id, engine_version, fingerprint, payload, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (int(run_id), engine_version, fingerprint, blob, len(blob), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM run_derived").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for run_id, size in self._conn.execute("SELECT run_id, size FROM run_derived ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM run_derived WHERE run_id = ?", (run_id,))
+            total -= size
+            evicted += 1
+        logger.info(f"Derived cache: evicted {evicted} runs ({total} bytes left)")
+
+    def delete(self, run_ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM run_derived WHERE run_id = ?", [(int(r),) for r in run_ids])
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            runs, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM run_derived").fetchone()
+        return {"runs": runs, "bytes": size, "hits": self._hits, "misses": self._misses}
+
+class RunDerivedStore:
+    """
+    Metriche derivate persistite con la corsa (colonna runs.derived, vedi
+    DatabaseService.save_run_derived), con la DerivedCache locale come strato read-through:
+    il file SQLite si può perdere a ogni redeploy. Stessa interfaccia get/put di DerivedCache.
+    """
+    def __init__(self, db, local: DerivedCache):
+        self.db = db
+        self.local = local
+
+    def get(self, run_id: int, ftp: Any, hr_zones: Any = None) -> Optional[Dict[str, Any]]:
+        cached = self.local.get(run_id, ftp, hr_zones)
+        if cached is not None:
+            return cached
+        engine_version, fingerprint = DerivedCache._key(ftp, hr_zones)
+        doc = self.db.get_run_derived(run_id)
+        if not doc or doc.get("engine_version") != engine_version or doc.get("fingerprint") != fingerprint:
+            return None
+        self.local.put(run_id, ftp, hr_zones, doc["data"])
+        return doc["data"]
+
+    def put(self, run_id: int, ftp: Any, hr_zones: Any, derived: Dict[str, Any]):
+        self.local.put(run_id, ftp, hr_zones, derived)
+        engine_version, fingerprint = DerivedCache._key(ftp, hr_zones)
+        # Tipi NumPy -> JSON puro, come nel payload locale
+        data = json.loads(json.dumps(derived, default=float))
+        self.db.save_run_derived(run_id, {"engine_version": engine_version, "fingerprint": fingerprint, "data": data})
+
+_cache: Optional[DerivedCache] = None
+_cache_lock = threading.Lock()
+
+def get_derived_cache() -> DerivedCache:
+    """Cache metriche derivate di processo su disco (.cache/derived.sqlite)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DerivedCache()
+        return _cache
@@ -0,0 +1,62 @@
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("sCore.HTTP")
+
+# Connessioni keep-alive per host: almeno quanti worker di sync lavorano in parallelo
+DEFAULT_POOL_SIZE = 16
+# Host distinti tenuti in cache dal pool manager (Strava, Open-Meteo archive/forecast, ...)
+DEFAULT_POOL_HOSTS = 4
+
+class PooledSession(requests.Session):
+    """
+    requests.Session con pool di connessioni persistenti (keep-alive, gzip).
+    Condivisibile tra i worker di sync: urllib3 gestisce il pool in modo thread-safe.
+    """
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, pool_hosts: int = DEFAULT_POOL_HOSTS):
+        super().__init__()
+        self.adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, pool_block=False)
+        self.mount("https://", self.adapter)
+        self.mount("http://", self.adapter)
+        self.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+
+    def stats(self) -> Dict[str, Any]:
+        """Richieste vs connessioni aperte: la differenza sono le connessioni riusate."""
+        pools = self.adapter.poolmanager.pools
+        per_host = {}
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            per_host[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "requests": pool.num_requests,
+                "connections": pool.num_connections
+            }
+        requests_made = sum(h["requests"] for h in per_host.values())
+        opened = sum(h["connections"] for h in per_host.values())
+        return {
+            "requests": requests_made,
+            "connections_opened": opened,
+            "connections_reused": max(0, requests_made - opened),
+            "hosts": per_host
+        }
+
+_sessions: Dict[str, PooledSession] = {}
+_sessions_lock = threading.Lock()
+
+def get_session(name: str, pool_size: Optional[int] = None) -> PooledSession:
+    """Sessione di processo per servizio ('strava', 'meteo'), condivisa tra rerun e worker."""
+    with _sessions_lock:
+        if name not in _sessions:
+            _sessions[name] = PooledSession(pool_size or DEFAULT_POOL_SIZE)
+        return _sessions[name]
+
+def session_stats() -> Dict[str, Dict[str, Any]]:
+    """Statistiche di riuso connessioni di tutte le sessioni condivise (Dev Console)."""
+    with _sessions_lock:
+        sessions = dict(_sessions)
+    return {name: s.stats() for name, s in sessions.items()}
@@ -0,0 +1,358 @@
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger("sCore.LocalDB")
+
+DB_PATH = Path(__file__).parent.parent / ".cache" / "score.sqlite"
+
+# Schema delle tabelle Supabase: chiave primaria (conflict target di default) e indici.
+# Le colonne di chiave e indice sono colonne reali (indicizzate), il resto della riga
+# sta nel documento JSON `doc`. identity = id BIGINT GENERATED BY DEFAULT AS IDENTITY.
+TABLES: Dict[str, Dict[str, Any]] = {
+    "athletes": {"key": ("id",)},
+    "runs": {"key": ("id",), "indexes": [("athlete_id", "date DESC"), ("athlete_id", "score_version")]},
+    "athlete_bests": {"key": ("athlete_id", "distance_type")},
+    "athlete_baselines": {"key": ("athlete_id", "distance_label")},
+    "rescore_jobs": {"key": ("athlete_id",)},
+    "training_load": {"key": ("athlete_id", "day"), "indexes": [("athlete_id", "day DESC")]},
+    "score_replay": {"key": ("id",), "identity": True, "indexes": [("run_id",)]},
+    "achievements_log": {"key": ("id",), "identity": True, "indexes": [("athlete_id",)]},
+    "feedback": {"key": ("id",), "identity": True},
+    # Aggregati KPI v4_9: in Postgres li mantengono i trigger, qui restano vuoti (fallback pandas)
+    "run_score_ma": {"key": ("run_id",), "indexes": [("athlete_id", "date DESC")]},
+    "athlete_weekly_stats": {"key": ("athlete_id", "week_end")},
+    "athlete_monthly_stats": {"key": ("athlete_id", "month_start")},
+}
+# Tabelle non elencate: id identity, nessun indice secondario
+DEFAULT_TABLE: Dict[str, Any] = {"key": ("id",), "identity": True}
+
+def _columns(spec: Dict[str, Any]) -> List[str]:
+    cols = list(spec["key"])
+    for index in spec.get("indexes", []):
+        cols += [c.split()[0] for c in index if c.split()[0] not in cols]
+    return cols
+
+def _json_path(parts: List[str]) -> str:
+    return "$" + "".join(f'."{p}"' for p in parts)
+
+SQL_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "is": "IS"}
+IS_VALUES = {"null": None, "true": True, "false": False}
+
+def _split_top(expr: str) -> List[str]:
+    """Separa per virgola fuori da parentesi e virgolette"""
+    parts, depth, quoted, cur = [], 0, False, ""
+    for ch in expr:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch in "()":
+            depth += 1 if ch == "(" else -1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append(cur)
+            cur = ""
+            continue
+        cur += ch
+    return parts + [cur] if cur else parts
+
+def _literal(raw: str) -> Any:
+    if raw.startswith('"') and raw.endswith('"'):
+        return raw[1:-1]
+    for cast in (int, float):
+        try:
+            return cast(raw)
+        except ValueError:
+            pass
+    return raw
+
+def parse_or_filter(expr: str) -> List[List[Tuple[str, str, Any]]]:
+    """
+    Filtro logico PostgREST di or_() -> disgiunzione di congiunzioni [(col, op, valore)].
+    Supporta 'col.op.valore' (eq/neq/gt/gte/lt/lte, valori anche tra virgolette),
+    'col.is.null|true|false' e 'and(...)'.
+    """
+    terms = []
+    for term in _split_top(expr.strip()):
+        term = term.strip()
+        if term.startswith("and(") and term.endswith(")"):
+            conj = []
+            for inner in _split_top(term[4:-1]):
+                conj += [c for alt in parse_or_filter(inner) for c in alt]
+            terms.append(conj)
+        else:
+            col, op, value = term.split(".", 2)
+            if op not in SQL_OPS or (op == "is" and value not in IS_VALUES):
+                raise ValueError(f"Unsupported filter operator: {op}")
+            terms.append([(col, op, IS_VALUES[value] if op == "is" else _literal(value))])
+    return terms
+
+def _sql_value(value: Any) -> Any:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+class LocalResponse:
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+class LocalQuery:
+    """Sottoinsieme del query builder postgrest usato da DatabaseService, tradotto in SQL."""
+    def __init__(self, client: "SQLiteClient", table: str):
+        self.client = client
+        self.table = table
+        self.spec = TABLES.get(table, DEFAULT_TABLE)
+        self.real = _columns(self.spec)
+        self.op = "select"
+        self.columns = "*"
+        self.count_mode = None
+        self.filters: List[Tuple[str, str, Any]] = []
+        self.orders: List[Tuple[str, bool]] = []
+        self.limit_n: Optional[int] = None
+        self.offset = 0
+        self.payload = None
+        self.on_conflict = ",".join(self.spec["key"])
+
+    # --- operazioni ---
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.op, self.columns, self.count_mode = "select", columns, count
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None):
+        self.op, self.payload = "upsert", rows if isinstance(rows, list) else [rows]
+        if on_conflict:
+            self.on_conflict = on_conflict
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # --- filtri ---
+    def _f(self, col, op, value):
+        self.filters.append((col, op, value))
+        return self
+
+    def eq(self, col, v): return self._f(col, "=", v)
+    def neq(self, col, v): return self._f(col, "!=", v)
+    def gt(self, col, v): return self._f(col, ">", v)
+    def gte(self, col, v): return self._f(col, ">=", v)
+    def lt(self, col, v): return self._f(col, "<", v)
+    def lte(self, col, v): return self._f(col, "<=", v)
+    def in_(self, col, values): return self._f(col, "IN", list(values))
+    def or_(self, filters: str): return self._f(None, "OR", parse_or_filter(filters))
+
+    def order(self, col, desc: bool = False):
+        self.orders.append((col, desc))
+        return self
+
+    def limit(self, n: int):
+        self.limit_n = n
+        return self
+
+    def range(self, start: int, end: int):
+        self.offset, self.limit_n = start, end - start + 1
+        return self
+
+    # --- SQL ---
+    def _expr(self, col: str) -> str:
+        """Colonna reale (indicizzata) o estrazione dal documento JSON"""
+        parts = col.strip().split("->")
+        if len(parts) == 1 and parts[0] in self.real:
+            return f'"{parts[0]}"'
+        return f"json_extract(doc, '{_json_path(parts)}')"
+
+    def _where(self) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for col, op, value in self.filters:
+            if op == "OR":
+                alts = []
+                for conj in value:
+                    alts.append("(" + " AND ".join(f"{self._expr(c)} {SQL_OPS[o]} ?" for c, o, _ in conj) + ")")
+                    params += [_sql_value(v) for _, _, v in conj]
+                clauses.append("(" + " OR ".join(alts) + ")")
+            elif op == "IN":
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{self._expr(col)} IN ({', '.join('?' * len(value))})")
+                params += [_sql_value(v) for v in value]
+            else:
+                clauses.append(f"{self._expr(col)} {op} ?")
+                params.append(_sql_value(value))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _projection(self) -> Tuple[str, Optional[List[str]]]:
+        if self.columns.strip() == "*":
+            return "doc", None
+        names, exprs = [], []
+        for col in (c.strip() for c in self.columns.split(",")):
+            alias, _, path = col.rpartition(":")
+            parts = path.strip().split("->")
+            names.append(alias.strip() or parts[-1])
+            exprs.append(f"json_extract(doc, '{_json_path(parts)}')")
+        # Un solo array JSON per riga: oggetti annidati e scalari tornano con il tipo giusto
+        return f"json_array({', '.join(exprs)})", names
+
+    def _row_values(self, doc: Dict[str, Any]) -> List[Any]:
+        return [_sql_value(doc.get(c)) for c in self.real]
+
+    def _write(self, conn: sqlite3.Connection, rowid: Optional[int], doc: Dict[str, Any]):
+        values = self._row_values(doc) + [json.dumps(doc)]
+        if rowid is None:
+            cols = ", ".join(f'"{c}"' for c in self.real)
+            conn.execute(f'INSERT INTO "{self.table}" ({cols}, doc) VALUES ({", ".join("?" * len(values))})', values)
+        else:
+            sets = ", ".join(f'"{c}" = ?' for c in self.real)
+            conn.execute(f'UPDATE "{self.table}" SET {sets}, doc = ? WHERE rowid = ?', values + [rowid])
+
+    def _with_identity(self, conn: sqlite3.Connection, row: Dict[str, Any]) -> Dict[str, Any]:
+        if self.spec.get("identity") and row.get("id") is None:
+            row = dict(row, id=conn.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM "{self.table}"').fetchone()[0])
+        return row
+
+    def _order_term(self, col: str, desc: bool) -> str:
+        direction = "DESC" if desc else "ASC"
+        expr = self._expr(col)
+        if expr.startswith('"'):
+            # Colonne reali (chiavi, date): mai NULL, l'ordine segue l'indice senza sort temporaneo
+            return f"{expr} {direction}"
+        # Come Postgres: NULL in coda in ordine crescente, in testa in decrescente
+        return f"{expr} IS NULL {direction}, {expr} {direction}"
+
+    def select_sql(self) -> Tuple[str, List[Any]]:
+        """SQL della select (anche per EXPLAIN QUERY PLAN)."""
+        where, params = self._where()
+        projection, _ = self._projection()
+        sql = f'SELECT {projection} FROM "{self.table}"{where}'
+        if self.orders:
+            sql += " ORDER BY " + ", ".join(self._order_term(c, desc) for c, desc in self.orders)
+        if self.limit_n is not None or self.offset:
+            sql += f" LIMIT {-1 if self.limit_n is None else int(self.limit_n)} OFFSET {int(self.offset)}"
+        return sql, params
+
+    def _select(self, conn: sqlite3.Connection) -> LocalResponse:
+        count = None
+        if self.count_mode == "exact":
+            where, params = self._where()
+            count = conn.execute(f'SELECT COUNT(*) FROM "{self.table}"{where}', params).fetchone()[0]
+        _, names = self._projection()
+        sql, params = self.select_sql()
+        rows = conn.execute(sql, params).fetchall()
+        if names is None:
+            data = [json.loads(r[0]) for r in rows]
+        else:
+            data = [dict(zip(names, json.loads(r[0]))) for r in rows]
+        return LocalResponse(data, count)
+
+    def execute(self) -> LocalResponse:
+        with self.client._lock, self.client._conn as conn:
+            self.client._ensure_table(self.table)
+            if self.op == "select":
+                return self._select(conn)
+
+            if self.op == "insert":
+                # Chiave duplicata -> IntegrityError, come il 409 di PostgREST
+                rows = []
+                for new in self.payload:
+                    row = self._with_identity(conn, new)
+                    self._write(conn, None, row)
+                    rows.append(row)
+                return LocalResponse(rows)
+
+            if self.op == "upsert":
+                keys = [k.strip() for k in self.on_conflict.split(",")]
+                match = " AND ".join(f"{self._expr(k)} IS ?" for k in keys)
+                rows = []
+                for new in self.payload:
+                    existing = conn.execute(f'SELECT rowid, doc FROM "{self.table}" WHERE {match}',
+                                            [_sql_value(new.get(k)) for k in keys]).fetchone()
+                    if existing is None:
+                        row = self._with_identity(conn, new)
+                        self._write(conn, None, row)
+                    else:
+                        row = {**json.loads(existing[1]), **new}
+                        self._write(conn, existing[0], row)
+                    rows.append(row)
+                return LocalResponse(rows)
+
+            where, params = self._where()
+            matched = conn.execute(f'SELECT rowid, doc FROM "{self.table}"{where}', params).fetchall()
+            if self.op == "update":
+                rows = []
+                for rowid, doc in matched:
+                    row = {**json.loads(doc), **self.payload}
+                    self._write(conn, rowid, row)
+                    rows.append(row)
+                return LocalResponse(rows)
+            if self.op == "delete":
+                conn.execute(f'DELETE FROM "{self.table}"{where}', params)
+                return LocalResponse([json.loads(doc) for _, doc in matched])
+            raise ValueError(f"Unsupported operation: {self.op}")
+
+class SQLiteClient:
+    """
+    Backend embedded di DatabaseService: stessa interfaccia del client Supabase
+    (table(...).select/insert/upsert/update/delete ... .execute()) su un file SQLite,
+    per sync, dashboard e rescore offline (benchmark, test, replica locale in lettura).
+    Indici reali su chiavi e (athlete_id, date) come nelle migrazioni Postgres.
+    """
+    def __init__(self, path: Union[str, Path] = DB_PATH):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._tables = set()
+        with self._lock:
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            for name in TABLES:
+                self._ensure_table(name)
+            self._conn.commit()
+
+    def _ensure_table(self, name: str):
+        if name in self._tables:
+            return
+        spec = TABLES.get(name, DEFAULT_TABLE)
+        cols = "".join(f'"{c}", ' for c in _columns(spec))
+        key = ", ".join(f'"{c}"' for c in spec["key"])
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({cols}doc TEXT NOT NULL)')
+        self._conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{name}_pkey" ON "{name}" ({key})')
+        for index in spec.get("indexes", []):
+            suffix = "_".join(c.split()[0] for c in index)
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{name}_{suffix}" ON "{name}" ({", ".join(index)})')
+        self._tables.add(name)
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    def explain(self, sql: str, params: Tuple = ()) -> List[str]:
+        """Piano di esecuzione SQLite (diagnostica indici)."""
+        with self._lock:
+            return [r[-1] for r in self._conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+_clients: Dict[str, SQLiteClient] = {}
+_clients_lock = threading.Lock()
+
+def get_local_client(path: Union[str, Path, None] = None) -> SQLiteClient:
+    """Client SQLite di processo per file (default .cache/score.sqlite)."""
+    key = str(path or DB_PATH)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = SQLiteClient(key)
+            logger.info(f"Local DB backend: {key}")
+        return _clients[key]
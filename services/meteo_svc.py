@@ -1,39 +1,157 @@
-import requests
 import logging
-from typing import Tuple, Optional
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Set, Tuple, Optional
+from services.http_pool import get_session
+from services.weather_cache import Cell, DayWeather, MISS, WeatherCache, get_weather_cache
 
 logger = logging.getLogger("sCore.Meteo")
 
 class WeatherService:
+    URLS = [
+        "https://archive-api.open-meteo.com/v1/archive",
+        "https://api.open-meteo.com/v1/forecast"
+    ]
+    TIMEOUT = 5
+    # Giorni massimi per singola richiesta a intervallo sull'archivio
+    MAX_RANGE_DAYS = 366
+    # None = cache di processo su disco (get_weather_cache)
+    cache: Optional[WeatherCache] = None
+
+    @classmethod
+    def get_cache(cls) -> WeatherCache:
+        return cls.cache or get_weather_cache()
+
+    @classmethod
+    def get_weather(cls, lat: float, lon: float, date_str: str, hour: int) -> Tuple[float, float, bool]:
+        """Recupera dati meteo storici o forecast da Open-Meteo (giorno intero in cache per cella)."""
+        cache = cls.get_cache()
+        cell = cache.cell(lat, lon)
+
+        day = cache.get(cell, date_str)
+        values = cls._values(day, hour)
+        # Giorno da scaricare, o in cache ma senza l'ora richiesta (archivio non consolidato)
+        if values is None and day is not MISS:
+            with cache.key_lock(cell, date_str):
+                # Un altro worker potrebbe averlo appena scaricato (lookup già contato sopra)
+                day = cache.get(cell, date_str, count=False)
+                values = cls._values(day, hour)
+                if values is None and day is not MISS:
+                    fetched = cls._fetch_day(cell, date_str, hour)
+                    if fetched is not None:
+                        cache.put(cell, date_str, fetched)
+                        values = fetched.at(hour)
+                    elif day is None:
+                        cache.put_miss(cell, date_str)
+
+        if values is not None:
+            return values[0], values[1], True
+
+        return 20.0, 50.0, False  # Fallback Standard
+
     @staticmethod
-    def get_weather(lat: float, lon: float, date_str: str, hour: int) -> Tuple[float, float, bool]:
-        """Recupera dati meteo storici o forecast da Open-Meteo."""
-        urls = [
-            "https://archive-api.open-meteo.com/v1/archive",
-            "https://api.open-meteo.com/v1/forecast"
-        ]
-        
+    def _values(day, hour: int) -> Optional[Tuple[float, float]]:
+        return day.at(hour) if isinstance(day, DayWeather) else None
+
+    @classmethod
+    def get_weather_batch(cls, points: List[Tuple[float, float, str, int]]) -> List[Tuple[float, float, bool]]:
+        """
+        Meteo per N attività [(lat, lon, 'YYYY-MM-DD', ora)] nello stesso ordine.
+        Raggruppa i giorni mancanti per cella e fa una sola richiesta archive a intervallo
+        per cella; i giorni che l'archivio non copre (es. ultimi giorni) ripiegano su get_weather.
+        """
+        cache = cls.get_cache()
+        pending: Dict[Cell, Set[str]] = defaultdict(set)
+        for lat, lon, date_str, _ in points:
+            cell = cache.cell(lat, lon)
+            # Pre-scan non contato: il lookup vero (e la statistica) è in get_weather
+            if not cache.has(cell, date_str):
+                pending[cell].add(date_str)
+
+        for cell, dates in pending.items():
+            for start, end in cls._date_ranges(sorted(dates)):
+                days = cls._fetch_range(cell, start, end)
+                if days:
+                    cache.put_many(cell, days)
+                logger.info(f"Weather backfill {cell} {start}..{end}: {len(days)} days")
+
+        return [cls.get_weather(lat, lon, date_str, hour) for lat, lon, date_str, hour in points]
+
+    @classmethod
+    def _date_ranges(cls, dates: List[str]) -> List[Tuple[str, str]]:
+        """Spezza le date ordinate in intervalli di al massimo MAX_RANGE_DAYS giorni."""
+        ranges = []
+        start = prev = None
+        for d in dates:
+            day = date.fromisoformat(d)
+            if start is None:
+                start = day
+            elif (day - start).days >= cls.MAX_RANGE_DAYS:
+                ranges.append((start.isoformat(), prev.isoformat()))
+                start = day
+            prev = day
+        if start is not None:
+            ranges.append((start.isoformat(), prev.isoformat()))
+        return ranges
+
+    @classmethod
+    def _fetch_range(cls, cell: Cell, start: str, end: str) -> Dict[str, DayWeather]:
+        """
+        Una richiesta archive per [start, end]: ritorna i giorni con almeno un'ora valida
+        (quelli con ore null vanno in cache con TTL e get_weather ripiega sul forecast).
+        """
         params = {
-            "latitude": lat,
-            "longitude": lon,
+            "latitude": cell[0],
+            "longitude": cell[1],
+            "start_date": start,
+            "end_date": end,
+            "hourly": "temperature_2m,relative_humidity_2m"
+        }
+        try:
+            res = get_session("meteo").get(cls.URLS[0], params=params, timeout=cls.TIMEOUT)
+            if res.status_code != 200:
+                logger.warning(f"Weather range request failed ({res.status_code}) for {cell} {start}..{end}")
+                return {}
+            hourly = res.json().get("hourly") or {}
+        except Exception as e:
+            logger.error(f"Errore su {cls.URLS[0]}: {e}")
+            return {}
+
+        by_day: Dict[str, Tuple[list, list]] = defaultdict(lambda: ([], []))
+        for ts, t, h in zip(hourly.get("time", []), hourly.get("temperature_2m", []), hourly.get("relative_humidity_2m", [])):
+            temps, hums = by_day[ts[:10]]
+            temps.append(t)
+            hums.append(h)
+        return {
+            day: DayWeather(temps, hums, "archive")
+            for day, (temps, hums) in by_day.items()
+            if len(temps) == 24 and any(t is not None for t in temps)
+        }
+
+    @classmethod
+    def _fetch_day(cls, cell, date_str: str, hour: int) -> Optional[DayWeather]:
+        """Archive, poi forecast: il primo giorno che ha un valore per l'ora richiesta."""
+        params = {
+            "latitude": cell[0],
+            "longitude": cell[1],
             "start_date": date_str,
             "end_date": date_str,
             "hourly": "temperature_2m,relative_humidity_2m"
         }
 
-        for url in urls:
+        for url in cls.URLS:
             try:
-                res = requests.get(url, params=params, timeout=5)
+                res = get_session("meteo").get(url, params=params, timeout=cls.TIMEOUT)
                 if res.status_code == 200:
                     data = res.json()
                     if "hourly" in data:
-                        idx = min(hour, 23)
-                        temp = data["hourly"]["temperature_2m"][idx]
-                        hum = data["hourly"]["relative_humidity_2m"][idx]
-                        if temp is not None:
-                            return float(temp), float(hum), True
+                        hourly = data["hourly"]
+                        source = "forecast" if "forecast" in url else "archive"
+                        day = DayWeather(hourly["temperature_2m"][:24], hourly["relative_humidity_2m"][:24], source)
+                        if day.at(hour) is not None:
+                            return day
             except Exception as e:
                 logger.error(f"Errore su {url}: {e}")
                 continue
 
-        return 20.0, 50.0, False  # Fallback Standard
+        return None
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger("sCore.RateLimit")
+
+# Budget Strava di default per app (richieste di lettura), finché gli header non dicono altro
+STRAVA_LIMIT_15MIN = 100
+STRAVA_LIMIT_DAILY = 1000
+STRAVA_WINDOW_SEC = 15 * 60
+STRAVA_DAY_SEC = 24 * 60 * 60
+
+class StravaRateLimiter:
+    """
+    Scheduler delle richieste Strava basato sul budget reale dell'app.
+    Tiene due finestre (15 minuti allineati al quarto d'ora UTC, giornaliera a
+    mezzanotte UTC), si aggiorna dagli header X-RateLimit-Limit / X-RateLimit-Usage
+    (e X-ReadRateLimit-*, se più stretti) e lascia passare le richieste finché c'è
+    budget; oltre, le mette in coda fino al reset della finestra esaurita.
+    """
+    def __init__(self, limit_15min: int = STRAVA_LIMIT_15MIN, limit_daily: int = STRAVA_LIMIT_DAILY,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.limits = [int(limit_15min), int(limit_daily)]
+        self.usage = [0, 0]
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._window_ids = self._current_windows()
+        self.last_headers: Dict[str, str] = {}
+        self.queued = 0
+        self.waited_sec = 0.0
+
+    def _current_windows(self) -> List[int]:
+        now = self._clock()
+        return [int(now // STRAVA_WINDOW_SEC), int(now // STRAVA_DAY_SEC)]
+
+    def _roll(self):
+        windows = self._current_windows()
+        for i in range(2):
+            if windows[i] != self._window_ids[i]:
+                self.usage[i] = 0
+        self._window_ids = windows
+
+    def _resets_in(self) -> List[float]:
+        now = self._clock()
+        return [STRAVA_WINDOW_SEC - now % STRAVA_WINDOW_SEC, STRAVA_DAY_SEC - now % STRAVA_DAY_SEC]
+
+    def remaining(self) -> int:
+        """Richieste spendibili subito (senza attendere un reset)."""
+        with self._lock:
+            self._roll()
+            return max(0, min(l - u for l, u in zip(self.limits, self.usage)))
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Prenota una richiesta; attende il reset se il budget è esaurito. False se scade il timeout."""
+        deadline = None if timeout is None else self._clock() + timeout
+        queued = False
+        while True:
+            with self._lock:
+                self._roll()
+                blocked = [i for i in range(2) if self.usage[i] >= self.limits[i]]
+                if not blocked:
+                    self.usage[0] += 1
+                    self.usage[1] += 1
+                    return True
+                if not queued:
+                    self.queued += 1
+                    queued = True
+                wait = max(self._resets_in()[i] for i in blocked)
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    logger.warning(f"Strava budget exhausted, giving up (reset in {wait:.0f}s)")
+                    return False
+                wait = min(wait, remaining)
+            logger.info(f"Strava budget exhausted, queued for {wait:.0f}s")
+            with self._lock:
+                self.waited_sec += wait
+            self._sleep(wait)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Allinea limiti e consumo agli header Strava (il server vince se ha contato di più)."""
+        parsed = []
+        for prefix in ("X-RateLimit", "X-ReadRateLimit"):
+            limit = _parse_pair(headers.get(f"{prefix}-Limit"))
+            usage = _parse_pair(headers.get(f"{prefix}-Usage"))
+            if limit and usage:
+                parsed.append((limit, usage))
+        if not parsed:
+            return
+        with self._lock:
+            self._roll()
+            self.last_headers = {k: v for k, v in headers.items() if "ratelimit" in k.lower()}
+            for i in range(2):
+                # Finestra più stretta tra budget complessivo e budget di lettura
+                limit, usage = min(((l[i], u[i]) for l, u in parsed), key=lambda p: p[0] - p[1])
+                self.limits[i] = limit
+                self.usage[i] = max(self.usage[i], usage)
+
+    def mark_exhausted(self, headers: Optional[Mapping[str, str]] = None):
+        """Risposta 429: la finestra corta è esaurita anche se gli header non lo dicono."""
+        if headers:
+            self.update_from_headers(headers)
+        with self._lock:
+            self.usage[0] = max(self.usage[0], self.limits[0])
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Stato corrente per la Dev Console (tab Rate Limit)."""
+        with self._lock:
+            self._roll()
+            resets = self._resets_in()
+            return {
+                "15min": {"limit": self.limits[0], "usage": self.usage[0],
+                          "remaining": max(0, self.limits[0] - self.usage[0]), "reset_in_sec": int(resets[0])},
+                "daily": {"limit": self.limits[1], "usage": self.usage[1],
+                          "remaining": max(0, self.limits[1] - self.usage[1]), "reset_in_sec": int(resets[1])},
+                "queued_requests": self.queued,
+                "waited_sec": round(self.waited_sec, 1),
+                "last_headers": dict(self.last_headers)
+            }
+
+def _parse_pair(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """'100,1000' -> (100, 1000)"""
+    try:
+        a, b = (int(x.strip()) for x in value.split(","))
+        return a, b
+    except Exception:
+        return None
+
+_strava_limiter: Optional[StravaRateLimiter] = None
+_strava_lock = threading.Lock()
+
+def get_strava_limiter() -> StravaRateLimiter:
+    """Scheduler di processo condiviso da tutti i worker (sopravvive ai rerun di Streamlit)."""
+    global _strava_limiter
+    with _strava_lock:
+        if _strava_limiter is None:
+            _strava_limiter = StravaRateLimiter()
+        return _strava_limiter
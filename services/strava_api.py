@@ -1,15 +1,33 @@
-import requests
-import time
+import calendar
 import logging
-from typing import List, Dict, Any, Optional
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from services.http_pool import PooledSession, get_session
+from services.rate_limiter import StravaRateLimiter, STRAVA_WINDOW_SEC, get_strava_limiter
 
 logger = logging.getLogger("sCore.Strava")
 
+# Massimo per_page accettato da /athlete/activities
+MAX_PER_PAGE = 200
+
+def activity_epoch(activity: Dict[str, Any]) -> int:
+    """start_date (UTC, '2024-01-01T06:00:00Z') -> epoch, il formato di after/before."""
+    return calendar.timegm(datetime.strptime(activity["start_date"], "%Y-%m-%dT%H:%M:%SZ").timetuple())
+
 class StravaService:
-    def __init__(self, client_id: str, client_secret: str):
+    def __init__(self, client_id: str, client_secret: str, base_url: Optional[str] = None,
+                 limiter: Optional[StravaRateLimiter] = None, max_wait: float = STRAVA_WINDOW_SEC,
+                 session: Optional[PooledSession] = None, timeout: float = 10):
         self.client_id = client_id
         self.client_secret = client_secret
-        self.base_url = "https://www.strava.com/api/v3"
+        self.base_url = base_url or "https://www.strava.com/api/v3"
+        # Scheduler condiviso tra i worker di sync (budget 15 min + giornaliero)
+        self.limiter = limiter or get_strava_limiter()
+        # Attesa massima in coda per una richiesta (oltre: la richiesta fallisce)
+        self.max_wait = max_wait
+        # Connessioni keep-alive condivise tra istanze e worker di sync
+        self.session = session or get_session("strava")
+        self.timeout = timeout
 
     def get_auth_url(self, redirect_uri: str) -> str:
         scope = "activity:read_all,profile:read_all"
@@ -32,6 +50,44 @@ class StravaService:
         params = {"page": page, "per_page": per_page}
         return self._request_with_retry("GET", url, headers=headers, params=params) or []
 
+    def fetch_activities_after(self, token: str, after: int, per_page: int = MAX_PER_PAGE, max_pages: int = 20) -> Optional[List[Dict[str, Any]]]:
+        """
+        Sync incrementale: solo le attività con start_date > after (epoch UTC), oldest-first.
+        Ritorna None se una pagina fallisce (il cursore non va avanzato).
+        """
+        activities = []
+        for page in range(1, max_pages + 1):
+            batch = self._activity_page(token, page, per_page, after=after)
+            if batch is None:
+                return None
+            activities.extend(batch)
+            if len(batch) < per_page:
+                break
+        return activities
+
+    def fetch_activities_before(self, token: str, before: int, per_page: int = MAX_PER_PAGE, max_pages: int = 5) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Backfill: cammina lo storico all'indietro col cursore before (newest-first).
+        Ritorna (attività, storico_esaurito); al massimo max_pages richieste per chiamata.
+        """
+        activities = []
+        cursor = before
+        for _ in range(max_pages):
+            batch = self._activity_page(token, 1, per_page, before=cursor)
+            if batch is None:
+                return activities, False
+            activities.extend(batch)
+            if len(batch) < per_page:
+                return activities, True
+            cursor = min(activity_epoch(a) for a in batch)
+        return activities, False
+
+    def _activity_page(self, token: str, page: int, per_page: int, **cursor) -> Optional[List[Dict[str, Any]]]:
+        headers = {"Authorization": f"Bearer {token}"}
+        url = f"{self.base_url}/athlete/activities"
+        params = {"page": page, "per_page": per_page, **cursor}
+        return self._request_with_retry("GET", url, headers=headers, params=params)
+
     def fetch_authenticated_athlete(self, token: str) -> Optional[Dict[str, Any]]:
         """Recupera il profilo dettagliato dell'atleta loggato (include peso, ecc)"""
         headers = {"Authorization": f"Bearer {token}"}
@@ -52,7 +108,6 @@ class StravaService:
             all_activities.extend(acts)
             if len(acts) < per_page:
                 break
-            time.sleep(0.5) 
         return all_activities
 
     def fetch_streams(self, token: str, activity_id: int) -> Optional[Dict[str, Any]]:
@@ -108,11 +163,15 @@ class StravaService:
     def _request_with_retry(self, method: str, url: str, **kwargs) -> Optional[Any]:
         for i in range(3):
             try:
-                res = requests.request(method, url, timeout=10, **kwargs)
+                if not self.limiter.acquire(timeout=self.max_wait):
+                    return None
+                res = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                self.limiter.update_from_headers(res.headers)
                 if res.status_code == 200:
                     return res.json()
                 if res.status_code == 429:
-                    time.sleep(5 * (i + 1))
+                    # Budget esaurito: il prossimo acquire attende il reset della finestra
+                    self.limiter.mark_exhausted(res.headers)
                     continue
                 break
             except Exception as e:
@@ -121,6 +180,6 @@ class StravaService:
 
     def _post_request(self, url: str, data: Dict) -> Optional[Dict]:
         try:
-            res = requests.post(url, data=data, timeout=10)
+            res = self.session.post(url, data=data, timeout=self.timeout)
             return res.json() if res.status_code == 200 else None
         except Exception: return None
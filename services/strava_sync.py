@@ -46,7 +46,7 @@ def safe_strava_sync(
     if not activities:
         return {"new": 0, "streams": 0, "skipped": 0}
 
-    new_runs = []
+    pending = []
     skipped = 0
 
     # --------------------------------------------------
@@ -86,14 +86,16 @@ def safe_strava_sync(
             "raw_hr": []
         }
 
-        db_svc.save_run(run_obj, athlete_id)
-        new_runs.append(s["id"])
-        
+        pending.append(run_obj)
+
         # Check per nuovi PR
         if s.get("pr_count", 0) > 0:
             refresh_bests = True
 
-    logger.info(f"[SYNC] New runs saved: {len(new_runs)}")
+    # Un upsert per chunk invece di una richiesta per corsa
+    result = db_svc.save_runs_bulk(pending, athlete_id) if pending else {"saved": [], "failed": {}}
+    new_runs = result["saved"]
+    logger.info(f"[SYNC] New runs saved: {len(new_runs)} (failed: {len(result['failed'])})")
 
     # --------------------------------------------------
     # 4. PASS 2 — Streams + Meteo Reale + Calcolo SCORE
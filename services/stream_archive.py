@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from services.stream_store import CHANNELS
+
+logger = logging.getLogger("sCore.StreamArchive")
+
+ARCHIVE_DIR = Path(__file__).parent.parent / ".cache" / "streams"
+
+# Record dell'indice (append-only): l'ultimo record di un run_id vince
+INDEX_DTYPE = np.dtype([
+    ("run_id", "<i8"),
+    ("start_ts", "<i8"),   # epoch UTC di inizio corsa
+    ("offset", "<i8"),     # in campioni, uguale per tutti i canali
+    ("length", "<i8"),
+])
+
+Views = Dict[str, np.ndarray]
+
+class StreamArchive:
+    """
+    Archivio locale per analisi offline: per ogni atleta un file binario append-only
+    per canale (watts int16, hr uint8, campioni concatenati) più un indice di offset.
+    I file sono mappati in memoria (np.memmap, sola lettura): le metriche lavorano su
+    viste zero-copy e le pagine restano nella page cache del sistema operativo,
+    non nello heap del processo Streamlit.
+    """
+    def __init__(self, root: Union[str, Path] = ARCHIVE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # athlete_id -> (dimensione file indice, {run_id: record}, {canale: memmap})
+        self._maps: Dict[int, Tuple[int, Dict[int, np.void], Views]] = {}
+
+    def _path(self, athlete_id: int, name: str) -> Path:
+        return self.root / f"{int(athlete_id)}.{name}.bin"
+
+    def append(self, athlete_id: int, run_id: int, start_ts: int, streams: Dict[str, Sequence[float]]) -> bool:
+        """Accoda gli stream di una corsa (canali riallineati alla lunghezza minore). False se senza stream."""
+        arrays = {}
+        for channel, dtype in CHANNELS.items():
+            values = streams.get(channel)
+            arrays[channel] = np.asarray(values if values is not None else [], dtype=np.float64)
+        # Corse senza stream restano nell'indice con lunghezza 0: non vengono ritentate
+        length = min(len(a) for a in arrays.values())
+
+        with self._lock:
+            offset = self._samples(athlete_id)
+            for channel, dtype in CHANNELS.items():
+                info = np.iinfo(dtype)
+                q = np.clip(np.rint(np.nan_to_num(arrays[channel][:length], nan=0.0)), info.min, info.max).astype(dtype)
+                with open(self._path(athlete_id, channel), "ab") as f:
+                    # Scarta la coda di un append precedente mai arrivato all'indice
+                    f.truncate(offset * dtype.itemsize)
+                    q.tofile(f)
+            # L'indice si scrive per ultimo: un append interrotto lascia solo byte orfani
+            record = np.array([(run_id, start_ts, offset, length)], dtype=INDEX_DTYPE)
+            with open(self._path(athlete_id, "idx"), "ab") as f:
+                record.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        return length > 0
+
+    def _samples(self, athlete_id: int) -> int:
+        """Campioni già presenti (ultimo offset + lunghezza, secondo l'indice)."""
+        index = self._read_index(athlete_id)
+        if not len(index):
+            return 0
+        return int((index["offset"] + index["length"]).max())
+
+    def _read_index(self, athlete_id: int) -> np.ndarray:
+        path = self._path(athlete_id, "idx")
+        if not path.exists():
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        return np.fromfile(path, dtype=INDEX_DTYPE)
+
+    def _mapped(self, athlete_id: int) -> Tuple[Dict[int, np.void], Views]:
+        """Indice + memmap dei canali, rimappati solo se l'indice è cresciuto."""
+        idx_path = self._path(athlete_id, "idx")
+        size = idx_path.stat().st_size if idx_path.exists() else 0
+        with self._lock:
+            cached = self._maps.get(athlete_id)
+            if cached is not None and cached[0] == size:
+                return cached[1], cached[2]
+            index = self._read_index(athlete_id)
+            records = {int(r["run_id"]): r for r in index}
+            maps: Views = {}
+            total = int((index["offset"] + index["length"]).max()) if len(index) else 0
+            if total > 0:
+                for channel, dtype in CHANNELS.items():
+                    maps[channel] = np.memmap(self._path(athlete_id, channel), dtype=dtype, mode="r", shape=(total,))
+            self._maps[athlete_id] = (size, records, maps)
+            return records, maps
+
+    def has(self, athlete_id: int, run_id: int) -> bool:
+        return int(run_id) in self._mapped(athlete_id)[0]
+
+    def view(self, athlete_id: int, run_id: int) -> Optional[Views]:
+        """{'watts': vista, 'hr': vista} della corsa (zero-copy sul file), None se assente."""
+        records, maps = self._mapped(athlete_id)
+        rec = records.get(int(run_id))
+        if rec is None:
+            return None
+        start, end = int(rec["offset"]), int(rec["offset"] + rec["length"])
+        return {channel: m[start:end] for channel, m in maps.items()}
+
+    def runs(self, athlete_id: int, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> np.ndarray:
+        """Record dell'indice (uno per corsa con stream, ordinati per data) nell'intervallo [start_ts, end_ts]."""
+        return _select(self._mapped(athlete_id)[0], start_ts, end_ts)
+
+    def iter_views(self, athlete_id: int, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> Iterator[Tuple[int, int, Views]]:
+        """(run_id, start_ts, viste) per ogni corsa nell'intervallo, in ordine di data."""
+        records, maps = self._mapped(athlete_id)
+        for rec in _select(records, start_ts, end_ts):
+            start, end = int(rec["offset"]), int(rec["offset"] + rec["length"])
+            yield int(rec["run_id"]), int(rec["start_ts"]), {channel: m[start:end] for channel, m in maps.items()}
+
+    def drop(self, athlete_id: int):
+        """Cancella l'archivio di un atleta (es. reset storico)."""
+        with self._lock:
+            self._maps.pop(athlete_id, None)
+            for name in ("idx", *CHANNELS):
+                self._path(athlete_id, name).unlink(missing_ok=True)
+
+    def stats(self, athlete_id: int) -> Dict[str, int]:
+        records, maps = self._mapped(athlete_id)
+        return {
+            "runs": len(records),
+            "samples": len(next(iter(maps.values()))) if maps else 0,
+            "bytes": sum(m.nbytes for m in maps.values())
+        }
+
+def _select(records: Dict[int, np.void], start_ts: Optional[int], end_ts: Optional[int]) -> np.ndarray:
+    index = np.array(list(records.values()), dtype=INDEX_DTYPE)
+    index = index[index["length"] > 0]
+    if start_ts is not None:
+        index = index[index["start_ts"] >= start_ts]
+    if end_ts is not None:
+        index = index[index["start_ts"] <= end_ts]
+    return np.sort(index, order="start_ts")
+
+_archive: Optional[StreamArchive] = None
+_archive_lock = threading.Lock()
+
+def get_stream_archive() -> StreamArchive:
+    """Archivio mmap di processo su disco (.cache/streams/)."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = StreamArchive()
+        return _archive
@@ -0,0 +1,145 @@
+import base64
+import logging
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger("sCore.Streams")
+
+STORE_PATH = Path(__file__).parent.parent / ".cache" / "streams.sqlite"
+
+# Canali al secondo e tipo compatto: watts in int16, HR in uint8 (little-endian)
+CHANNELS: Dict[str, np.dtype] = {
+    "watts": np.dtype("<i2"),
+    "hr": np.dtype("u1"),
+}
+ZLIB_LEVEL = 6
+
+def encode_channel(values: Sequence[float], dtype: np.dtype) -> bytes:
+    """
+    Quantizza sul tipo del canale (None/NaN -> 0, valori fuori range saturati),
+    codifica a differenze e comprime con zlib. Le differenze sono in aritmetica
+    modulare dello stesso tipo: cumsum in decode le inverte esattamente.
+    """
+    info = np.iinfo(dtype)
+    arr = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+    q = np.clip(np.rint(arr), info.min, info.max).astype(dtype)
+    deltas = np.diff(q, prepend=np.zeros(1, dtype=dtype))
+    return zlib.compress(deltas.tobytes(), ZLIB_LEVEL)
+
+def decode_channel(blob: bytes, dtype: np.dtype) -> np.ndarray:
+    """Da blob compresso ad array NumPy, senza passare da liste Python."""
+    deltas = np.frombuffer(zlib.decompress(blob), dtype=dtype)
+    return np.cumsum(deltas, dtype=dtype)
+
+def pack_streams(streams: Dict[str, Sequence[float]]) -> Dict[str, Dict[str, Any]]:
+    """Stream -> documento JSON compatto per la colonna runs.streams (blob del canale in base64)."""
+    return {
+        channel: {"dtype": dtype.str, "length": len(values),
+                  "data": base64.b64encode(encode_channel(values, dtype)).decode("ascii")}
+        for channel, dtype in CHANNELS.items()
+        if (values := streams.get(channel)) is not None and len(values) > 0
+    }
+
+def unpack_streams(doc: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, np.ndarray]:
+    """Inverso di pack_streams: {'watts': array, 'hr': array} (canali assenti vuoti)."""
+    out = {
+        channel: decode_channel(base64.b64decode(packed["data"]), np.dtype(packed["dtype"]))
+        for channel, packed in (doc or {}).items() if channel in CHANNELS
+    }
+    for channel, dtype in CHANNELS.items():
+        out.setdefault(channel, np.zeros(0, dtype=dtype))
+    return out
+
+class StreamStore:
+    """
+    Cache locale colonnare (SQLite) degli stream al secondo, chiave = (run id, canale).
+    Ogni canale è un blob tipizzato, delta-encoded e compresso: niente JSON da
+    riparsare a ogni lettura dello storico. La copia di riferimento è la colonna
+    runs.streams su Supabase (stesso formato, vedi pack_streams): il file si può perdere.
+    """
+    def __init__(self, path: Union[str, Path] = STORE_PATH):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS run_streams (
+                    run_id INTEGER NOT NULL,
+                    channel TEXT NOT NULL,     -- 'watts' | 'hr'
+                    dtype TEXT NOT NULL,       -- es. '<i2', 'u1'
+                    length INTEGER NOT NULL,
+                    data BLOB NOT NULL,        -- zlib(delta(valori))
+                    PRIMARY KEY (run_id, channel)
+                )
+            """)
+            self._conn.commit()
+
+    def put(self, run_id: int, streams: Dict[str, Sequence[float]]):
+        self.put_many({run_id: streams})
+
+    def put_many(self, items: Dict[int, Dict[str, Sequence[float]]]):
+        """Scrive gli stream di più corse in una sola transazione. Canali vuoti o sconosciuti sono ignorati."""
+        rows = [
+            (int(run_id), channel, dtype.str, len(values), encode_channel(values, dtype))
+            for run_id, streams in items.items()
+            for channel, dtype in CHANNELS.items()
+            if (values := streams.get(channel)) is not None and len(values) > 0
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO run_streams (run_id, channel, dtype, length, data) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def get(self, run_id: int) -> Optional[Dict[str, np.ndarray]]:
+        """{'watts': array, 'hr': array} oppure None se la corsa non è in archivio."""
+        return self.get_many([run_id]).get(int(run_id))
+
+    def get_many(self, run_ids: Iterable[int]) -> Dict[int, Dict[str, np.ndarray]]:
+        ids = [int(i) for i in run_ids]
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT run_id, channel, dtype, data FROM run_streams WHERE run_id IN ({marks})", ids
+            ).fetchall()
+        out: Dict[int, Dict[str, np.ndarray]] = {}
+        for run_id, channel, dtype, data in rows:
+            out.setdefault(run_id, {})[channel] = decode_channel(data, np.dtype(dtype))
+        for streams in out.values():
+            for channel, dtype in CHANNELS.items():
+                streams.setdefault(channel, np.zeros(0, dtype=dtype))
+        return out
+
+    def delete(self, run_ids: Iterable[int]):
+        ids = [(int(i),) for i in run_ids]
+        with self._lock:
+            self._conn.executemany("DELETE FROM run_streams WHERE run_id = ?", ids)
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            runs, size = self._conn.execute(
+                "SELECT COUNT(DISTINCT run_id), COALESCE(SUM(LENGTH(data)), 0) FROM run_streams"
+            ).fetchone()
+        return {"runs": runs, "bytes": size}
+
+_store: Optional[StreamStore] = None
+_store_lock = threading.Lock()
+
+def get_stream_store() -> StreamStore:
+    """Cache stream di processo su disco (.cache/streams.sqlite)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StreamStore()
+        return _store
@@ -0,0 +1,167 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger("sCore.WeatherCache")
+
+CACHE_PATH = Path(__file__).parent.parent / ".cache" / "weather.sqlite"
+
+# Lato della cella (gradi): ~11 km, sotto la risoluzione del reanalysis Open-Meteo
+CELL_DEG = 0.1
+# Fallimenti (archive + forecast) non ritentati prima di questo intervallo
+MISS_TTL_SEC = 6 * 60 * 60
+# I dati forecast vengono consolidati nell'archivio: si riscaricano dopo un giorno
+FORECAST_TTL_SEC = 24 * 60 * 60
+# Giorni d'archivio con ore ancora null (non consolidati): si riscaricano dopo questo intervallo
+PARTIAL_TTL_SEC = 6 * 60 * 60
+
+Cell = Tuple[float, float]
+
+class DayWeather:
+    """24 valori orari di temperatura e umidità per una cella in un giorno."""
+    __slots__ = ("temperature", "humidity", "source")
+
+    def __init__(self, temperature: List[Optional[float]], humidity: List[Optional[float]], source: str):
+        self.temperature = temperature
+        self.humidity = humidity
+        self.source = source
+
+    def at(self, hour: int) -> Optional[Tuple[float, float]]:
+        idx = min(max(hour, 0), len(self.temperature) - 1)
+        temp = self.temperature[idx]
+        if temp is None:
+            return None
+        hum = self.humidity[idx]
+        return float(temp), float(hum if hum is not None else 50.0)
+
+    @property
+    def complete(self) -> bool:
+        """Tutte le 24 ore hanno la temperatura."""
+        return len(self.temperature) == 24 and all(t is not None for t in self.temperature)
+
+MISS = "miss"
+
+class WeatherCache:
+    """
+    Cache persistente (SQLite) dei dati meteo orari, chiave = (cella lat/lon, data).
+    Memorizza il giorno intero: altre corse nella stessa cella e giorno non costano
+    richieste. I fallimenti sono messi in cache con un TTL (negative caching); solo i
+    giorni d'archivio completi non scadono.
+    """
+    def __init__(self, path: Union[str, Path] = CACHE_PATH, cell_deg: float = CELL_DEG,
+                 miss_ttl: float = MISS_TTL_SEC, forecast_ttl: float = FORECAST_TTL_SEC,
+                 partial_ttl: float = PARTIAL_TTL_SEC):
+        self.cell_deg = cell_deg
+        self.miss_ttl = miss_ttl
+        self.forecast_ttl = forecast_ttl
+        self.partial_ttl = partial_ttl
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[Cell, str], threading.Lock] = defaultdict(threading.Lock)
+        self.hits = 0
+        self.misses = 0
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS weather_days (
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    day TEXT NOT NULL,
+                    source TEXT NOT NULL,      -- 'archive' | 'forecast' | 'miss'
+                    temperature TEXT,          -- JSON, 24 valori orari
+                    humidity TEXT,
+                    expires_at REAL,           -- NULL = non scade
+                    PRIMARY KEY (lat, lon, day)
+                )
+            """)
+            self._conn.commit()
+
+    def cell(self, lat: float, lon: float) -> Cell:
+        """Centro della cella che contiene (lat, lon)."""
+        d = self.cell_deg
+        return round(round(lat / d) * d, 4), round(round(lon / d) * d, 4)
+
+    def key_lock(self, cell: Cell, day: str) -> threading.Lock:
+        """Lock per chiave: worker concorrenti sulla stessa cella/giorno fanno una sola richiesta."""
+        with self._lock:
+            return self._key_locks[(cell, day)]
+
+    def get(self, cell: Cell, day: str, count: bool = True) -> Union[DayWeather, str, None]:
+        """DayWeather, MISS (fallimento recente) oppure None (da scaricare). count=False: non aggiorna hit/miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source, temperature, humidity, expires_at FROM weather_days WHERE lat=? AND lon=? AND day=?",
+                (cell[0], cell[1], day)
+            ).fetchone()
+        if row is None or (row[3] is not None and row[3] < time.time()):
+            if count:
+                self.misses += 1
+            return None
+        if count:
+            self.hits += 1
+        if row[0] == MISS:
+            return MISS
+        return DayWeather(json.loads(row[1]), json.loads(row[2]), row[0])
+
+    def _expires(self, weather: DayWeather, now: float) -> Optional[float]:
+        if weather.source == "forecast":
+            return now + self.forecast_ttl
+        if not weather.complete:
+            return now + self.partial_ttl
+        return None
+
+    def has(self, cell: Cell, day: str) -> bool:
+        """Giorno in cache e non scaduto (anche MISS), senza contarlo nelle statistiche."""
+        return self.get(cell, day, count=False) is not None
+
+    def put(self, cell: Cell, day: str, weather: DayWeather):
+        expires = self._expires(weather, time.time())
+        self._write(cell, day, weather.source, json.dumps(weather.temperature), json.dumps(weather.humidity), expires)
+
+    def put_many(self, cell: Cell, days: Dict[str, DayWeather]):
+        """Scrive più giorni della stessa cella in una sola transazione (backfill a intervalli)."""
+        now = time.time()
+        rows = [
+            (cell[0], cell[1], day, w.source, json.dumps(w.temperature), json.dumps(w.humidity), self._expires(w, now))
+            for day, w in days.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO weather_days (lat, lon, day, source, temperature, humidity, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def put_miss(self, cell: Cell, day: str):
+        self._write(cell, day, MISS, None, None, time.time() + self.miss_ttl)
+
+    def _write(self, cell: Cell, day: str, source: str, temps: Optional[str], hums: Optional[str], expires: Optional[float]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO weather_days (lat, lon, day, source, temperature, humidity, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cell[0], cell[1], day, source, temps, hums, expires)
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM weather_days").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+_cache: Optional[WeatherCache] = None
+_cache_lock = threading.Lock()
+
+def get_weather_cache() -> WeatherCache:
+    """Cache di processo su disco (.cache/weather.sqlite)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = WeatherCache()
+        return _cache
@@ -0,0 +1,192 @@
+"""
+Server HTTP locale che imita le API Strava (e l'archivio Open-Meteo) usate dalla sync.
+Serve per test e benchmark offline: latenza configurabile, conteggio richieste,
+massima concorrenza osservata e (opzionale) budget X-RateLimit-* con risposte 429.
+
+    with FakeStravaServer(n_activities=200, latency=0.05) as srv, srv.patch_weather():
+        auth = StravaService("id", "secret", base_url=srv.strava_url)
+"""
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+
+from services.strava_api import activity_epoch
+
+_STREAMS_PATH = re.compile(r"^/api/v3/activities/(\d+)/streams$")
+
+def make_activities(n: int, start: datetime = datetime(2024, 1, 1, 7, 0)) -> List[Dict[str, Any]]:
+    """Attività di corsa sintetiche, newest-first come le restituisce Strava."""
+    acts = []
+    for i in range(n):
+        dt = start + timedelta(days=i)
+        acts.append({
+            "id": 1000 + i,
+            "name": f"Run {i}",
+            "type": "Run",
+            "start_date": (dt - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "start_date_local": dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "distance": 5000 + (i % 10) * 1000,
+            "moving_time": 1500 + (i % 10) * 300,
+            "total_elevation_gain": 20,
+            "average_watts": 240 + i % 30,
+            "average_heartrate": 145 + i % 15,
+            "start_latlng": [45.46, 9.19],
+            "device_name": "Fake Watch"
+        })
+    return list(reversed(acts))
+
+class FakeStravaServer:
+    def __init__(self, n_activities: int = 20, latency: float = 0.0, stream_len: int = 600,
+                 rate_limit: Optional[Tuple[int, int]] = None, archive_until: Optional[str] = None):
+        self.activities = make_activities(n_activities)
+        self.latency = latency
+        self.stream_len = stream_len
+        # (limite 15 min, limite giornaliero): abilita gli header X-RateLimit-* e i 429
+        self.rate_limit = rate_limit
+        # Ultimo giorno ('YYYY-MM-DD') o ora ('YYYY-MM-DDTHH') coperti dall'archivio meteo (None = tutti)
+        self.archive_until = archive_until
+        self.strava_usage = 0
+        self.throttled = 0
+        self.requests: List[str] = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    @property
+    def strava_url(self) -> str:
+        return f"{self.base}/api/v3"
+
+    @property
+    def meteo_url(self) -> str:
+        return f"{self.base}/v1/archive"
+
+    @property
+    def forecast_url(self) -> str:
+        return f"{self.base}/v1/forecast"
+
+    @contextmanager
+    def patch_weather(self):
+        """WeatherService puntato al fake server, con una cache meteo in memoria vuota."""
+        from services.meteo_svc import WeatherService
+        from services.weather_cache import WeatherCache
+        with mock.patch.object(WeatherService, "URLS", [self.meteo_url]), \
+             mock.patch.object(WeatherService, "cache", WeatherCache(":memory:")):
+            yield
+
+    def count(self, prefix: str) -> int:
+        return sum(1 for p in self.requests if p.startswith(prefix))
+
+    def add_activities(self, n: int):
+        """Nuove attività successive all'ultima (simula corse fatte dopo una sync)."""
+        last = datetime.strptime(self.activities[0]["start_date_local"], "%Y-%m-%dT%H:%M:%SZ")
+        new = make_activities(n, start=last + timedelta(days=1))
+        for i, a in enumerate(new):
+            a["id"] = self.activities[0]["id"] + n - i
+        self.activities = new + self.activities
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _route(self, path: str, query: Dict[str, List[str]]):
+        if path == "/api/v3/athlete/activities":
+            page = int(query.get("page", ["1"])[0])
+            per_page = int(query.get("per_page", ["30"])[0])
+            acts = self.activities
+            if "before" in query:
+                acts = [a for a in acts if activity_epoch(a) < int(query["before"][0])]
+            if "after" in query:
+                # Come Strava: con after= l'ordine è oldest-first
+                acts = [a for a in reversed(acts) if activity_epoch(a) > int(query["after"][0])]
+            return 200, acts[(page - 1) * per_page: page * per_page]
+        m = _STREAMS_PATH.match(path)
+        if m:
+            i = int(m.group(1)) % 100
+            return 200, {
+                "watts": {"data": [220 + (k + i) % 40 for k in range(self.stream_len)]},
+                "heartrate": {"data": [140 + (k // 60) % 20 for k in range(self.stream_len)]},
+                "cadence": {"data": [85 + k % 5 for k in range(self.stream_len)]},
+                "grade_smooth": {"data": [((k // 120) % 5 - 2) * 1.5 for k in range(self.stream_len)]}
+            }
+        if path in ("/v1/archive", "/v1/forecast"):
+            forecast = path == "/v1/forecast"
+            start = datetime.strptime(query["start_date"][0], "%Y-%m-%d")
+            end = datetime.strptime(query["end_date"][0], "%Y-%m-%d")
+            days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+            hourly = {"time": [], "temperature_2m": [], "relative_humidity_2m": []}
+            for d in days:
+                for h in range(24):
+                    stamp = f"{d.strftime('%Y-%m-%d')}T{h:02d}"
+                    # Come l'archivio reale: le ore più recenti non sono ancora disponibili (null)
+                    available = forecast or self.archive_until is None or stamp[:len(self.archive_until)] <= self.archive_until
+                    hourly["time"].append(f"{stamp}:00")
+                    hourly["temperature_2m"].append((30.0 if forecast else 12.0 + h * 0.5) if available else None)
+                    hourly["relative_humidity_2m"].append((40 if forecast else 70 - h) if available else None)
+            return 200, {"hourly": hourly}
+        return 404, {"message": "Record Not Found"}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                headers = {}
+                with server._lock:
+                    server.requests.append(url.path)
+                    server._in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server._in_flight)
+                    limited = False
+                    if server.rate_limit and url.path.startswith("/api/v3"):
+                        limited = server.strava_usage >= min(server.rate_limit)
+                        if limited:
+                            server.throttled += 1
+                        else:
+                            server.strava_usage += 1
+                        headers = {
+                            "X-RateLimit-Limit": f"{server.rate_limit[0]},{server.rate_limit[1]}",
+                            "X-RateLimit-Usage": f"{server.strava_usage},{server.strava_usage}"
+                        }
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    if limited:
+                        status, body = 429, {"message": "Rate Limit Exceeded"}
+                    else:
+                        status, body = server._route(url.path, parse_qs(url.query))
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,160 @@
+"""
+Client Supabase in memoria (sottoinsieme del query builder postgrest) per testare
+DatabaseService senza rete. Supporta select con alias e percorsi JSON
+('details:raw_data->details'), filtri eq/neq/gt/gte/lt/lte/in_/or_ (con la semantica SQL dei NULL), order, limit,
+insert/upsert/update/delete, count="exact" e il tetto di righe max_rows.
+
+    db = DatabaseService.__new__(DatabaseService)
+    db.client = FakeSupabase({"runs": [...]})
+"""
+import copy
+import json
+import operator
+from typing import Any, Dict, List, Optional
+from services.local_db import parse_or_filter
+
+_OPS = {"eq": operator.eq, "neq": operator.ne, "gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+def _sql_match(x, op, v) -> bool:
+    """Confronto con la semantica SQL: NULL non soddisfa nessun operatore tranne IS"""
+    if op == "is":
+        return x is v
+    return x is not None and _OPS[op](x, v)
+
+class FakeResponse:
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+def _project(row: Dict[str, Any], columns: str) -> Dict[str, Any]:
+    if columns.strip() == "*":
+        return copy.deepcopy(row)
+    out = {}
+    for col in (c.strip() for c in columns.split(",")):
+        alias, _, path = col.rpartition(":")
+        parts = path.split("->")
+        value = row.get(parts[0])
+        for key in parts[1:]:
+            value = value.get(key) if isinstance(value, dict) else None
+        out[alias or parts[-1]] = copy.deepcopy(value)
+    return out
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.count_mode = None
+        self.filters = []
+        self.orders = []
+        self.limit_n = None
+        self.offset = 0
+        self.payload = None
+        self.on_conflict = "id"
+
+    # --- operazioni ---
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.op, self.columns, self.count_mode = "select", columns, count
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict: str = "id"):
+        self.op, self.payload = "upsert", rows if isinstance(rows, list) else [rows]
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # --- filtri ---
+    def _f(self, col, fn):
+        self.filters.append((col, fn))
+        return self
+
+    def eq(self, col, v): return self._f(col, lambda x: x == v)
+    def neq(self, col, v): return self._f(col, lambda x: x is not None and x != v)
+    def gt(self, col, v): return self._f(col, lambda x: x is not None and x > v)
+    def gte(self, col, v): return self._f(col, lambda x: x is not None and x >= v)
+    def lt(self, col, v): return self._f(col, lambda x: x is not None and x < v)
+    def lte(self, col, v): return self._f(col, lambda x: x is not None and x <= v)
+    def in_(self, col, values): return self._f(col, lambda x: x in values)
+
+    def or_(self, filters: str):
+        alts = parse_or_filter(filters)
+        self.filters.append((None, lambda row: any(
+            all(_sql_match(row.get(c), op, v) for c, op, v in conj) for conj in alts)))
+        return self
+
+    def order(self, col, desc: bool = False):
+        self.orders.append((col, desc))
+        return self
+
+    def limit(self, n: int):
+        self.limit_n = n
+        return self
+
+    def range(self, start: int, end: int):
+        self.offset, self.limit_n = start, end - start + 1
+        return self
+
+    def _match(self, row):
+        return all(fn(row) if col is None else fn(row.get(col)) for col, fn in self.filters)
+
+    def execute(self) -> FakeResponse:
+        rows = self.db.tables.setdefault(self.table, [])
+        self.db.calls.append((self.table, self.op, self.columns))
+        if self.op == "insert":
+            rows.extend(copy.deepcopy(self.payload))
+            return FakeResponse(copy.deepcopy(self.payload))
+        if self.op == "upsert":
+            keys = [k.strip() for k in self.on_conflict.split(",")]
+            for new in self.payload:
+                existing = next((r for r in rows if all(r.get(k) == new.get(k) for k in keys)), None)
+                if existing is not None:
+                    existing.update(copy.deepcopy(new))
+                else:
+                    rows.append(copy.deepcopy(new))
+            return FakeResponse(copy.deepcopy(self.payload))
+        if self.op == "update":
+            matched = [r for r in rows if self._match(r)]
+            for r in matched:
+                r.update(copy.deepcopy(self.payload))
+            return FakeResponse(copy.deepcopy(matched))
+        if self.op == "delete":
+            matched = [r for r in rows if self._match(r)]
+            self.db.tables[self.table] = [r for r in rows if not self._match(r)]
+            return FakeResponse(matched)
+
+        matched = [r for r in rows if self._match(r)]
+        for col, desc in reversed(self.orders):
+            matched.sort(key=lambda r: (r.get(col) is None, r.get(col)), reverse=desc)
+        total = len(matched)
+        matched = matched[self.offset:]
+        if self.limit_n is not None:
+            matched = matched[:self.limit_n]
+        if self.db.max_rows is not None:
+            # Come db-max-rows di PostgREST: troncamento silenzioso
+            matched = matched[:self.db.max_rows]
+        data = [_project(r, self.columns) for r in matched]
+        # Payload JSON come arriverebbe da PostgREST
+        self.db.bytes_received += len(json.dumps(data))
+        return FakeResponse(data, total if self.count_mode == "exact" else None)
+
+class FakeSupabase:
+    def __init__(self, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None, max_rows: Optional[int] = None):
+        self.tables = {k: copy.deepcopy(v) for k, v in (tables or {}).items()}
+        self.max_rows = max_rows
+        self.calls = []
+        self.bytes_received = 0
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+from controllers.sync_controller import RunWriter, SyncController
+from services.rate_limiter import StravaRateLimiter
+from services.strava_api import StravaService
+from tests.fake_strava import FakeStravaServer
+from tests.fake_supabase import FakeQuery
+from tests.test_history_summary import make_db
+
+def run_obj(run_id, **overrides):
+    run = {
+        "id": run_id, "name": f"Run {run_id}", "Data": "2026-01-01", "Moving Time": 600, "Dist (km)": 2.0,
+        "Power": 250, "HR": 150, "Decoupling": 1.0, "SCORE": 70.0, "WCF": 1.0, "WR_Pct": 0.0,
+        "Rank": "B", "Meteo": "20°C", "SCORE_DETAIL": {}, "raw_watts": [250] * 600, "raw_hr": [150] * 600
+    }
+    run.update(overrides)
+    return run
+
+def upserts(db):
+    return [c for c in db.client.calls if c[:2] == ("runs", "upsert")]
+
+class TestSaveRunsBulk(unittest.TestCase):
+    def test_chunked_upserts(self):
+        db = make_db([])
+        result = db.save_runs_bulk([run_obj(i) for i in range(120)], 1, chunk_size=50)
+        self.assertEqual(len(result["saved"]), 120)
+        self.assertEqual(result["failed"], {})
+        self.assertEqual(len(upserts(db)), 3)
+        self.assertEqual(len(db.client.tables["runs"]), 120)
+        self.assertEqual(len(db.get_run_streams(7)["watts"]), 600)
+
+    def test_partial_failure_reported_per_row(self):
+        db = make_db([])
+        execute = FakeQuery.execute
+
+        def reject_run_7(query):
+            if query.op == "upsert" and any(r.get("id") == 7 for r in query.payload):
+                raise RuntimeError("violates check constraint")
+            return execute(query)
+
+        runs = [run_obj(i) for i in range(10)]
+        del runs[3]["Power"]  # riga non mappabile
+        with mock.patch.object(FakeQuery, "execute", reject_run_7):
+            result = db.save_runs_bulk(runs, 1, chunk_size=5)
+        self.assertEqual(set(result["failed"]), {3, 7})
+        self.assertIn("constraint", result["failed"][7])
+        self.assertEqual(sorted(result["saved"]), [0, 1, 2, 4, 5, 6, 8, 9])
+        # Cache locali e inviluppo curve solo per le corse davvero salvate
+        self.assertEqual(sorted(db.stream_store.get_many(range(10))), result["saved"])
+        self.assertFalse(db.curve_store.has(7))
+        self.assertTrue(db.curve_store.has(8))
+
+    def test_save_run_single(self):
+        db = make_db([])
+        self.assertTrue(db.save_run(run_obj(1), 1))
+        self.assertFalse(db.save_run({"id": 2}, 1))
+
+class TestRunWriter(unittest.TestCase):
+    def test_flush_on_size_and_time(self):
+        db = make_db([])
+        writer = RunWriter(db, 1, chunk_size=4, flush_sec=3600)
+        for i in range(10):
+            writer.add(run_obj(i))
+        self.assertEqual(len(upserts(db)), 2)
+        writer.flush()
+        self.assertEqual(len(writer.saved), 10)
+        self.assertEqual(len(upserts(db)), 3)
+
+        timed = RunWriter(db, 1, chunk_size=100, flush_sec=0)
+        timed.add(run_obj(50))
+        self.assertEqual(len(timed.saved), 1)
+
+class TestBulkSync(unittest.TestCase):
+    def test_initial_sync_issues_few_db_requests(self):
+        n = 120
+        db = make_db([])
+        with FakeStravaServer(n_activities=n) as srv:
+            auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000))
+            ctrl = SyncController(auth, db)
+            with srv.patch_weather():
+                count, _ = ctrl.run_sync("tok", 1, {}, [], [])
+        self.assertEqual(count, n)
+        self.assertEqual(len(db.client.tables["runs"]), n)
+        self.assertLessEqual(len(upserts(db)), 3)
+        self.assertLess(len(db.client.calls), 30)
+
+if __name__ == "__main__":
+    unittest.main()
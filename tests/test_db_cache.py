@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+from controllers.sync_controller import SyncController
+from services.db_cache import CachedDatabaseService, DBCache
+from services.rate_limiter import StravaRateLimiter
+from services.strava_api import StravaService
+from tests.fake_strava import FakeStravaServer
+from tests.test_bulk_runs import run_obj
+from tests.test_history_summary import make_db, make_row
+
+TTLS = {"get_athlete_profile": 300, "get_history_summary": 300, "get_run_ids_for_athlete": 300,
+        "get_athlete_baselines": 300}
+
+def reads(db, table):
+    return sum(1 for t, op, _ in db.client.calls if t == table and op == "select")
+
+class TestCachedDatabaseService(unittest.TestCase):
+    def setUp(self):
+        rows = [make_row(1, "2026-01-01T07:00:00", 60), dict(make_row(2, "2026-01-02T07:00:00", 60), athlete_id=2)]
+        self.raw = make_db(rows)
+        self.raw.client.tables["athletes"] = [{"id": 1, "ftp": 250}, {"id": 2, "ftp": 300}]
+        self.cache = DBCache()
+        self.db = CachedDatabaseService(self.raw, self.cache, TTLS)
+
+    def test_repeated_reads_hit_cache(self):
+        for _ in range(3):
+            self.assertEqual(self.db.get_athlete_profile(1)["ftp"], 250)
+            self.assertEqual(len(self.db.get_history_summary(athlete_id=1)), 1)
+        self.assertEqual(reads(self.raw, "athletes"), 1)
+        self.assertEqual(reads(self.raw, "runs"), 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (4, 2))
+        self.assertEqual(stats["methods"]["get_history_summary"], {"hits": 2, "misses": 1})
+
+    def test_returned_values_are_copies(self):
+        self.db.get_history_summary(1)[0]["SCORE"] = -1
+        self.assertEqual(self.db.get_history_summary(1)[0]["SCORE"], 70.0)
+
+    def test_write_through_invalidates_only_that_athlete(self):
+        self.db.get_history_summary(1)
+        self.db.get_history_summary(2)
+        self.db.get_athlete_profile(1)
+        self.assertTrue(self.db.save_run(run_obj(10, Data="2026-01-05"), 1))
+        self.assertEqual([r["id"] for r in self.db.get_history_summary(1)], [10, 1])
+        self.db.get_history_summary(2)
+        self.db.get_athlete_profile(1)
+        self.assertEqual(reads(self.raw, "runs"), 3)
+        self.assertEqual(reads(self.raw, "athletes"), 1)
+
+        self.db.save_athlete_profile({"id": 1, "ftp": 260})
+        self.assertEqual(self.db.get_athlete_profile(1)["ftp"], 260)
+
+        self.db.get_athlete_baselines(1)
+        self.db.update_athlete_baseline(1, "5k", 1300.0)
+        self.assertEqual(self.db.get_athlete_baselines(1), {"5k": 1300.0})
+
+        self.assertTrue(self.db.reset_history(1))
+        self.assertEqual(self.db.get_history_summary(1), [])
+        self.assertEqual(len(self.db.get_history_summary(2)), 1)
+
+    def test_ttl_expiry_and_delegation(self):
+        db = CachedDatabaseService(self.raw, self.cache, {"get_athlete_profile": 0})
+        db.get_athlete_profile(1)
+        db.get_athlete_profile(1)
+        self.assertEqual(reads(self.raw, "athletes"), 2)
+        # Metodi non memorizzati passano direttamente al servizio
+        self.assertIs(db.get_stream_store(), self.raw.get_stream_store())
+
+    def test_failed_reads_are_not_cached(self):
+        # Errore transitorio: il ripiego vuoto non deve restare in cache per il TTL
+        with mock.patch.object(self.raw.client, "table", side_effect=RuntimeError("timeout")):
+            self.assertEqual(self.db.get_run_ids_for_athlete(1), [])
+            self.assertIsNone(self.db.get_athlete_profile(1))
+        self.assertEqual(self.db.get_run_ids_for_athlete(1), [1])
+        self.assertEqual(self.db.get_athlete_profile(1)["ftp"], 250)
+        self.assertEqual(self.cache.stats()["entries"], 2)
+
+    def test_sync_sees_its_own_writes(self):
+        db = CachedDatabaseService(make_db([]), DBCache(), TTLS)
+        self.assertEqual(db.get_history_summary(1), [])
+        with FakeStravaServer(n_activities=12) as srv:
+            auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000))
+            with srv.patch_weather():
+                count, _ = SyncController(auth, db).run_sync("tok", 1, {}, [], [])
+        self.assertEqual(len(db.get_history_summary(1)), count)
+        self.assertEqual(count, 12)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+from config import Config
+from engine.core import ScoreEngine
+from engine.dashboard_logic import DashboardLogic
+from engine.metrics import MetricsCalculator
+from services.derived_cache import DerivedCache
+from tests.test_history_summary import make_db, make_row
+
+class TestDerivedCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = DerivedCache(":memory:")
+        self.logic = DashboardLogic(ScoreEngine(), self.cache)
+        self.watts = [200 + i % 50 for i in range(1200)]
+        self.hr = [140 + i % 20 for i in range(1200)]
+        self.loads = 0
+
+    def _load(self):
+        self.loads += 1
+        return {"watts": self.watts, "hr": self.hr}
+
+    def test_second_open_is_a_lookup(self):
+        first = self.logic.get_run_derived(1, 250, None, self._load)
+        second = self.logic.get_run_derived(1, 250, None, self._load)
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(second["ef"], MetricsCalculator.calculate_efficiency_factor(self.watts, self.hr))
+        self.assertEqual(second["zones"], MetricsCalculator.calculate_zones(self.watts, 250))
+        self.assertEqual(len(second["scatter"]["watts"]), 120)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_invalidated_by_ftp_zones_and_engine_version(self):
+        zones = {"zones": [{"min": 0, "max": 150}]}
+        self.logic.get_run_derived(1, 250, zones, self._load)
+        other = self.logic.get_run_derived(1, 300, zones, self._load)
+        self.assertEqual(other["zones"], MetricsCalculator.calculate_zones(self.watts, 300))
+        self.logic.get_run_derived(1, 300, {"zones": [{"min": 0, "max": 160}]}, self._load)
+        with mock.patch.object(Config, "ENGINE_VERSION", "99.0"):
+            self.logic.get_run_derived(1, 300, zones, self._load)
+        self.assertEqual(self.loads, 4)
+        # Una sola voce per corsa: la vecchia chiave è stata sostituita
+        self.assertEqual(self.cache.stats()["runs"], 1)
+
+    def test_lru_eviction_within_budget(self):
+        self.logic.get_run_derived(1, 250, None, self._load)
+        size = self.cache.stats()["bytes"]
+        self.cache.max_bytes = size * 2
+        self.logic.get_run_derived(2, 250, None, self._load)
+        self.logic.get_run_derived(1, 250, None, self._load)   # 1 torna il più recente
+        self.logic.get_run_derived(3, 250, None, self._load)
+        self.assertLessEqual(self.cache.stats()["bytes"], self.cache.max_bytes)
+        self.assertIsNotNone(self.cache.get(1, 250))
+        self.assertIsNone(self.cache.get(2, 250))
+
+    def test_persisted_with_the_run(self):
+        db = make_db([make_row(1, "2026-01-01T07:00:00", 600)])
+        db.derived_cache = self.cache
+        first = DashboardLogic(ScoreEngine(), db.get_derived_store()).get_run_derived(1, 250, None, self._load)
+        self.assertEqual(db.get_run_derived(1)["data"], first)
+
+        # Redeploy: cache locale persa, la voce arriva da runs.derived senza ricaricare gli stream
+        db.derived_cache = DerivedCache(":memory:")
+        again = DashboardLogic(ScoreEngine(), db.get_derived_store()).get_run_derived(1, 250, None, self._load)
+        self.assertEqual((again, self.loads), (first, 1))
+        self.assertEqual(db.derived_cache.stats()["runs"], 1)
+        # Altra FTP: la voce persistita non combacia
+        DashboardLogic(ScoreEngine(), db.get_derived_store()).get_run_derived(1, 300, None, self._load)
+        self.assertEqual(self.loads, 2)
+
+    def test_reset_history_invalidates(self):
+        db = make_db([make_row(1, "2026-01-01T07:00:00", 600)])
+        db.derived_cache = self.cache
+        self.cache.put(1, 250, None, {"ef": {}})
+        db.reset_history(1)
+        self.assertEqual(self.cache.stats()["runs"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from services.db import DatabaseService
+from services.curve_store import CurveStore
+from services.derived_cache import DerivedCache
+from services.stream_store import StreamStore
+from tests.fake_supabase import FakeSupabase
+
+def make_row(run_id, date, samples=3600):
+    return {
+        "id": run_id, "athlete_id": 1, "date": date, "name": f"Run {run_id}",
+        "duration_sec": samples, "distance_km": 10.0, "avg_power": 250, "avg_hr": 150,
+        "decoupling": 3.2, "score": 70.0, "wcf": 1.0, "wr_pct": 0.0, "rank": "B",
+        "meteo_desc": "20°C", "ai_feedback": None, "quality": None, "achievements": [],
+        "trend": {}, "comparison": {}, "score_version": "1.0",
+        "raw_data": {
+            "watts": [250] * samples,
+            "hr": [150] * samples,
+            "details": {"score": 70.0, "wcf": 1.0}
+        }
+    }
+
+def make_db(rows):
+    db = DatabaseService.__new__(DatabaseService)
+    db.client = FakeSupabase({"runs": rows})
+    db.stream_store = StreamStore(":memory:")
+    db.curve_store = CurveStore(":memory:")
+    db.derived_cache = DerivedCache(":memory:")
+    return db
+
+class TestHistorySummary(unittest.TestCase):
+    def setUp(self):
+        self.rows = [make_row(1, "2026-01-01T07:00:00"), make_row(2, "2026-01-03T07:00:00")]
+        self.db = make_db(self.rows)
+
+    def test_summary_matches_full_history_without_streams(self):
+        full = self.db.get_history(1)
+        summary = self.db.get_history_summary(1)
+        self.assertEqual([r["id"] for r in summary], [2, 1])
+        for f, s in zip(full, summary):
+            self.assertNotIn("raw_watts", s)
+            self.assertNotIn("raw_hr", s)
+            self.assertEqual({k: v for k, v in f.items() if k not in ("raw_watts", "raw_hr")}, s)
+        self.assertEqual(summary[0]["SCORE_DETAIL"], {"score": 70.0, "wcf": 1.0})
+        self.assertEqual(summary[0]["Moving Time"], 3600)
+
+    def test_summary_payload_is_smaller(self):
+        self.db.get_history(1)
+        full_bytes = self.db.client.bytes_received
+        self.db.client.bytes_received = 0
+        self.db.get_history_summary(1)
+        self.assertLess(self.db.client.bytes_received * 20, full_bytes)
+
+    def test_run_streams_loaded_on_demand(self):
+        streams = self.db.get_run_streams(2)
+        self.assertEqual(len(streams["watts"]), 3600)
+        self.assertEqual(len(streams["hr"]), 3600)
+        missing = self.db.get_run_streams(99)
+        self.assertEqual((len(missing["watts"]), len(missing["hr"])), (0, 0))
+
+if __name__ == "__main__":
+    unittest.main()
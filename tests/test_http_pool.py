@@ -0,0 +1,42 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from services.http_pool import PooledSession, get_session, session_stats
+from services.meteo_svc import WeatherService
+from services.rate_limiter import StravaRateLimiter
+from services.strava_api import StravaService
+from tests.fake_strava import FakeStravaServer
+
+class TestPooledSession(unittest.TestCase):
+    def test_connections_are_reused(self):
+        session = PooledSession(pool_size=4)
+        with FakeStravaServer() as srv:
+            for _ in range(10):
+                self.assertEqual(session.get(f"{srv.strava_url}/athlete/activities").status_code, 200)
+        stats = session.stats()
+        self.assertEqual(stats["requests"], 10)
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["connections_reused"], 9)
+
+    def test_shared_across_workers(self):
+        session = PooledSession(pool_size=4)
+        with FakeStravaServer(latency=0.01) as srv:
+            auth = StravaService("id", "secret", base_url=srv.strava_url,
+                                 limiter=StravaRateLimiter(10_000, 100_000), session=session)
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                results = list(pool.map(lambda i: auth.fetch_streams("tok", 1000 + i), range(40)))
+        self.assertTrue(all(r and r["watts"]["data"] for r in results))
+        stats = session.stats()
+        self.assertEqual(stats["requests"], 40)
+        self.assertLessEqual(stats["connections_opened"], 4)
+
+    def test_weather_uses_shared_session(self):
+        with FakeStravaServer() as srv, srv.patch_weather():
+            before = session_stats().get("meteo", {}).get("requests", 0)
+            t, h, real = WeatherService.get_weather(45.0, 9.0, "2024-01-01", 10)
+        self.assertTrue(real)
+        self.assertEqual((t, h), (17.0, 60.0))
+        self.assertIs(get_session("meteo"), get_session("meteo"))
+        self.assertEqual(session_stats()["meteo"]["requests"], before + 1)
+
+if __name__ == '__main__':
+    unittest.main()
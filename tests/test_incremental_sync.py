@@ -0,0 +1,83 @@
+import unittest
+from controllers.sync_controller import SyncController
+from services.rate_limiter import StravaRateLimiter
+from services.strava_api import StravaService, activity_epoch
+from tests.fake_strava import FakeStravaServer
+from tests.test_sync_concurrency import FakeSyncDB
+
+class TestIncrementalSync(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeSyncDB()
+
+    def _sync(self, srv, mode="incremental"):
+        auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000))
+        ctrl = SyncController(auth, self.db)
+        existing = [r["id"] for r in self.db.saved]
+        before = srv.count("/api/v3/athlete/activities")
+        with srv.patch_weather():
+            count, _ = ctrl.run_sync("tok", 1, {}, existing, [], mode=mode)
+        return count, srv.count("/api/v3/athlete/activities") - before
+
+    def test_first_sync_backfills_and_sets_cursor(self):
+        with FakeStravaServer(n_activities=15) as srv:
+            count, calls = self._sync(srv)
+            newest = activity_epoch(srv.activities[0])
+        self.assertEqual((count, calls), (15, 1))
+        self.assertEqual(self.db.cursor["last_activity_at"], newest)
+        self.assertTrue(self.db.cursor["backfill_done"])
+
+    def test_repeat_sync_costs_one_call(self):
+        with FakeStravaServer(n_activities=15) as srv:
+            self._sync(srv)
+            self.assertEqual(self._sync(srv), (0, 1))
+
+            srv.add_activities(3)
+            count, calls = self._sync(srv)
+            self.assertEqual((count, calls), (3, 1))
+            self.assertEqual(self.db.cursor["last_activity_at"], activity_epoch(srv.activities[0]))
+        self.assertEqual(len({r["id"] for r in self.db.saved}), 18)
+
+    def test_backfill_walks_history_in_pages(self):
+        with FakeStravaServer(n_activities=450) as srv:
+            auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000))
+            acts, done = auth.fetch_activities_before("tok", activity_epoch(srv.activities[0]) + 1, max_pages=2)
+            self.assertEqual((len(acts), done), (400, False))
+            rest, done = auth.fetch_activities_before("tok", min(activity_epoch(a) for a in acts))
+            self.assertEqual((len(rest), done), (50, True))
+        self.assertEqual(len({a["id"] for a in acts + rest}), 450)
+
+    def test_failed_fetch_keeps_cursor(self):
+        with FakeStravaServer(n_activities=5) as srv:
+            self._sync(srv)
+            cursor = dict(self.db.cursor)
+            # Endpoint che risponde 404: la pagina fallisce, errore e cursore fermo
+            auth = StravaService("id", "secret", base_url=f"{srv.base}/missing", limiter=StravaRateLimiter(10_000, 100_000))
+            count, msg = SyncController(auth, self.db).run_sync("tok", 1, {}, [1], [])
+        self.assertEqual(count, -1)
+        self.assertIn("Strava", msg)
+        self.assertEqual(self.db.cursor, cursor)
+
+    def test_backfill_resumes_on_incremental_syncs(self):
+        with FakeStravaServer(n_activities=1100) as srv:
+            count, _ = self._sync(srv)
+            self.assertEqual(count, 1000)
+            self.assertFalse(self.db.cursor["backfill_done"])
+            # Sync successiva (incrementale): riprende il backfill dove si era fermato
+            srv.add_activities(2)
+            count, _ = self._sync(srv)
+            self.assertEqual(count, 102)
+        self.assertTrue(self.db.cursor["backfill_done"])
+        self.assertEqual(len({r["id"] for r in self.db.saved}), 1102)
+
+    def test_old_new_runs_are_not_cut_off(self):
+        # Attività dopo il cursore ma vecchie di anni: nessuna finestra in giorni le scarta
+        with FakeStravaServer(n_activities=3) as srv:
+            self._sync(srv)
+            srv.add_activities(4)
+            auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000))
+            with srv.patch_weather():
+                count, _ = SyncController(auth, self.db).run_sync("tok", 1, {}, [r["id"] for r in self.db.saved], [])
+        self.assertEqual(count, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -66,5 +66,32 @@ class TestInsightsEngine(unittest.TestCase):
         res = self.insights.calculate_consistency_score(pd.DataFrame())
         self.assertEqual(res["score"], 0.0)
 
+class TestInsightsState(unittest.TestCase):
+    def test_push_matches_batch_gaming_feedback(self):
+        from engine.core import ScoreEngine
+        engine = ScoreEngine()
+        rng = np.random.default_rng(11)
+        for n_hist in (0, 3, 40):
+            scores = rng.uniform(30, 100, n_hist + 60).round(2).tolist()
+            state = engine.insights_state(scores[:n_hist])
+            for i in range(n_hist, len(scores)):
+                got = state.push(scores[i])
+                expected = engine.gaming_feedback(scores[:i + 1])
+                self.assertEqual(got["quality"], expected["quality"])
+                self.assertEqual(got["achievements"], expected["achievements"])
+                self.assertEqual(got["trend"]["direction"], expected["trend"]["direction"])
+                self.assertAlmostEqual(got["trend"]["delta"], expected["trend"]["delta"], places=9)
+                self.assertEqual(got["comparison"], expected["comparison"])
+        self.assertEqual(sum(state.achievement_counts.values()),
+                         sum(len(engine.achievements(scores[:i + 1])) for i in range(40, len(scores))))
+
+    def test_steady_then_jump(self):
+        from engine.insights import InsightsState
+        state = InsightsState().extend([80] * 30)
+        self.assertEqual(state.trend()["direction"], "flat")
+        for _ in range(5):
+            out = state.push(95)
+        self.assertEqual(out["trend"]["direction"], "up")
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+import pandas as pd
+from config import Config
+from engine.core import ScoreEngine
+from engine.dashboard_logic import DashboardLogic
+from tests.test_history_summary import make_db
+
+def week_end(day: date) -> date:
+    """kpi_week_end della migrazione v4_9: lunedì che chiude la settimana"""
+    return day + timedelta(days=(8 - day.isoweekday()) % 7)
+
+class TestKpiAggregates(unittest.TestCase):
+    def setUp(self):
+        self.logic = DashboardLogic(ScoreEngine())
+        start = date(2026, 1, 1)
+        # Settimane irregolari, una settimana vuota e corse di lunedì (chiudono la settimana)
+        offsets = [0, 1, 4, 5, 6, 11, 12, 25, 26, 27, 28, 32, 33, 34, 39]
+        self.runs = pd.DataFrame({
+            "id": range(1, len(offsets) + 1),
+            "Data": [pd.Timestamp(start + timedelta(days=o)) + pd.Timedelta(hours=7) for o in offsets],
+            "SCORE": [60.0 + (i * 7) % 13 for i in range(len(offsets))],
+            "Dist (km)": 10.0,
+            "Moving Time": 3600,
+        })
+
+    def weekly_rows(self):
+        counts = {}
+        for ts in self.runs["Data"]:
+            key = week_end(ts.date())
+            counts[key] = counts.get(key, 0) + 1
+        return [{"week_end": k.isoformat(), "runs": v} for k, v in sorted(counts.items())]
+
+    def test_weekly_consistency_matches_resample(self):
+        expected = self.logic.prepare_consistency_score(self.runs)
+        self.assertEqual(self.logic.consistency_from_weekly(self.weekly_rows()), expected)
+        for n in (3, 8, 12):
+            part = self.runs.head(n)
+            rows = [r for r in self.weekly_rows() if r["week_end"] <= week_end(part["Data"].iloc[-1].date()).isoformat()]
+            self.assertEqual(self.logic.consistency_from_weekly(rows), self.logic.prepare_consistency_score(part))
+        self.assertEqual(self.logic.consistency_from_weekly([]), {"score": 0.0})
+
+    def test_trend_frame_matches_pandas_trend(self):
+        expected = self.logic.prepare_trend_data(self.runs)
+        # Righe come le scrive refresh_run_score_ma (finestre di 7/28 corse per data, id)
+        scores = self.runs["SCORE"]
+        rows = [{"run_id": int(r.id), "date": r.Data.isoformat() + "+00:00", "score": r.SCORE,
+                 "ma7": scores[max(0, i - 6):i + 1].mean(), "ma28": scores[max(0, i - 27):i + 1].mean()}
+                for i, r in enumerate(self.runs.itertuples())]
+        trend = self.logic.trend_frame(rows)
+        self.assertEqual(list(trend["id"]), list(expected["id"]))
+        self.assertEqual(list(trend["Data"]), list(expected["Data"]))
+        for col in ("SCORE_MA_7", "SCORE_MA_28"):
+            self.assertEqual([round(v, 9) for v in trend[col]], [round(v, 9) for v in expected[col]])
+        self.assertAlmostEqual(self.logic.calculate_delta(trend), self.logic.calculate_delta(expected))
+
+    def test_readers(self):
+        db = make_db([])
+        db.client.tables["run_score_ma"] = [
+            {"run_id": 2, "athlete_id": 1, "date": "2026-01-03T07:00:00", "score": 70.0, "ma7": 65.0, "ma28": 65.0},
+            {"run_id": 1, "athlete_id": 1, "date": "2026-01-01T07:00:00", "score": 60.0, "ma7": 60.0, "ma28": 60.0},
+            {"run_id": 9, "athlete_id": 2, "date": "2026-01-02T07:00:00", "score": 50.0, "ma7": 50.0, "ma28": 50.0},
+        ]
+        db.client.tables["athlete_weekly_stats"] = [
+            {"athlete_id": 1, "week_end": "2026-01-12", "runs": 1, "moving_min": 60.0, "distance_km": 10.0, "avg_score": 70.0},
+            {"athlete_id": 1, "week_end": "2026-01-05", "runs": 2, "moving_min": 120.0, "distance_km": 20.0, "avg_score": 65.0},
+        ]
+        self.assertEqual([r["run_id"] for r in db.get_score_trend(1)], [1, 2])
+        self.assertEqual([r["run_id"] for r in db.get_score_trend(1, since=date(2026, 1, 2))], [2])
+        self.assertEqual([r["week_end"] for r in db.get_weekly_stats(1)], ["2026-01-05", "2026-01-12"])
+        self.assertEqual(db.get_weekly_stats(1, since="2026-01-06")[0]["runs"], 1)
+        self.assertEqual(db.get_monthly_stats(1), [])
+
+    def test_score_trend_reads_past_the_row_cap(self):
+        db = make_db([])
+        db.client.tables["run_score_ma"] = [
+            {"run_id": i, "athlete_id": 1, "date": f"2026-01-{1 + i // 2:02d}T07:00:00", "score": 60.0, "ma7": 60.0, "ma28": 60.0}
+            for i in range(1, 12)
+        ]
+        db.client.max_rows = 4
+        with mock.patch.object(Config, "DB_PAGE_SIZE", 4):
+            self.assertEqual([r["run_id"] for r in db.get_score_trend(1)], list(range(1, 12)))
+
+if __name__ == "__main__":
+    unittest.main()
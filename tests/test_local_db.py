@@ -0,0 +1,139 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from config import Config
+from services.curve_store import CurveStore
+from controllers.sync_controller import SyncController
+from services.db import DatabaseService
+from services.derived_cache import DerivedCache
+from services.local_db import SQLiteClient
+from services.rate_limiter import StravaRateLimiter
+from services.strava_api import StravaService
+from services.stream_store import StreamStore
+from tests.fake_strava import FakeStravaServer
+from tests.test_bulk_runs import run_obj
+from tests.test_history_summary import make_db, make_row
+
+def make_local_db(rows=()):
+    db = DatabaseService.__new__(DatabaseService)
+    db.client = SQLiteClient(":memory:")
+    if rows:
+        db.client.table("runs").upsert(list(rows)).execute()
+    db.stream_store = StreamStore(":memory:")
+    db.curve_store = CurveStore(":memory:")
+    db.derived_cache = DerivedCache(":memory:")
+    return db
+
+class TestSQLiteBackend(unittest.TestCase):
+    def setUp(self):
+        self.rows = [make_row(i, f"2026-01-{i:02d}T07:00:00", 600) for i in range(1, 6)]
+        self.rows.append(dict(make_row(99, "2026-01-03T07:00:00", 600), athlete_id=2))
+        self.local = make_local_db(self.rows)
+        self.fake = make_db(self.rows)
+
+    def test_reads_match_supabase_semantics(self):
+        for method in ("get_history", "get_history_summary", "get_run_ids_for_athlete", "get_run_loads"):
+            self.assertEqual(getattr(self.local, method)(1), getattr(self.fake, method)(1), method)
+        self.assertEqual(self.local.get_history_summary(2)[0]["id"], 99)
+        self.assertEqual(list(self.local.get_run_streams(3)["watts"]), [250] * 600)
+        self.assertEqual(self.local.get_weather_audit(3), self.fake.get_weather_audit(3))
+        self.assertEqual(self.local.count_stale_runs(1, "4.2"), 5)
+
+    def test_writes_and_conflict_targets(self):
+        db = self.local
+        self.assertTrue(db.save_athlete_profile({"id": 1, "ftp": 250, "hr_max": 190})[0])
+        self.assertTrue(db.update_athlete_zones(1, {"zones": [{"min": 0, "max": 150}]}))
+        profile = db.get_athlete_profile(1)
+        self.assertEqual((profile["ftp"], profile["hr_zones"]["zones"][0]["max"]), (250, 150))
+
+        self.assertFalse(db.has_athlete_bests(1))
+        db.save_athlete_bests(1, [{"athlete_id": 1, "distance_type": "5k", "best_time": 1200}])
+        db.save_athlete_bests(1, [{"athlete_id": 1, "distance_type": "5k", "best_time": 1150}])
+        self.assertTrue(db.has_athlete_bests(1))
+        self.assertEqual(db.client.table("athlete_bests").select("*").execute().data[0]["best_time"], 1150)
+
+        db.save_athlete_baselines(1, {"10k": 3000.0, "5k": 1400.0})
+        db.update_athlete_baseline(1, "10k", 2900.0)
+        self.assertEqual(db.get_athlete_baselines(1), {"10k": 2900.0, "5k": 1400.0})
+
+        db.update_streak(1)
+        self.assertEqual(db.get_athlete_profile(1)["streak"], 5)
+        self.assertTrue(db.update_ai_feedback(2, "ok"))
+        self.assertEqual(db.client.table("runs").select("ai_feedback").eq("id", 2).execute().data, [{"ai_feedback": "ok"}])
+
+    def test_identity_and_save_runs_bulk(self):
+        db = self.local
+        self.assertTrue(db.save_replays([{"run_id": 1, "score": 70.0}, {"run_id": 2, "score": 71.0}]))
+        self.assertTrue(db.save_replay({"run_id": 3, "score": 72.0}))
+        self.assertEqual([r["id"] for r in db.client.table("score_replay").select("id").order("id").execute().data], [1, 2, 3])
+        self.assertTrue(db.save_feedback({"text": "bella app"})[0])
+
+        result = db.save_runs_bulk([run_obj(100 + i, Data=f"2026-02-{1 + i:02d}") for i in range(60)], 1, chunk_size=25)
+        self.assertEqual(len(result["saved"]), 60)
+        self.assertEqual(len(db.get_run_ids_for_athlete(1)), 65)
+        # Chiave duplicata in insert: errore come il 409 di PostgREST
+        self.assertFalse(db.save_feedback({"id": 1, "text": "doppio"})[0])
+
+        self.assertTrue(db.reset_history(1))
+        self.assertEqual(db.get_run_ids_for_athlete(1), [])
+        self.assertEqual(db.get_run_ids_for_athlete(2), [99])
+
+    def test_null_ordering_and_filters(self):
+        client = self.local.client
+        client.table("runs").update({"score": None}).eq("id", 2).execute()
+        asc = [r["id"] for r in client.table("runs").select("id").eq("athlete_id", 1).order("score").order("id").execute().data]
+        desc = [r["id"] for r in client.table("runs").select("id").eq("athlete_id", 1).order("score", desc=True).order("id").execute().data]
+        self.assertEqual((asc[-1], desc[0]), (2, 2))
+        res = client.table("runs").select("id", count="exact").in_("id", [1, 3, 99]).neq("athlete_id", 2).limit(1).execute()
+        self.assertEqual((res.count, len(res.data)), (2, 1))
+        self.assertEqual(client.table("runs").select("id").in_("id", []).execute().data, [])
+        paged = client.table("runs").select("id").eq("athlete_id", 1).order("date").range(1, 2).execute().data
+        self.assertEqual([r["id"] for r in paged], [2, 3])
+
+    def test_history_query_uses_athlete_date_index(self):
+        client = self.local.client
+        query = client.table("runs").select(DatabaseService.SUMMARY_COLUMNS).eq("athlete_id", 1).order("date", desc=True)
+        plan = " ".join(client.explain(*query.select_sql()))
+        self.assertIn("idx_runs_athlete_id_date", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_full_sync_offline(self):
+        db = make_local_db()
+        with FakeStravaServer(n_activities=30) as srv:
+            auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000))
+            with srv.patch_weather():
+                count, _ = SyncController(auth, db).run_sync("tok", 1, {}, [], [])
+        history = db.get_history_summary(1)
+        self.assertEqual((count, len(history)), (30, 30))
+        self.assertEqual(history, sorted(history, key=lambda r: r["Data"], reverse=True))
+        self.assertTrue(db.get_load_rows(1))
+
+    def test_selected_via_config_and_persistent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "score.sqlite"
+            with mock.patch.object(Config, "DB_BACKEND", "sqlite"), mock.patch.object(Config, "LOCAL_DB_PATH", path):
+                db = DatabaseService()
+                self.assertIsInstance(db.client, SQLiteClient)
+                db.client.table("runs").upsert(self.rows[:2]).execute()
+            reopened = SQLiteClient(path)
+            self.assertEqual(len(reopened.table("runs").select("id").execute().data), 2)
+
+    def test_selected_via_env_without_supabase_secrets(self):
+        secrets = {"strava": {"client_id": "id", "client_secret": "secret"}, "gemini": {"api_key": "k"}}
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("config.st.secrets", secrets):
+            env = {"SCORE_DB_BACKEND": "sqlite", "SCORE_LOCAL_DB_PATH": str(Path(tmp) / "env.sqlite")}
+            with mock.patch.dict("os.environ", env):
+                self.assertEqual(Config.check_secrets(), [])
+                db = DatabaseService()
+                self.assertIsInstance(db.client, SQLiteClient)
+                self.assertTrue((Path(tmp) / "env.sqlite").exists())
+            # Backend supabase (default): i segreti Supabase restano obbligatori
+            with mock.patch.dict("os.environ", {"SCORE_DB_BACKEND": ""}):
+                self.assertEqual(Config.check_secrets(), ["supabase.url", "supabase.key"])
+            # Anche dai secrets, sezione [database]
+            with mock.patch.dict("config.st.secrets", {"database": {"backend": "sqlite"}}):
+                self.assertEqual(Config.get_db_backend(), "sqlite")
+
+if __name__ == "__main__":
+    unittest.main()
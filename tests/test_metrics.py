@@ -1,6 +1,7 @@
 import unittest
+from unittest import mock
 import numpy as np
-from engine.metrics import MetricsCalculator, RunMetrics
+from engine.metrics import MeteoData, MetricsCalculator, RunMetrics
 
 class TestMetricsCalculator(unittest.TestCase):
 
@@ -93,5 +94,105 @@ class TestMetricsCalculator(unittest.TestCase):
         t_adj_2 = MetricsCalculator.calculate_t_adj(m2)
         self.assertLess(t_adj_2, 3600.0) # Should be faster/less time adjusted
 
+class TestDriftTimeline(unittest.TestCase):
+
+    def test_matches_classic_decoupling(self):
+        rng = np.random.default_rng(3)
+        for _ in range(50):
+            n = int(rng.integers(50, 3000))
+            power = rng.integers(0, 400, n).tolist()
+            hr = rng.integers(60, 190, n).tolist()
+            self.assertAlmostEqual(
+                MetricsCalculator.calculate_drift_timeline(power, hr)["decoupling"],
+                MetricsCalculator.calculate_decoupling(power, hr), places=12)
+
+    def test_timeline_tracks_cost(self):
+        # Cost costante per 20 min, poi HR +10% a parità di potenza
+        power = [200.0] * 2400
+        hr = [140.0] * 1200 + [154.0] * 1200
+        tl = MetricsCalculator.calculate_drift_timeline(power, hr, window=300, step=60)
+        self.assertEqual(tl["t"][0], 300)
+        self.assertAlmostEqual(tl["drift_pct"][0], 0.0)
+        self.assertAlmostEqual(tl["drift_pct"][-1], 10.0)
+        self.assertAlmostEqual(tl["cost"][-1], 0.77)
+        # Finestra più corta: più punti
+        short = MetricsCalculator.calculate_drift_timeline(power, hr, window=60, step=60)
+        self.assertGreater(len(short["t"]), len(tl["t"]))
+
+    def test_warmup_and_pauses_dropped(self):
+        # 10 min di warm-up a cost alto, una pausa a 0 W, poi corsa costante
+        power = [150.0] * 600 + [200.0] * 900 + [0.0] * 120 + [200.0] * 900
+        hr = [150.0] * 600 + [140.0] * 900 + [100.0] * 120 + [140.0] * 900
+        raw = MetricsCalculator.calculate_drift_timeline(power, hr)
+        clean = MetricsCalculator.calculate_drift_timeline(power, hr, warmup_sec=600, drop_pauses=True)
+        self.assertEqual(clean["dropped"], 720)
+        self.assertAlmostEqual(clean["decoupling"], 0.0)
+        self.assertTrue(np.allclose(clean["drift_pct"], 0.0))
+        self.assertFalse(np.allclose(raw["drift_pct"], 0.0))
+        # Il tempo resta quello trascorso: la prima finestra pulita finisce dopo il warm-up
+        self.assertEqual(clean["t"][0], 900)
+
+    def test_engine_default_uses_classic_half_split(self):
+        from engine.core import ScoreEngine
+        engine = ScoreEngine()
+        power, hr = [200.0] * 1800, [140.0] * 900 + [150.0] * 1000  # HR più lungo della potenza
+        with mock.patch.object(MetricsCalculator, "calculate_drift_timeline") as timeline:
+            self.assertEqual(engine.calculate_decoupling(power, hr, window=60),
+                             MetricsCalculator.calculate_decoupling(power, hr))
+            timeline.assert_not_called()
+        self.assertAlmostEqual(engine.calculate_decoupling(power, hr, warmup_sec=60),
+                               MetricsCalculator.calculate_drift_timeline(power, hr, warmup_sec=60)["decoupling"])
+
+    def test_short_or_empty_streams(self):
+        tl = MetricsCalculator.calculate_drift_timeline([200] * 100, [140] * 100, window=300)
+        self.assertEqual(len(tl["t"]), 0)
+        self.assertEqual(tl["decoupling"], 0.0)
+        self.assertEqual(MetricsCalculator.calculate_drift_timeline([], [])["samples"], 0)
+
+class TestStreamStats(unittest.TestCase):
+
+    def test_matches_reference(self):
+        rng = np.random.default_rng(7)
+        for _ in range(30):
+            n = int(rng.integers(10, 4000))
+            watts = rng.integers(0, 450, n).tolist()
+            hr = rng.integers(30, 190, n).tolist()
+            stats = MetricsCalculator.calculate_stream_stats(watts, hr, ftp=260)
+
+            rolling = [sum(watts[i:i + 30]) / 30 for i in range(n - 29)] if n >= 30 else [sum(watts) / n]
+            np_ref = (sum(r ** 4 for r in rolling) / len(rolling)) ** 0.25
+            self.assertAlmostEqual(stats["normalized_power"], np_ref, places=6)
+            self.assertAlmostEqual(stats["variability_index"], np_ref / (sum(watts) / n), places=6)
+            self.assertAlmostEqual(stats["intensity_factor"], np_ref / 260, places=6)
+
+            ef = MetricsCalculator.calculate_efficiency_factor(watts, hr)
+            self.assertEqual(round(stats["avg_power_clean"], 1), ef["avg_power_clean"])
+            self.assertEqual(int(stats["avg_hr_clean"]), ef["avg_hr_clean"])
+
+    def test_steady_run_and_extra_streams(self):
+        stats = MetricsCalculator.calculate_stream_stats(
+            [250] * 600, [150] * 600, ftp=250,
+            cadence=[0] * 60 + [90] * 540, grade=[3.0] * 200 + [0.0] * 200 + [-3.0] * 200)
+        self.assertAlmostEqual(stats["normalized_power"], 250.0)
+        self.assertAlmostEqual(stats["variability_index"], 1.0)
+        self.assertAlmostEqual(stats["intensity_factor"], 1.0)
+        self.assertEqual(stats["avg_cadence"], 90.0)
+        self.assertAlmostEqual(stats["avg_grade"], 0.0)
+        self.assertAlmostEqual(stats["uphill_pct"], 100 / 3)
+        self.assertAlmostEqual(stats["downhill_pct"], 100 / 3)
+
+    def test_empty_streams_and_run_metrics(self):
+        stats = MetricsCalculator.calculate_stream_stats([], [])
+        self.assertEqual(stats["samples"], 0)
+        self.assertEqual(stats["normalized_power"], 0.0)
+
+        m = RunMetrics(0, 0, 10000, 3600, 0, 70, 190, 50, MeteoData())
+        self.assertEqual(m.variability_index, 1.0)
+        m.apply_stream_stats(MetricsCalculator.calculate_stream_stats([0] * 60 + [260] * 600, [60] * 60 + [150] * 600, ftp=260))
+        # Summary Strava assente: medie ripulite dagli stream
+        self.assertEqual(m.avg_power, 260.0)
+        self.assertEqual(m.avg_hr, 150.0)
+        self.assertGreater(m.normalized_power, 250.0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+from config import Config
+from controllers.rescore_controller import RescoreController
+from services.local_db import parse_or_filter
+from tests.test_history_summary import make_db, make_row
+from tests.test_local_db import make_local_db
+
+def history_rows():
+    # Più corse nello stesso giorno: il cursore deve spezzare i pari data con l'id
+    rows = [make_row(i, f"2026-01-{1 + i // 3:02d}T07:00:00", 60) for i in range(1, 31)]
+    rows.append(dict(make_row(99, "2026-01-05T07:00:00", 60), athlete_id=2))
+    return rows
+
+class TestKeysetPagination(unittest.TestCase):
+    def expected_order(self, rows):
+        own = [r for r in rows if r["athlete_id"] == 1]
+        return [r["id"] for r in sorted(own, key=lambda r: (r["date"], r["id"]), reverse=True)]
+
+    def check_backend(self, db):
+        pages = list(db.iter_runs(1, "id", page_size=4))
+        self.assertEqual([len(p) for p in pages], [4] * 7 + [2])
+        self.assertEqual([r["id"] for p in pages for r in p], self.expected_order(history_rows()))
+        # Chiavi del cursore aggiunte alla select
+        self.assertEqual(set(pages[0][0]), {"id", "date"})
+
+        with mock.patch.object(Config, "DB_PAGE_SIZE", 7):
+            self.assertEqual(sorted(db.get_run_ids_for_athlete(1)), list(range(1, 31)))
+            self.assertEqual([r["id"] for r in db.get_history_summary(1)], self.expected_order(history_rows()))
+
+        seen, cursor = [], None
+        while True:
+            runs, cursor = db.get_history_page(1, after=cursor, page_size=8)
+            seen += [r["id"] for r in runs]
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected_order(history_rows()))
+
+        audit = db.get_weather_audit(limit=5)
+        more = db.get_weather_audit(limit=5, after=(audit[-1]["start_time"], audit[-1]["id"]))
+        self.assertEqual(len({a["id"] for a in audit + more}), 10)
+
+    def test_supabase_client(self):
+        self.check_backend(make_db(history_rows()))
+
+    def test_sqlite_backend(self):
+        self.check_backend(make_local_db(history_rows()))
+
+    def test_pages_are_lazy(self):
+        db = make_db(history_rows())
+        pages = db.iter_runs(1, page_size=10)
+        self.assertEqual(db.client.calls, [])
+        next(pages)
+        self.assertEqual(len(db.client.calls), 1)
+
+    def test_or_filter_parser(self):
+        self.assertEqual(parse_or_filter('date.lt."2026-01-02T07:00:00+00:00",and(date.eq."2026-01-02T07:00:00+00:00",id.lt.12)'),
+                         [[("date", "lt", "2026-01-02T07:00:00+00:00")],
+                          [("date", "eq", "2026-01-02T07:00:00+00:00"), ("id", "lt", 12)]])
+        with self.assertRaises(ValueError):
+            parse_or_filter("id.like.1")
+
+    def test_rescore_consumes_pages(self):
+        db = make_db([dict(r, score_version="0.0") for r in history_rows()])
+        res = RescoreController(db).run(1, page_size=4)
+        self.assertEqual(res["processed"], 30)
+        self.assertEqual(db.count_stale_runs(1, Config.ENGINE_VERSION), 0)
+        self.assertEqual(db.get_rescore_checkpoint(1)["last_run_id"], 30)
+
+    def test_stale_count_includes_legacy_null_version(self):
+        rows = [dict(r, score_version=None if r["id"] % 2 else Config.ENGINE_VERSION) for r in history_rows()]
+        for db in (make_db(rows), make_local_db(rows)):
+            self.assertEqual(db.count_stale_runs(1, Config.ENGINE_VERSION), 15)
+            self.assertEqual(db.count_stale_runs(1, "0.0"), 30)
+            self.assertTrue(RescoreController(db).needs_rescore(1))
+
+if __name__ == "__main__":
+    unittest.main()
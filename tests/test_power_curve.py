@@ -0,0 +1,112 @@
+import tempfile
+import unittest
+import numpy as np
+from engine.core import ScoreEngine
+from engine.power_curve import (CURVE_DURATIONS, MAX_CURVE_SEC, compute_curves, curve_durations, envelope_of, mean_max,
+                                merge_envelope, value_at)
+from services.curve_store import CurveStore
+from services.stream_archive import StreamArchive
+from tests.test_history_summary import make_db, make_row
+
+def brute_mean_max(x, d):
+    x = np.asarray(x, dtype=float)
+    return max(x[i:i + d].mean() for i in range(len(x) - d + 1))
+
+class TestMeanMax(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            x = rng.integers(0, 600, int(rng.integers(1, 300)))
+            curve = mean_max(x)
+            for i, d in enumerate(CURVE_DURATIONS):
+                if d > len(x):
+                    self.assertTrue(np.all(np.isnan(curve[i:])))
+                    break
+                self.assertAlmostEqual(curve[i], brute_mean_max(x, d))
+
+    def test_monotone_and_key_values(self):
+        x = [300] * 60 + [200] * 1140
+        curve = mean_max(x)
+        self.assertTrue(np.all(np.diff(curve[~np.isnan(curve)]) <= 1e-9))
+        self.assertEqual(value_at(curve, 60), 300.0)
+        self.assertAlmostEqual(value_at(curve, 1200), 205.0)
+        self.assertIsNone(value_at(curve, 3600))
+        self.assertTrue(np.all(np.isnan(mean_max([]))))
+
+    def test_incremental_envelope_equals_batch(self):
+        rng = np.random.default_rng(1)
+        curves = [mean_max(rng.integers(100, 400, int(rng.integers(10, 900)))) for _ in range(8)]
+        env = None
+        for c in curves:
+            env = merge_envelope(env, c)
+        np.testing.assert_array_equal(env, envelope_of(curves))
+
+    def test_ultra_runs_extend_the_grid(self):
+        n = 9 * 3600
+        x = np.full(n, 200.0)
+        x[:3600] = 300.0
+        curve = mean_max(x)
+        grid = curve_durations(n)
+        self.assertEqual(len(curve), len(grid))
+        # Stessi punti della griglia base, poi la progressione fino alla durata della corsa
+        np.testing.assert_array_equal(grid[:len(CURVE_DURATIONS)], CURVE_DURATIONS)
+        self.assertTrue(MAX_CURVE_SEC < grid[-1] <= n)
+        self.assertFalse(np.isnan(curve).any())
+        self.assertAlmostEqual(value_at(curve, 8 * 3600), (3600 * 300 + 7 * 3600 * 200) / (8 * 3600), delta=1.0)
+        self.assertAlmostEqual(curve[-1], brute_mean_max(x[:int(grid[-1]) + 60], int(grid[-1])), delta=1.0)
+
+        # Inviluppo con una corsa breve: prefisso comune, coda dalla sola ultra
+        env = merge_envelope(mean_max([400] * 600), curve)
+        self.assertEqual(len(env), len(grid))
+        self.assertEqual(value_at(env, 300), 400.0)
+        np.testing.assert_array_equal(env[len(CURVE_DURATIONS):], curve[len(CURVE_DURATIONS):])
+
+class TestCurveStore(unittest.TestCase):
+    def test_all_time_and_rolling(self):
+        store = CurveStore(":memory:")
+        old = compute_curves([400] * 600, [180] * 600)
+        new = compute_curves([250] * 1200, [150] * 1200)
+        store.add(1, 10, 1000, old)
+        store.add(1, 11, 5000, new)
+        all_time = store.all_time(1)
+        self.assertEqual(value_at(all_time["watts"], 300), 400.0)
+        self.assertEqual(value_at(all_time["watts"], 1200), 250.0)
+        rolling = store.rolling(1, since_ts=2000)
+        self.assertEqual(value_at(rolling["watts"], 300), 250.0)
+        # Corsa ricalcolata con valori più bassi: l'inviluppo scende
+        store.add(1, 10, 1000, compute_curves([100] * 600, [120] * 600))
+        self.assertEqual(value_at(store.all_time(1)["watts"], 300), 250.0)
+        # Ultra: l'inviluppo copre anche le durate oltre le 6 h
+        store.add(1, 12, 6000, compute_curves([200] * (7 * 3600), [140] * (7 * 3600)))
+        self.assertEqual(value_at(store.all_time(1)["watts"], 7 * 3600), 200.0)
+        self.assertEqual(value_at(store.rolling(1, since_ts=5500)["watts"], 7 * 3600), 200.0)
+        store.drop_athlete(1)
+        self.assertTrue(np.all(np.isnan(store.all_time(1)["hr"])))
+
+    def test_build_curves_from_archive(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = make_db([make_row(1, "2026-01-01T07:00:00", 600), make_row(2, "2026-01-02T07:00:00", 900)])
+            db.stream_archive = StreamArchive(tmp)
+            self.assertEqual(db.build_curves(1), 2)
+            self.assertEqual(db.build_curves(1), 0)
+            curves = db.get_athlete_curves(1, days=100000)
+            self.assertEqual(value_at(curves["all_time"]["watts"], 600), 250.0)
+            self.assertEqual(value_at(db.get_run_curves(2)["hr"], 900), 150.0)
+
+class TestRelevantBest(unittest.TestCase):
+    def test_data_driven_distance_match(self):
+        engine = ScoreEngine()
+        bests = [
+            {"distance_type": "15K", "best_time": 3600},
+            {"distance_type": "5K", "best_time": 1200},
+            {"distance_type": "Half-Marathon", "best_time": 5400},
+            {"distance_type": "custom", "distance_m": 8000, "best_time": 2000},
+        ]
+        self.assertEqual(engine._find_relevant_best(5050, bests)["best_time"], 1200)
+        self.assertEqual(engine._find_relevant_best(15200, bests)["best_time"], 3600)
+        self.assertEqual(engine._find_relevant_best(21300, bests)["best_time"], 5400)
+        self.assertEqual(engine._find_relevant_best(7800, bests)["best_time"], 2000)
+        self.assertIsNone(engine._find_relevant_best(30000, bests))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from controllers.sync_controller import SyncController, STREAM_BUDGET_RESERVE
+from services.rate_limiter import StravaRateLimiter
+from services.strava_api import StravaService
+from tests.fake_strava import FakeStravaServer
+from tests.test_sync_concurrency import FakeSyncDB
+
+class FakeClock:
+    def __init__(self, start=1_700_000_100.0):
+        self.now = start
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, sec):
+        self.slept.append(sec)
+        self.now += sec
+
+class TestStravaRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.rl = StravaRateLimiter(5, 100, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_spends_budget_without_waiting(self):
+        for _ in range(5):
+            self.assertTrue(self.rl.acquire())
+        self.assertEqual(self.clock.slept, [])
+        self.assertEqual(self.rl.remaining(), 0)
+
+    def test_queues_until_quarter_hour_reset(self):
+        for _ in range(5):
+            self.rl.acquire()
+        self.assertTrue(self.rl.acquire())
+        self.assertEqual(len(self.clock.slept), 1)
+        self.assertEqual(self.clock.now % 900, 0)
+        self.assertEqual(self.rl.snapshot()["15min"]["usage"], 1)
+        self.assertEqual(self.rl.snapshot()["queued_requests"], 1)
+
+    def test_daily_exhaustion_respects_timeout(self):
+        self.rl.update_from_headers({"X-RateLimit-Limit": "200,10", "X-RateLimit-Usage": "3,10"})
+        self.assertFalse(self.rl.acquire(timeout=60))
+
+    def test_headers_override_limits_and_usage(self):
+        self.rl.update_from_headers({"X-RateLimit-Limit": "600,30000", "X-RateLimit-Usage": "42,1200"})
+        snap = self.rl.snapshot()
+        self.assertEqual((snap["15min"]["limit"], snap["15min"]["usage"]), (600, 42))
+        self.assertEqual((snap["daily"]["limit"], snap["daily"]["usage"]), (30000, 1200))
+        self.assertEqual(snap["last_headers"]["X-RateLimit-Usage"], "42,1200")
+
+    def test_read_limit_wins_when_tighter(self):
+        self.rl.update_from_headers({
+            "X-RateLimit-Limit": "600,30000", "X-RateLimit-Usage": "10,10",
+            "X-ReadRateLimit-Limit": "300,15000", "X-ReadRateLimit-Usage": "10,10"
+        })
+        self.assertEqual(self.rl.remaining(), 290)
+
+    def test_malformed_headers_are_ignored(self):
+        self.rl.update_from_headers({"X-RateLimit-Limit": "garbage", "X-RateLimit-Usage": "1,2"})
+        self.assertEqual(self.rl.snapshot()["15min"]["limit"], 5)
+
+    def test_mark_exhausted_forces_wait(self):
+        self.rl.mark_exhausted()
+        self.assertEqual(self.rl.remaining(), 0)
+
+class TestStreamBudget(unittest.TestCase):
+    def test_sync_stays_within_server_budget(self):
+        with FakeStravaServer(n_activities=40, rate_limit=(30, 1000)) as srv:
+            auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter())
+            ctrl = SyncController(auth, FakeSyncDB())
+            with srv.patch_weather():
+                count, msg = ctrl.run_sync("tok", 1, {}, [], [])
+
+            self.assertEqual(count, 40)
+            self.assertEqual(srv.throttled, 0)
+            # 1 pagina di attività già spesa quando si calcola il budget
+            self.assertEqual(srv.count("/api/v3/activities/"), 30 - 1 - STREAM_BUDGET_RESERVE)
+
+if __name__ == '__main__':
+    unittest.main()
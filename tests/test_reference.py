@@ -0,0 +1,47 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from engine.reference import ReferenceData, ReferenceRegistry, get_reference_data, WR_PATH
+
+class TestReferenceData(unittest.TestCase):
+    def setUp(self):
+        self.ref = get_reference_data()
+
+    def test_registry_returns_same_snapshot(self):
+        self.assertIs(get_reference_data(), self.ref)
+
+    def test_snapshot_is_immutable(self):
+        with self.assertRaises(TypeError):
+            self.ref.records["5k"]["men_elite"] = 1.0
+
+    def test_closest_key_matches_min_lookup(self):
+        dist_map = {5000: "5k", 10000: "10k", 21097: "hm", 42195: "m"}
+        for d in [0, 4000, 7500, 7499.9, 10000, 15548.5, 15549, 30000, 31646, 50000]:
+            expected = dist_map[min(dist_map.keys(), key=lambda x: abs(x - d))]
+            self.assertEqual(self.ref.closest_key(d), expected, msg=f"distance {d}")
+
+    def test_age_groups_exposed(self):
+        self.assertEqual(self.ref.age_group_time("10k", "M", 47), 1768.0)
+        self.assertEqual(self.ref.age_group_time("10k", "F", 52), 2135.0)
+        self.assertEqual(self.ref.age_group_time("5k", "M", 82), self.ref.age_groups["5k"]["M70"])
+        self.assertIsNone(self.ref.age_group_time("5k", "M", 30))
+
+    def test_reload_on_mtime_change(self):
+        with open(WR_PATH) as f:
+            wr_data = json.load(f)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "bestwr.json"
+            path.write_text(json.dumps(wr_data))
+            registry = ReferenceRegistry(path, check_interval=0.0)
+            first = registry.get()
+            self.assertIs(registry.get(), first)
+
+            wr_data["records"]["5k"]["men_elite"] = 700.0
+            path.write_text(json.dumps(wr_data))
+            os.utime(path, (first.mtime + 10, first.mtime + 10))
+            self.assertEqual(registry.get().wr_time("5k"), 700.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from config import Config
+from controllers.rescore_controller import RescoreController
+
+class FakeDB:
+    """DatabaseService in memoria con i soli metodi usati dal rescore."""
+    def __init__(self, runs, fail_writes=False):
+        self.runs = {r["id"]: dict(r) for r in runs}
+        self.replays = []
+        self.checkpoint = None
+        self.fail_writes = fail_writes
+
+    def get_athlete_profile(self, athlete_id):
+        return {"weight": 70, "ftp": 250, "hr_max": 190, "hr_rest": 50, "age": 35, "sex": "M"}
+
+    def count_stale_runs(self, athlete_id, engine_version):
+        return sum(1 for r in self.runs.values() if r["score_version"] != engine_version)
+
+    def iter_rescore_pages(self, athlete_id, after_id=None, page_size=200):
+        while True:
+            ids = sorted(i for i in self.runs if after_id is None or i > after_id)[:page_size]
+            if not ids:
+                return
+            yield [dict(self.runs[i]) for i in ids]
+            after_id = ids[-1]
+
+    def save_rescored_runs(self, rows):
+        if self.fail_writes: return False
+        for r in rows:
+            self.runs[r["id"]].update(r)
+        return True
+
+    def save_replays(self, replays):
+        self.replays.extend(replays)
+        return True
+
+    def get_rescore_checkpoint(self, athlete_id):
+        return self.checkpoint
+
+    def save_rescore_checkpoint(self, checkpoint):
+        self.checkpoint = dict(checkpoint)
+        return True
+
+def _run(run_id, version="0.0"):
+    return {
+        "id": run_id, "athlete_id": 1, "date": "2024-05-01", "distance_km": 10.0, "duration_sec": 3000,
+        "avg_power": 250, "avg_hr": 150, "decoupling": 3.0, "score": 10.0, "wcf": 1.0,
+        "rank": "ROOKIE", "quality": "Weak", "meteo_desc": "18°C", "score_version": version,
+        "raw_data": {"watts": [250] * 600, "hr": [150] * 600, "details": {},
+                     "inputs": {"moving_time": 3000, "distance_m": 10000, "temp": 18, "humidity": 55, "decoupling": 0.0}}
+    }
+
+class TestRescoreController(unittest.TestCase):
+    def test_rescore_updates_stale_runs_and_audits(self):
+        db = FakeDB([_run(i) for i in range(1, 6)])
+        res = RescoreController(db).run(1, page_size=2)
+
+        self.assertEqual(res, {"processed": 5, "updated": 5, "resumed": False})
+        self.assertTrue(all(r["score_version"] == Config.ENGINE_VERSION for r in db.runs.values()))
+        self.assertEqual(len(db.replays), 5)
+        self.assertEqual(db.replays[0]["details"]["previous_score"], 10.0)
+        self.assertEqual(db.checkpoint["status"], "done")
+        self.assertEqual(db.count_stale_runs(1, Config.ENGINE_VERSION), 0)
+
+    def test_second_pass_writes_nothing(self):
+        db = FakeDB([_run(i) for i in range(1, 4)])
+        RescoreController(db).run(1)
+        res = RescoreController(db).run(1)
+        self.assertEqual(res["updated"], 0)
+        self.assertEqual(len(db.replays), 3)
+
+    def test_zero_duration_run_is_not_stale_again(self):
+        empty = dict(_run(2), duration_sec=0, raw_data={"watts": [], "hr": [], "inputs": {"moving_time": 0}})
+        db = FakeDB([_run(1), empty])
+        RescoreController(db).run(1)
+        # Score invariato, ma versione aggiornata: il secondo run non trova nulla da ricalcolare
+        self.assertEqual((db.runs[2]["score"], db.runs[2]["score_version"]), (10.0, Config.ENGINE_VERSION))
+        self.assertEqual(db.count_stale_runs(1, Config.ENGINE_VERSION), 0)
+        self.assertFalse(RescoreController(db).needs_rescore(1))
+        self.assertEqual(RescoreController(db).run(1)["updated"], 0)
+        self.assertEqual(len(db.replays), 1)
+
+    def test_resume_from_checkpoint(self):
+        db = FakeDB([_run(i) for i in range(1, 5)])
+        db.checkpoint = {"athlete_id": 1, "target_version": Config.ENGINE_VERSION, "status": "running",
+                         "last_run_id": 2, "processed": 2, "updated": 2}
+        res = RescoreController(db).run(1)
+
+        self.assertTrue(res["resumed"])
+        self.assertEqual(res["processed"], 4)
+        self.assertEqual(db.runs[1]["score_version"], "0.0")
+        self.assertEqual(db.runs[4]["score_version"], Config.ENGINE_VERSION)
+
+    def test_failed_write_keeps_checkpoint(self):
+        db = FakeDB([_run(1)], fail_writes=True)
+        res = RescoreController(db).run(1)
+        self.assertIn("error", res)
+        self.assertIsNone(db.checkpoint)
+        self.assertEqual(db.replays, [])
+
+if __name__ == '__main__':
+    unittest.main()
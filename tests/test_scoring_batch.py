@@ -0,0 +1,98 @@
+import unittest
+import numpy as np
+import pandas as pd
+from engine.scoring import ScoringSystem
+from engine.metrics import RunMetrics, MeteoData
+
+LEVELS = ["elite", "sub_elite", "advanced", "intermediate", "amateur", "unknown"]
+
+def _random_runs(n, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "power": rng.uniform(50, 450, n).round(1),
+        "hr": rng.integers(90, 195, n),
+        "distance": rng.uniform(1000, 50000, n),
+        "moving_time": rng.integers(300, 20000, n),
+        "weight": rng.uniform(45, 100, n),
+        "hr_max": rng.integers(160, 205, n),
+        "hr_rest": rng.integers(35, 75, n),
+        "temp": rng.uniform(-10, 40, n).round(1),
+        "humidity": rng.uniform(10, 100, n).round(0),
+        "decoupling": rng.uniform(0, 0.3, n),
+        "age": rng.integers(16, 85, n),
+        "sex": rng.choice(["M", "F", "m", "f"], n),
+        "level": rng.choice(LEVELS, n),
+        "nominal_power": rng.uniform(2.0, 5.0, n),
+        "target_hr_eff": rng.uniform(0.6, 1.2, n)
+    })
+
+def _scalar(scoring, row):
+    m = RunMetrics(row.power, row.hr, row.distance, row.moving_time, 0, row.weight,
+                   row.hr_max, row.hr_rest, MeteoData(row.temp, row.humidity), row.age, row.sex)
+    m.decoupling = row.decoupling
+    return scoring.compute_score_v6_darkritual(m, row.nominal_power, row.target_hr_eff, row.level)
+
+class TestBatchScoringParity(unittest.TestCase):
+    def setUp(self):
+        self.scoring = ScoringSystem()
+
+    def assertParity(self, df):
+        batch = self.scoring.compute_scores_batch(df)
+        self.assertEqual(len(batch), len(df))
+        for (_, row), (_, b) in zip(df.iterrows(), batch.iterrows()):
+            score, details = _scalar(self.scoring, row)
+            # Bit a bit, non "quasi uguale"
+            self.assertEqual(np.float64(score).tobytes(), np.float64(b["score"]).tobytes(), msg=f"row {row.to_dict()}")
+            self.assertEqual(details["closest_wr_dist"], b["closest_wr_dist"])
+            self.assertEqual(details["raw_score"], round(b["raw_score"], 3))
+            for key in ("W_eff", "HRR_eff", "WCF", "P_eff", "F_age", "F_env", "stability_penalty"):
+                np.testing.assert_equal(details[key], round(b[key], 3), err_msg=key)
+            self.assertEqual(details["T_ref"], round(b["T_ref"], 1))
+            self.assertEqual(details["F_sex"], b["F_sex"])
+            self.assertEqual(details["F_level"], b["F_level"])
+            self.assertEqual(details["nominal_pwr"], b["nominal_pwr"])
+
+    def test_random_runs_bit_identical(self):
+        self.assertParity(_random_runs(500))
+
+    def test_edge_cases(self):
+        df = _random_runs(9, seed=7)
+        df.loc[0, "distance"] = 7500          # tie 5k/10k -> 5k
+        df.loc[1, "distance"] = 99000         # oltre la maratona
+        df.loc[2, ["hr_max", "hr_rest"]] = [50, 60]   # hr_reserve <= 0
+        df.loc[3, "nominal_power"] = 0.0
+        df.loc[4, "target_hr_eff"] = -1.0
+        df.loc[5, "hr"] = 30                  # sotto il riposo -> HRR_eff clamp
+        df.loc[6, "decoupling"] = -0.5        # sqrt(D/T) non valida -> score 0
+        df.loc[7, "decoupling"] = 0.0
+        df.loc[8, "moving_time"] = 0          # nessuna durata -> score 0, niente ZeroDivisionError
+        self.assertParity(df)
+        batch = self.scoring.compute_scores_batch(df)
+        for i in (6, 8):
+            self.assertEqual(batch.loc[i, "score"], 0.0)
+            self.assertFalse(batch.loc[i, "valid"])
+
+    def test_defaults_match_scalar_defaults(self):
+        df = pd.DataFrame({"power": [250.0], "hr": [150], "distance": [10000.0], "moving_time": [2700]})
+        batch = self.scoring.compute_scores_batch(df, nominal_power=3.5, target_hr_eff=1.0)
+        m = RunMetrics(250.0, 150, 10000.0, 2700, 0, 70.0, 185, 50, MeteoData(), 30, "M")
+        score, _ = self.scoring.compute_score_v6_darkritual(m, 3.5, 1.0, "intermediate")
+        self.assertEqual(batch.loc[0, "score"], score)
+
+    def test_metrics_frame_roundtrip(self):
+        metrics = []
+        for i in range(20):
+            m = RunMetrics(200 + i, 140 + i, 5000 + 1000 * i, 1500 + 120 * i, 0, 68, 190, 48,
+                           MeteoData(10 + i, 40 + i), 25 + i, "F" if i % 2 else "M")
+            m.decoupling = 0.01 * i
+            metrics.append(m)
+        batch = self.scoring.compute_scores_batch(self.scoring.metrics_frame(metrics), nominal_power=3.0)
+        for m, b in zip(metrics, batch["score"]):
+            self.assertEqual(self.scoring.compute_score_v6_darkritual(m, 3.0, 1.0)[0], b)
+
+    def test_missing_required_column(self):
+        with self.assertRaises(ValueError):
+            self.scoring.compute_scores_batch(pd.DataFrame({"power": [200]}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from config import Config
+from engine.metrics import MetricsCalculator
+from services.stream_archive import StreamArchive
+from tests.test_history_summary import make_db, make_row
+
+class TestStreamArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.archive = StreamArchive(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_and_zero_copy_views(self):
+        self.archive.append(1, 10, 2000, {"watts": [200, 210, 220], "hr": [140, 141, 142]})
+        self.archive.append(1, 11, 1000, {"watts": [300, 310], "hr": [150, 151, 152]})
+        v = self.archive.view(1, 11)
+        np.testing.assert_array_equal(v["watts"], [300, 310])
+        np.testing.assert_array_equal(v["hr"], [150, 151])
+        # Vista sul file mappato, non una copia
+        self.assertIsInstance(v["watts"].base, np.memmap)
+        self.assertIsNone(self.archive.view(1, 99))
+        self.assertEqual([r for r, _, _ in self.archive.iter_views(1)], [11, 10])
+        self.assertEqual([r for r, _, _ in self.archive.iter_views(1, start_ts=1500)], [10])
+
+    def test_reopen_and_interrupted_append(self):
+        self.archive.append(1, 10, 0, {"watts": [200] * 5, "hr": [140] * 5})
+        # Coda orfana (append interrotto prima dell'indice)
+        with open(self.archive._path(1, "watts"), "ab") as f:
+            np.zeros(7, dtype="<i2").tofile(f)
+        self.archive.append(1, 11, 1, {"watts": [250] * 4, "hr": [150] * 4})
+
+        reopened = StreamArchive(self.tmp.name)
+        np.testing.assert_array_equal(reopened.view(1, 11)["watts"], [250] * 4)
+        self.assertEqual(reopened.stats(1), {"runs": 2, "samples": 9, "bytes": 27})
+
+    def test_metrics_on_views(self):
+        watts = [250] * 600 + [240] * 600
+        hr = [140] * 600 + [150] * 600
+        self.archive.append(1, 10, 0, {"watts": watts, "hr": hr})
+        v = self.archive.view(1, 10)
+        self.assertAlmostEqual(MetricsCalculator.calculate_decoupling(v["watts"], v["hr"]),
+                               MetricsCalculator.calculate_decoupling(watts, hr))
+        self.assertEqual(MetricsCalculator.calculate_efficiency_factor(v["watts"], v["hr"]),
+                         MetricsCalculator.calculate_efficiency_factor(watts, hr))
+
+    def test_sync_from_database_and_drop(self):
+        db = make_db([make_row(1, "2026-01-01T07:00:00", 300), make_row(2, "2026-01-02T07:00:00", 400)])
+        db.stream_archive = self.archive
+        db.sync_stream_archive(1)
+        db.sync_stream_archive(1)  # idempotente
+        self.assertEqual(self.archive.stats(1)["samples"], 700)
+        self.assertEqual(len(self.archive.view(1, 2)["hr"]), 400)
+        db.reset_history(1)
+        self.assertEqual(self.archive.stats(1)["runs"], 0)
+
+    def test_sync_reads_past_the_row_cap(self):
+        db = make_db([make_row(i, f"2026-01-{i:02d}T07:00:00", 60) for i in range(1, 8)])
+        db.stream_archive = self.archive
+        db.client.max_rows = 3
+        with mock.patch.object(Config, "DB_PAGE_SIZE", 3):
+            db.sync_stream_archive(1)
+        self.assertEqual([run_id for run_id, _, _ in self.archive.iter_views(1)], list(range(1, 8)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import numpy as np
+from services.stream_store import CHANNELS, StreamStore, decode_channel, encode_channel, pack_streams, unpack_streams
+from tests.test_bulk_runs import run_obj
+from tests.test_history_summary import make_db, make_row
+
+class TestStreamEncoding(unittest.TestCase):
+    def test_roundtrip_exact_for_integer_streams(self):
+        rng = np.random.default_rng(0)
+        watts = rng.integers(0, 1200, 3600).tolist()
+        hr = rng.integers(60, 200, 3600).tolist()
+        w = decode_channel(encode_channel(watts, CHANNELS["watts"]), CHANNELS["watts"])
+        h = decode_channel(encode_channel(hr, CHANNELS["hr"]), CHANNELS["hr"])
+        self.assertEqual(w.dtype, np.int16)
+        self.assertEqual(h.dtype, np.uint8)
+        np.testing.assert_array_equal(w, watts)
+        np.testing.assert_array_equal(h, hr)
+
+    def test_large_jumps_wrap_and_missing_values(self):
+        # Salti oltre il range delle differenze (modulari) e valori None/fuori range
+        watts = [0, 32767, -32768, None, 40000, 250.6]
+        out = decode_channel(encode_channel(watts, CHANNELS["watts"]), CHANNELS["watts"])
+        np.testing.assert_array_equal(out, [0, 32767, -32768, 0, 32767, 251])
+        hr = [255, 0, 300, -5]
+        out = decode_channel(encode_channel(hr, CHANNELS["hr"]), CHANNELS["hr"])
+        np.testing.assert_array_equal(out, [255, 0, 255, 0])
+
+    def test_pack_roundtrip_is_json(self):
+        import json
+        doc = json.loads(json.dumps(pack_streams({"watts": [200, 210, 220], "hr": []})))
+        self.assertEqual(set(doc), {"watts"})
+        out = unpack_streams(doc)
+        np.testing.assert_array_equal(out["watts"], [200, 210, 220])
+        self.assertEqual(len(out["hr"]), 0)
+
+class TestStreamStore(unittest.TestCase):
+    def setUp(self):
+        self.store = StreamStore(":memory:")
+
+    def test_put_get_delete(self):
+        self.store.put(1, {"watts": [200, 210, 220], "hr": [140, 141, 142]})
+        self.store.put(2, {"watts": [100], "hr": []})
+        got = self.store.get_many([1, 2, 3])
+        self.assertEqual(set(got), {1, 2})
+        np.testing.assert_array_equal(got[1]["hr"], [140, 141, 142])
+        self.assertEqual(len(got[2]["hr"]), 0)
+        self.assertIsNone(self.store.get(3))
+        self.store.delete([1])
+        self.assertIsNone(self.store.get(1))
+        self.assertEqual(self.store.stats()["runs"], 1)
+
+    def test_smaller_than_json(self):
+        import json
+        rng = np.random.default_rng(1)
+        watts = (250 + rng.normal(0, 20, 3600)).round().astype(int).tolist()
+        hr = (150 + np.cumsum(rng.integers(-1, 2, 3600)) // 10).astype(int).tolist()
+        self.store.put(1, {"watts": watts, "hr": hr})
+        self.assertLess(self.store.stats()["bytes"] * 3, len(json.dumps({"watts": watts, "hr": hr})))
+
+class TestDatabaseStreams(unittest.TestCase):
+    def test_migrate_and_read_streams(self):
+        db = make_db([make_row(1, "2026-01-01T07:00:00", 600), make_row(2, "2026-01-02T07:00:00", 600)])
+        stats = db.migrate_streams(1, page_size=1, strip=True)
+        self.assertEqual(stats, {"scanned": 2, "migrated": 2, "stripped": 2})
+        raw = db.client.tables["runs"][0]["raw_data"]
+        self.assertNotIn("watts", raw)
+        self.assertIn("details", raw)
+        # Copia compressa su Supabase: la cache locale si può perdere
+        self.assertEqual(len(unpack_streams(db.client.tables["runs"][0]["streams"])["hr"]), 600)
+        db.stream_store = StreamStore(":memory:")
+
+        streams = db.get_run_streams(1)
+        self.assertIsInstance(streams["watts"], np.ndarray)
+        self.assertEqual(len(streams["watts"]), 600)
+        self.assertEqual(len(db.get_history(1)[0]["raw_hr"]), 600)
+
+    def test_legacy_row_migrated_lazily(self):
+        db = make_db([make_row(1, "2026-01-01T07:00:00", 300)])
+        self.assertIsNone(db.stream_store.get(1))
+        self.assertEqual(len(db.get_run_streams(1)["watts"]), 300)
+        self.assertIsNotNone(db.stream_store.get(1))
+
+    def test_new_runs_survive_lost_local_cache(self):
+        db = make_db([])
+        db.save_runs_bulk([run_obj(1), run_obj(2)], 1)
+        self.assertNotIn("watts", db.client.tables["runs"][0]["raw_data"])
+        # Redeploy: .cache/streams.sqlite vuota
+        db.stream_store = StreamStore(":memory:")
+        self.assertEqual(len(db.get_run_streams(1)["watts"]), 600)
+        self.assertEqual([len(r["raw_hr"]) for r in db.get_history(1)], [600, 600])
+        rows = [r for page in db.iter_rescore_pages(1) for r in page]
+        self.assertEqual([len(r["streams"]["watts"]) for r in rows], [600, 600])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+from controllers.sync_controller import SyncController
+from services.rate_limiter import StravaRateLimiter
+from services.strava_api import StravaService
+from tests.fake_strava import FakeStravaServer
+
+class FakeSyncDB:
+    """DatabaseService in memoria con i metodi usati da run_sync."""
+    def __init__(self):
+        self.saved = []
+        self.baselines = {}
+        self.cursor = {}
+        self.load_rows = []
+        self.baseline_reads = 0
+        self.bulk_calls = 0
+        self.baseline_writes = 0
+        self.reject = set()
+
+    def get_sync_cursor(self, athlete_id):
+        return dict(self.cursor)
+
+    def save_sync_cursor(self, athlete_id, cursor):
+        self.cursor = dict(cursor)
+        return True
+
+    def get_athlete_profile(self, athlete_id):
+        return {"weight": 70, "ftp": 250, "hr_max": 190, "hr_rest": 50, "age": 35, "sex": "M"}
+
+    def get_athlete_baselines(self, athlete_id):
+        self.baseline_reads += 1
+        return dict(self.baselines)
+
+    def save_athlete_baselines(self, athlete_id, baselines):
+        self.baseline_writes += 1
+        self.baselines.update(baselines)
+        return True
+
+    def save_runs_bulk(self, runs, athlete_id, chunk_size=None):
+        self.bulk_calls += 1
+        ok = [r for r in runs if r["id"] not in self.reject]
+        self.saved.extend(ok)
+        return {"saved": [r["id"] for r in ok], "failed": {r["id"]: "rejected" for r in runs if r["id"] in self.reject}}
+
+    def get_run_ids_for_athlete(self, athlete_id):
+        return [r["id"] for r in self.saved]
+
+    def update_streak(self, athlete_id):
+        pass
+
+    def get_history_summary(self, athlete_id):
+        return []
+
+    def get_last_load_state(self, athlete_id, before_day=None):
+        rows = [r for r in self.load_rows if before_day is None or r["day"] < before_day]
+        return rows[-1] if rows else None
+
+    def save_load_rows(self, athlete_id, rows):
+        self.load_rows = sorted({r["day"]: r for r in self.load_rows + rows}.values(), key=lambda r: r["day"])
+        return True
+
+class TestConcurrentSync(unittest.TestCase):
+    def _sync(self, srv, workers):
+        auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000))
+        ctrl = SyncController(auth, FakeSyncDB())
+        self.last_db = ctrl.db
+        ctrl.workers = workers
+        with srv.patch_weather():
+            count, _ = ctrl.run_sync("tok", 1, {}, [], [])
+        return count, ctrl.db.saved
+
+    def test_runs_saved_oldest_first(self):
+        with FakeStravaServer(n_activities=12, latency=0.01) as srv:
+            count, saved = self._sync(srv, workers=4)
+
+        self.assertEqual(count, 12)
+        dates = [r["Data"] for r in saved]
+        self.assertEqual(dates, sorted(dates))
+        self.assertTrue(all(r["raw_watts"] and r["is_weather_real"] for r in saved))
+        self.assertTrue(all(r["Load"]["trimp"] > 0 and r["Load"]["tss"] > 0 for r in saved))
+        inputs = saved[0]["SCORE_INPUTS"]
+        self.assertGreater(inputs["normalized_power"], 0)
+        self.assertGreater(inputs["avg_cadence"], 0)
+
+    def test_training_load_updated_after_sync(self):
+        with FakeStravaServer(n_activities=6) as srv:
+            _, saved = self._sync(srv, workers=2)
+        rows = self.last_db.load_rows
+        self.assertEqual([r["day"] for r in rows], sorted({r["Data"] for r in saved}))
+        self.assertGreater(rows[-1]["ctl"], 0)
+
+    def test_baselines_read_once_and_flushed_once(self):
+        with FakeStravaServer(n_activities=10) as srv:
+            _, saved = self._sync(srv, workers=2)
+        db = self.last_db
+        self.assertEqual((db.baseline_reads, db.baseline_writes), (1, 1))
+        # Baseline finale = miglior T_adj (minimo) tra le corse della sync
+        targets = [r["SCORE_DETAIL"]["Target T_adj"] for r in saved]
+        self.assertEqual(min(targets), round(min(db.baselines.values()), 1))
+
+        # Baseline già migliori: nessuna scrittura
+        with FakeStravaServer(n_activities=4) as srv:
+            auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000))
+            ctrl = SyncController(auth, FakeSyncDB())
+            ctrl.db.baselines = {"5k": 1.0, "10k": 1.0, "hm": 1.0, "m": 1.0}
+            with srv.patch_weather():
+                ctrl.run_sync("tok", 1, {}, [], [])
+        self.assertEqual(ctrl.db.baseline_writes, 0)
+        self.assertEqual(ctrl.db.baselines["10k"], 1.0)
+
+    def test_baselines_only_from_saved_runs(self):
+        with FakeStravaServer(n_activities=4) as srv:
+            auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000))
+            ctrl = SyncController(auth, FakeSyncDB())
+            ctrl.db.reject = {a["id"] for a in srv.activities}
+            with srv.patch_weather():
+                count, _ = ctrl.run_sync("tok", 1, {}, [], [])
+        self.assertEqual((count, ctrl.db.baseline_writes, ctrl.db.baselines), (0, 0, {}))
+
+    def test_interrupted_sync_flushes_completed_runs(self):
+        class Progress:
+            def progress(self, value):
+                if value > 0.5:
+                    raise RuntimeError("stop")
+        with FakeStravaServer(n_activities=6) as srv:
+            auth = StravaService("id", "secret", base_url=srv.strava_url, limiter=StravaRateLimiter(10_000, 100_000))
+            ctrl = SyncController(auth, FakeSyncDB())
+            with srv.patch_weather(), self.assertLogs("sCore.Sync", "ERROR") as logs, self.assertRaises(RuntimeError):
+                ctrl.run_sync("tok", 1, {}, [], [], progress_bar=Progress())
+        self.assertEqual(len(ctrl.db.saved), 3)
+        self.assertIn("3/6", logs.output[0])
+        targets = [r["SCORE_DETAIL"]["Target T_adj"] for r in ctrl.db.saved]
+        self.assertEqual(min(targets), round(min(ctrl.db.baselines.values()), 1))
+
+    def test_fetch_runs_in_parallel(self):
+        with FakeStravaServer(n_activities=12, latency=0.05) as srv:
+            self._sync(srv, workers=4)
+            self.assertGreater(srv.max_in_flight, 1)
+            self.assertEqual(srv.count("/api/v3/activities/"), 12)
+            # Meteo: una sola richiesta a intervallo per la cella comune
+            self.assertEqual(srv.count("/v1/archive"), 1)
+
+    def test_parallel_matches_serial(self):
+        with FakeStravaServer(n_activities=8) as srv:
+            _, serial = self._sync(srv, workers=1)
+            _, parallel = self._sync(srv, workers=4)
+        self.assertEqual([(r["id"], r["SCORE"], r["Trend"]) for r in serial],
+                         [(r["id"], r["SCORE"], r["Trend"]) for r in parallel])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import math
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+from config import Config
+from controllers.training_load_controller import TrainingLoadController
+from engine import training_load as tl
+from tests.test_history_summary import make_db, make_row
+
+def reference_series(daily, start, end):
+    """EWMA giorno per giorno (anche nei giorni di riposo), come il PMC classico."""
+    atl = ctl = 0.0
+    out = {}
+    d = start
+    while d <= end:
+        load = daily.get(d.isoformat(), 0.0)
+        tsb = ctl - atl
+        atl += tl.K_ATL * (load - atl)
+        ctl += tl.K_CTL * (load - ctl)
+        out[d.isoformat()] = (atl, ctl, tsb)
+        d += timedelta(days=1)
+    return out
+
+def load_state(db):
+    return {r["day"]: (round(r["atl"], 9), round(r["ctl"], 9), round(r["tsb"], 9), r["load"])
+            for r in db.get_load_rows(1)}
+
+class TestLoadMetrics(unittest.TestCase):
+    def test_trimp_banister(self):
+        # 1 h costante al 50% della riserva cardiaca
+        hr = [120] * 3600
+        expected = 60 * 0.5 * 0.64 * math.exp(1.92 * 0.5)
+        self.assertAlmostEqual(tl.trimp(hr, 190, 50), expected, places=6)
+        self.assertAlmostEqual(tl.trimp_from_avg(120, 3600, 190, 50), expected, places=6)
+        self.assertGreater(tl.trimp(hr, 190, 50, "F"), expected)
+        # Campioni a 0 (sensore staccato) esclusi
+        self.assertAlmostEqual(tl.trimp(hr + [0] * 600, 190, 50), expected, places=6)
+
+    def test_tss_one_hour_at_ftp_is_100(self):
+        self.assertAlmostEqual(tl.tss([250] * 3600, 250), 100.0, places=6)
+        self.assertAlmostEqual(tl.normalized_power([200, 300] * 1800), 250.0, delta=1.0)
+        self.assertEqual(tl.tss([], 250), 0.0)
+
+    def test_run_load_fallback_without_streams(self):
+        load = tl.run_load([], [], 190, 50, 250, avg_hr=150, duration_sec=1800)
+        self.assertGreater(load["trimp"], 0)
+        self.assertEqual(load["tss"], 0.0)
+
+class TestLoadModel(unittest.TestCase):
+    def setUp(self):
+        self.start = date(2026, 1, 1)
+        # Carichi irregolari con giorni di riposo e due corse nello stesso giorno
+        self.runs = [(0, 80.0), (1, 60.0), (1, 20.0), (4, 120.0), (5, 40.0), (12, 90.0), (30, 150.0)]
+
+    def test_advance_matches_daily_recursion(self):
+        state, rows = None, []
+        for offset, load in self.runs:
+            state = tl.advance(state, self.start + timedelta(days=offset), load, 0.0, load)
+            rows.append(state)
+        daily = {}
+        for offset, load in self.runs:
+            key = (self.start + timedelta(days=offset)).isoformat()
+            daily[key] = daily.get(key, 0.0) + load
+        end = self.start + timedelta(days=40)
+        ref = reference_series(daily, self.start, end)
+        # Più corse nello stesso giorno: conta l'ultimo stato del giorno
+        series = tl.expand_series(list({r["day"]: r for r in rows}.values()), end)
+        self.assertEqual(len(series), 41)
+        for row in series:
+            for got, exp in zip((row["atl"], row["ctl"], row["tsb"]), ref[row["day"]]):
+                self.assertAlmostEqual(got, exp, places=9)
+
+    def test_out_of_order_rejected(self):
+        state = tl.advance(None, "2026-01-05", 1.0, 0.0, 1.0)
+        with self.assertRaises(ValueError):
+            tl.advance(state, "2026-01-04", 1.0, 0.0, 1.0)
+
+class TestTrainingLoadController(unittest.TestCase):
+    def setUp(self):
+        self.db = make_db([])
+        self.db.client.tables["athletes"] = [{"id": 1, "hr_max": 190, "hr_rest": 50, "ftp": 250, "sex": "M"}]
+        self.ctrl = TrainingLoadController(self.db, metric="trimp")
+
+    def _runs(self, days):
+        return [{"date": f"2026-01-{d:02d}", "trimp": 50.0 + d, "tss": 40.0} for d in days]
+
+    def test_incremental_equals_batch(self):
+        for d in (1, 3, 3, 8, 9):
+            self.ctrl.apply(1, self._runs([d]))
+        incremental = load_state(self.db)
+
+        other = TrainingLoadController(make_db([]), metric="trimp")
+        other.apply(1, self._runs([1, 3, 3, 8, 9]))
+        self.assertEqual(incremental, load_state(other.db))
+        self.assertEqual(incremental["2026-01-03"][3], 106.0)
+
+    def test_new_run_writes_only_its_day(self):
+        self.ctrl.apply(1, self._runs([1, 2, 3]))
+        self.assertEqual(self.ctrl.apply(1, self._runs([10])), 1)
+
+    def test_backfill_replays_following_days(self):
+        self.ctrl.apply(1, self._runs([5, 9]))
+        self.ctrl.apply(1, self._runs([2, 7]))
+        expected = TrainingLoadController(make_db([]), metric="trimp")
+        expected.apply(1, self._runs([2, 5, 7, 9]))
+        self.assertEqual(load_state(self.db), load_state(expected.db))
+
+    def test_rebuild_from_streams_and_series(self):
+        rows = [make_row(1, "2026-01-01T07:00:00", 1800), make_row(2, "2026-01-04T07:00:00", 3600)]
+        rows[1]["raw_data"]["load"] = {"trimp": 99.0, "tss": 70.0}
+        db = make_db(rows)
+        ctrl = TrainingLoadController(db, metric="trimp")
+        self.assertEqual(ctrl.rebuild(1), 2)
+        loads = {r["day"]: r["load"] for r in db.get_load_rows(1)}
+        self.assertAlmostEqual(loads["2026-01-01"], tl.trimp([150] * 1800, 185, 50), places=2)
+        self.assertEqual(loads["2026-01-04"], 99.0)
+
+        series = ctrl.series(1, days=10, until=date(2026, 1, 10))
+        self.assertEqual([r["day"] for r in series][:2], ["2026-01-01", "2026-01-02"])
+        self.assertEqual(len(series), 10)
+        self.assertLess(series[-1]["atl"], series[3]["atl"])
+
+    def test_first_apply_with_history_rebuilds(self):
+        rows = [make_row(i, f"2026-01-0{i}T07:00:00", 1800) for i in (1, 2, 3)]
+        rows[2]["raw_data"]["load"] = {"trimp": 99.0, "tss": 70.0}
+        db = make_db(rows)
+        db.client.tables["athletes"] = self.db.client.tables["athletes"]
+        # Corsa 3 appena salvata dalla sync, nessuna riga training_load: conta anche lo storico
+        self.assertEqual(TrainingLoadController(db, metric="trimp").apply(1, [{"date": "2026-01-03", "trimp": 99.0, "tss": 70.0}]), 3)
+
+        expected = make_db([dict(r) for r in rows])
+        expected.client.tables["athletes"] = self.db.client.tables["athletes"]
+        TrainingLoadController(expected, metric="trimp").rebuild(1)
+        self.assertEqual(load_state(db), load_state(expected))
+
+    def test_reads_past_the_row_cap(self):
+        rows = [make_row(i, f"2026-01-{i:02d}T07:00:00", 600) for i in range(1, 11)]
+        with mock.patch.object(Config, "DB_PAGE_SIZE", 3):
+            db = make_db(rows)
+            db.client.max_rows = 3
+            self.assertEqual([r["id"] for r in db.get_run_loads(1)], list(range(1, 11)))
+            ctrl = TrainingLoadController(db, metric="trimp")
+            self.assertEqual(ctrl.rebuild(1), 10)
+            self.assertEqual(len(db.get_load_rows(1)), 10)
+            self.assertEqual([r["day"] for r in db.get_load_rows(1, since_day="2026-01-05")][0], "2026-01-05")
+
+if __name__ == "__main__":
+    unittest.main()
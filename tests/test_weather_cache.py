@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from services.meteo_svc import WeatherService
+from services.weather_cache import DayWeather, MISS, WeatherCache
+from tests.fake_strava import FakeStravaServer
+
+class TestWeatherCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = WeatherCache(":memory:")
+
+    def test_cell_rounding(self):
+        self.assertEqual(self.cache.cell(45.4642, 9.1900), (45.5, 9.2))
+        self.assertEqual(self.cache.cell(45.4642, 9.1900), self.cache.cell(45.51, 9.24))
+        self.assertEqual(self.cache.cell(-33.87, 151.21), (-33.9, 151.2))
+
+    def test_roundtrip_all_hours(self):
+        cell = self.cache.cell(45.46, 9.19)
+        self.cache.put(cell, "2024-01-01", DayWeather([float(h) for h in range(24)], [50] * 24, "archive"))
+        day = self.cache.get(cell, "2024-01-01")
+        self.assertEqual(day.at(7), (7.0, 50.0))
+        self.assertEqual(day.at(30), (23.0, 50.0))
+        self.assertIsNone(self.cache.get(cell, "2024-01-02"))
+
+    def test_miss_expires(self):
+        cell = (45.5, 9.2)
+        self.cache.put_miss(cell, "2024-01-01")
+        self.assertIs(self.cache.get(cell, "2024-01-01"), MISS)
+        with mock.patch("services.weather_cache.time.time", return_value=10**12):
+            self.assertIsNone(self.cache.get(cell, "2024-01-01"))
+
+    def test_only_complete_archive_days_never_expire(self):
+        cell = (45.5, 9.2)
+        self.cache.put(cell, "2024-01-01", DayWeather([10.0] * 24, [80] * 24, "archive"))
+        self.cache.put_many(cell, {"2024-01-02": DayWeather([10.0] * 12 + [None] * 12, [80] * 24, "archive")})
+        with mock.patch("services.weather_cache.time.time", return_value=10**12):
+            self.assertIsNotNone(self.cache.get(cell, "2024-01-01"))
+            self.assertIsNone(self.cache.get(cell, "2024-01-02"))
+
+    def test_persists_on_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "weather.sqlite")
+            WeatherCache(path).put((1.0, 2.0), "2024-01-01", DayWeather([10.0] * 24, [80] * 24, "archive"))
+            self.assertEqual(WeatherCache(path).get((1.0, 2.0), "2024-01-01").at(0), (10.0, 80.0))
+
+class TestWeatherServiceCaching(unittest.TestCase):
+    def test_same_cell_and_day_costs_one_request(self):
+        with FakeStravaServer() as srv, srv.patch_weather():
+            first = WeatherService.get_weather(45.46, 9.19, "2024-01-01", 8)
+            second = WeatherService.get_weather(45.47, 9.21, "2024-01-01", 18)
+            self.assertEqual(srv.count("/v1/archive"), 1)
+        self.assertEqual(first, (16.0, 62.0, True))
+        self.assertEqual(second, (21.0, 52.0, True))
+
+    def test_failures_are_negative_cached(self):
+        with FakeStravaServer() as srv, srv.patch_weather(), \
+             mock.patch.object(WeatherService, "URLS", [f"{srv.base}/missing/archive", f"{srv.base}/missing/forecast"]):
+            self.assertEqual(WeatherService.get_weather(45.46, 9.19, "2024-01-01", 8), (20.0, 50.0, False))
+            self.assertEqual(WeatherService.get_weather(45.46, 9.19, "2024-01-01", 9), (20.0, 50.0, False))
+            self.assertEqual(srv.count("/missing/"), 2)
+
+class TestWeatherBatch(unittest.TestCase):
+    def test_one_range_request_per_cell(self):
+        points = [(45.46, 9.19, f"2024-01-{d:02d}", 8) for d in range(1, 29)]
+        points += [(41.90, 12.50, "2024-03-01", 10), (41.91, 12.49, "2024-06-01", 10)]
+        with FakeStravaServer() as srv, srv.patch_weather():
+            results = WeatherService.get_weather_batch(points)
+            self.assertEqual(srv.count("/v1/archive"), 2)
+            # Secondo passaggio: tutto in cache
+            WeatherService.get_weather_batch(points)
+            self.assertEqual(srv.count("/v1/archive"), 2)
+        self.assertEqual(len(results), len(points))
+        self.assertTrue(all(r == (16.0, 62.0, True) for r in results[:28]))
+        self.assertEqual(results[-1], (17.0, 60.0, True))
+
+    def test_stats_count_one_lookup_per_point(self):
+        points = [(45.46, 9.19, f"2024-01-{d:02d}", 8) for d in range(1, 11)]
+        with FakeStravaServer() as srv, srv.patch_weather():
+            WeatherService.get_weather_batch(points)
+            WeatherService.get_weather_batch(points)
+            stats = WeatherService.get_cache().stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (20, 0))
+
+    def test_days_missing_from_archive_fall_back(self):
+        points = [(45.46, 9.19, "2024-01-01", 8), (45.46, 9.19, "2024-01-10", 8)]
+        with FakeStravaServer(archive_until="2024-01-05") as srv, srv.patch_weather():
+            results = WeatherService.get_weather_batch(points)
+            # 1 richiesta a intervallo + 1 singola per il giorno non coperto
+            self.assertEqual(srv.count("/v1/archive"), 2)
+        self.assertEqual(results, [(16.0, 62.0, True), (20.0, 50.0, False)])
+
+    def test_null_hours_fall_back_to_forecast(self):
+        # Archivio consolidato fino alle 06 del giorno: le ore successive sono null
+        points = [(45.46, 9.19, "2024-01-05", 5), (45.46, 9.19, "2024-01-05", 18)]
+        with FakeStravaServer(archive_until="2024-01-05T06") as srv, srv.patch_weather(), \
+             mock.patch.object(WeatherService, "URLS", [srv.meteo_url, srv.forecast_url]):
+            results = WeatherService.get_weather_batch(points)
+            self.assertEqual(srv.count("/v1/forecast"), 1)
+            self.assertEqual(WeatherService.get_weather(45.46, 9.19, "2024-01-05", 18), (30.0, 40.0, True))
+            self.assertEqual(srv.count("/v1/forecast"), 1)
+        self.assertEqual(results, [(14.5, 65.0, True), (30.0, 40.0, True)])
+
+    def test_long_histories_are_split_in_ranges(self):
+        with mock.patch.object(WeatherService, "MAX_RANGE_DAYS", 30):
+            ranges = WeatherService._date_ranges(["2024-01-01", "2024-01-20", "2024-02-15", "2024-02-16"])
+        self.assertEqual(ranges, [("2024-01-01", "2024-01-20"), ("2024-02-15", "2024-02-16")])
+
+    def test_meteo_data_batch(self):
+        from engine.metrics import MeteoData
+        acts = [
+            {"start_latlng": [45.46, 9.19], "start_date_local": "2024-01-01T08:00:00Z"},
+            {"start_latlng": None, "start_date_local": "2024-01-02T08:00:00Z"},
+            {"start_latlng": [45.46, 9.19], "start_date_local": "2024-01-03T10:00:00Z"}
+        ]
+        with FakeStravaServer() as srv, srv.patch_weather():
+            meteo = MeteoData.fetch_for_activities(acts)
+            single = MeteoData.fetch_for_activity(acts[2])
+            self.assertEqual(srv.count("/v1/archive"), 1)
+        self.assertEqual([(m.temperature, m.is_real) for m in meteo], [(16.0, True), (20.0, False), (17.0, True)])
+        self.assertEqual(single, meteo[2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import numpy as np
+from engine.metrics import MetricsCalculator
+
+def loop_zones(watts_stream, ftp):
+    """Implementazione originale (ciclo Python) usata come riferimento."""
+    if not watts_stream or not ftp: return {}
+    zones = [0]*7
+    limits = [0.55, 0.75, 0.90, 1.05, 1.20, 1.50]
+    for w in watts_stream:
+        if w < ftp * limits[0]: zones[0]+=1
+        elif w < ftp * limits[1]: zones[1]+=1
+        elif w < ftp * limits[2]: zones[2]+=1
+        elif w < ftp * limits[3]: zones[3]+=1
+        elif w < ftp * limits[4]: zones[4]+=1
+        elif w < ftp * limits[5]: zones[5]+=1
+        else: zones[6]+=1
+    total = len(watts_stream)
+    return {f"Z{i+1}": round(c/total*100, 1) for i, c in enumerate(zones)}
+
+def loop_hr_zones(hr_stream, zones_config):
+    if not hr_stream or not zones_config or 'zones' not in zones_config: return {}
+    zones_def = zones_config['zones']
+    counts = [0] * len(zones_def)
+    limits = [(z.get('min', 0), z.get('max', 250)) for z in zones_def]
+    for h in hr_stream:
+        for i, (mn, mx) in enumerate(limits):
+            if mx == -1: mx = 300
+            if mn <= h <= mx:
+                counts[i] += 1
+                break
+    total = len(hr_stream)
+    return {f"Z{i+1}": round(c/total*100, 1) if total > 0 else 0 for i, c in enumerate(counts)}
+
+def random_hr_config(rng):
+    """Zone contigue stile Strava, oppure con buchi/sovrapposizioni e senza 'max'."""
+    bounds = np.sort(rng.choice(np.arange(80, 200), size=rng.integers(2, 6), replace=False))
+    zones, prev = [], 0
+    for b in bounds:
+        zones.append({"min": int(prev), "max": int(b)})
+        prev = b + rng.integers(-3, 4)
+    last = {"min": int(prev), "max": -1}
+    if rng.random() < 0.2:
+        last.pop("max")
+    zones.append(last)
+    return {"zones": zones}
+
+class TestZonesProperties(unittest.TestCase):
+    def test_power_zones_match_loop(self):
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            ftp = int(rng.integers(1, 450))
+            n = int(rng.integers(1, 400))
+            watts = rng.integers(-10, 700, n).tolist()
+            if rng.random() < 0.5:
+                # Valori esattamente sulle soglie e float
+                watts += [ftp * l for l in (0.55, 0.75, 0.90, 1.05, 1.20, 1.50)] + rng.uniform(0, 600, 5).tolist()
+            self.assertEqual(MetricsCalculator.calculate_zones(watts, ftp), loop_zones(watts, ftp))
+            self.assertEqual(MetricsCalculator.calculate_zones(np.array(watts), ftp), loop_zones(watts, ftp))
+
+    def test_hr_zones_match_loop(self):
+        rng = np.random.default_rng(1)
+        for _ in range(300):
+            cfg = random_hr_config(rng)
+            hr = rng.integers(30, 320, int(rng.integers(1, 400))).tolist()
+            hr += [z["min"] for z in cfg["zones"]] + [z.get("max", 250) for z in cfg["zones"]]
+            hr += rng.uniform(30, 260, 5).tolist()
+            self.assertEqual(MetricsCalculator.calculate_hr_zones(hr, cfg), loop_hr_zones(hr, cfg))
+
+    def test_empty_inputs(self):
+        self.assertEqual(MetricsCalculator.calculate_zones([], 250), {})
+        self.assertEqual(MetricsCalculator.calculate_zones([200], 0), {})
+        self.assertEqual(MetricsCalculator.calculate_hr_zones([], {"zones": []}), {})
+        self.assertEqual(MetricsCalculator.calculate_hr_zones([150], {}), {})
+
+if __name__ == "__main__":
+    unittest.main()
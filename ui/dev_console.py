@@ -18,9 +18,10 @@ def render_dev_console():
     # Instantiate DB Service locally since app.py might not have passed it
     from config import Config
     from services.db import DatabaseService
+    from services.db_cache import CachedDatabaseService, get_db_cache
     try:
         supa_creds = Config.get_supabase_creds()
-        db = DatabaseService(supa_creds["url"], supa_creds["key"])
+        db = CachedDatabaseService(DatabaseService(supa_creds.get("url"), supa_creds.get("key")))
     except:
         db = None
 
@@ -36,11 +37,43 @@ def render_dev_console():
 
     with tab3:
         st.subheader("Drift Debug")
-        st.json(st.session_state.get("last_drift_debug", {}))
+        run_id = st.session_state.get("last_drift_run")
+        streams = st.session_state.get("run_streams", {}).get(run_id)
+        if streams is None and run_id is not None and db:
+            # La dashboard può aver letto le metriche dalla cache senza caricare gli stream
+            streams = st.session_state.setdefault("run_streams", {})[run_id] = db.get_run_streams(run_id)
+        if streams is None:
+            st.info("Apri una corsa nella dashboard per vederne il drift.")
+        else:
+            from engine.metrics import MetricsCalculator
+            from ui.visuals import render_drift_chart
+            c1, c2, c3 = st.columns(3)
+            window = c1.number_input("Finestra (s)", 60, 1800, 300, step=60, key="dev_drift_window")
+            warmup = c2.number_input("Warm-up scartato (s)", 0, 1800, 600, step=60, key="dev_drift_warmup")
+            pauses = c3.checkbox("Scarta pause", value=True, key="dev_drift_pauses")
+            timeline = MetricsCalculator.calculate_drift_timeline(streams["watts"], streams["hr"], int(window), int(warmup), pauses)
+            render_drift_chart(timeline, title=f"📉 Drift corsa {run_id}")
+            classic = MetricsCalculator.calculate_decoupling(streams["watts"], streams["hr"])
+            st.json({"decoupling_classic": round(classic * 100, 2), "decoupling_filtered": round(timeline["decoupling"] * 100, 2),
+                     "samples": timeline["samples"], "dropped": timeline["dropped"]})
 
     with tab4:
         st.subheader("Rate Limit")
-        st.json(st.session_state.get("rate_limit_headers", {}))
+        from services.rate_limiter import get_strava_limiter
+        rl = get_strava_limiter().snapshot()
+        c1, c2 = st.columns(2)
+        for col, key, label in ((c1, "15min", "Finestra 15 min"), (c2, "daily", "Giornaliero")):
+            w = rl[key]
+            col.metric(label, f"{w['usage']} / {w['limit']}", f"reset tra {w['reset_in_sec'] // 60} min", delta_color="off")
+            col.progress(min(1.0, w["usage"] / max(w["limit"], 1)))
+        st.caption(f"Richieste in coda: {rl['queued_requests']} · attesa totale: {rl['waited_sec']}s")
+        st.json(rl["last_headers"])
+
+        st.markdown("#### 🔌 Connessioni HTTP")
+        from services.http_pool import session_stats
+        for name, stats in session_stats().items():
+            st.write(f"**{name}**: {stats['requests']} richieste su {stats['connections_opened']} connessioni "
+                     f"({stats['connections_reused']} riusi)")
 
     with tab5:
         st.subheader("🌦 Forecast & Weather Audit")
@@ -89,6 +122,9 @@ def render_dev_console():
 
     with tab6:
         st.subheader("🔍 OpenMeteo Debugger")
+        from services.meteo_svc import WeatherService
+        wc = WeatherService.get_cache().stats()
+        st.caption(f"Cache meteo: {wc['entries']} giorni/cella · hit {wc['hits']} · miss {wc['misses']}")
         debug = st.session_state.get("last_weather_debug", {})
         
         if not debug:
@@ -124,6 +160,57 @@ def render_dev_console():
              st.write(f"Has gaming_feedback: {hasattr(eng, 'gaming_feedback')}")
              st.write(f"Has compute_score_v6_darkritual_wrapper: {hasattr(eng, 'compute_score_v6_darkritual_wrapper')}")
 
+        st.markdown("#### ♻️ Rescore Storico")
+        ath_id = (st.session_state.get("strava_token") or {}).get("athlete", {}).get("id")
+        st.caption(f"ENGINE_VERSION corrente: {Config.ENGINE_VERSION}")
+        if db and ath_id:
+            st.write(f"Corse da ricalcolare: {db.count_stale_runs(ath_id, Config.ENGINE_VERSION)}")
+            if st.button("Ricalcola storico", key="dev_rescore"):
+                from controllers.rescore_controller import RescoreController
+                status = st.empty()
+                res = RescoreController(db).run(ath_id, progress_cb=lambda p, u: status.write(f"Processate {p} corse, aggiornate {u}"))
+                st.json(res)
+        else:
+            st.info("Nessun atleta/DB disponibile per il rescore.")
+
+        st.markdown("#### 🗜 Archivio Stream")
+        if db and ath_id:
+            ss = db.get_stream_store().stats()
+            st.caption(f"Corse in archivio: {ss['runs']} · {ss['bytes'] / 1024:.0f} KB")
+            dc = db.get_derived_cache().stats()
+            st.caption(f"Cache metriche derivate: {dc['runs']} corse · {dc['bytes'] / 1024:.0f} KB · hit {dc['hits']} · miss {dc['misses']}")
+            qc = get_db_cache().stats()
+            st.caption(f"Cache letture DB: {qc['entries']} voci · hit {qc['hits']} · miss {qc['misses']}")
+            if qc["methods"]:
+                st.dataframe(pd.DataFrame([{"metodo": m, **c} for m, c in qc["methods"].items()]), hide_index=True)
+            strip = st.checkbox("Rimuovi gli stream JSON da raw_data dopo la copia", value=False, key="dev_streams_strip")
+            if st.button("Migra stream raw_data", key="dev_streams_migrate"):
+                st.json(db.migrate_streams(ath_id, strip=strip))
+            if st.button("Aggiorna archivio mmap", key="dev_streams_archive"):
+                st.json(db.sync_stream_archive(ath_id).stats(ath_id))
+
+            st.markdown("#### 🔋 Training Load")
+            last = db.get_last_load_state(ath_id)
+            st.caption(f"Metrica: {Config.TRAINING_LOAD_METRIC} · ultimo stato: {last['day'] if last else 'nessuno'}")
+            if st.button("Ricostruisci ATL/CTL/TSB", key="dev_load_rebuild"):
+                from controllers.training_load_controller import TrainingLoadController
+                st.write(f"Giorni ricalcolati: {TrainingLoadController(db).rebuild(ath_id)}")
+
+            st.markdown("#### 📈 Curve Mean-Max")
+            from engine.power_curve import KEY_DURATIONS, value_at
+            if st.button("Calcola curve mancanti", key="dev_curves_build"):
+                st.write(f"Curve calcolate: {db.build_curves(ath_id)}")
+            env = db.get_athlete_curves(ath_id)
+            st.dataframe(pd.DataFrame([
+                {
+                    "Durata (s)": d,
+                    "Watts all-time": value_at(env["all_time"]["watts"], d),
+                    "Watts 90gg": value_at(env["rolling"]["watts"], d),
+                    "HR all-time": value_at(env["all_time"]["hr"], d),
+                    "HR 90gg": value_at(env["rolling"]["hr"], d)
+                } for d in KEY_DURATIONS
+            ]), hide_index=True)
+
 
 
     if st.button("⬅️ Torna alla app"):
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import altair as alt
 from config import Config
 
@@ -355,16 +356,18 @@ def calculate_efficiency_factor(watts: list, hr: list) -> dict:
     """Wrapper for MetricsCalculator.calculate_efficiency_factor"""
     return MetricsCalculator.calculate_efficiency_factor(watts, hr)
 
-def render_scatter_chart(watts, hr):
+def render_scatter_chart(watts, hr, ef_data=None, step=10):
+    """watts/hr già campionati (es. dalla cache metriche derivate) con step=1 ed ef_data precalcolato."""
     st.markdown("##### ❤️ Power vs HR")
-    if not watts or not hr:
+    if watts is None or hr is None or len(watts) == 0 or len(hr) == 0:
         st.info("Stream dati mancanti.")
         return
 
     # Calcola Efficiency Factor
-    ef_data = calculate_efficiency_factor(watts, hr)
+    if ef_data is None:
+        ef_data = calculate_efficiency_factor(watts, hr)
     
-    df = pd.DataFrame({'Watts': watts[::10], 'HR': hr[::10]}) # Sampled
+    df = pd.DataFrame({'Watts': watts[::step], 'HR': hr[::step]}) # Sampled
     
     chart = alt.Chart(df).mark_circle(size=60, opacity=0.4).encode(
         x=alt.X('Watts', title='Power (W)'),
@@ -382,7 +385,59 @@ def render_scatter_chart(watts, hr):
     if ef_data['ef'] > 0:
         st.caption(f"**Efficiency Factor:** {ef_data['ef']} ({ef_data['interpretation']}) | Avg: {ef_data['avg_power_clean']}W @ {ef_data['avg_hr_clean']} bpm")
 
-def render_history_table(df):
+def render_drift_chart(timeline: dict, title="📉 Drift Pw:HR"):
+    st.markdown(f"##### {title}")
+    if len(timeline.get('t', [])) == 0:
+        st.info("Stream troppo corto per il drift a finestre.")
+        return
+
+    df = pd.DataFrame({
+        'Minuto': np.asarray(timeline['t']) / 60,
+        'Drift (%)': np.asarray(timeline['drift_pct'])
+    }).dropna()
+
+    chart = alt.Chart(df).mark_line(strokeWidth=2).encode(
+        x=alt.X('Minuto', title='Tempo (min)'),
+        y=alt.Y('Drift (%)', title='Drift vs prima finestra (%)'),
+        color=alt.value(Config.SCORE_COLORS['neutral']),
+        tooltip=[alt.Tooltip('Minuto', format='.1f'), alt.Tooltip('Drift (%)', format='.2f')]
+    ).properties(
+        height=250,
+        background='rgba(0,0,0,0)'
+    )
+    st.altair_chart(_apply_chart_style(chart), width='stretch')
+    st.caption(f"Decoupling: {timeline['decoupling'] * 100:.1f}% · campioni {timeline['samples']} · scartati {timeline['dropped']}")
+
+def render_training_load_chart(series: list, title="🔋 Carico (ATL / CTL / TSB)"):
+    st.markdown(f"##### {title}")
+    if not series:
+        st.info("Nessun carico calcolato: sincronizza le corse per popolare il modello.")
+        return
+
+    df = pd.DataFrame(series)[['day', 'atl', 'ctl', 'tsb']].rename(
+        columns={'day': 'Data', 'atl': 'ATL (fatica)', 'ctl': 'CTL (fitness)', 'tsb': 'TSB (forma)'}
+    )
+    df['Data'] = pd.to_datetime(df['Data'])
+    long_df = df.melt('Data', var_name='Serie', value_name='Valore')
+
+    chart = alt.Chart(long_df).mark_line(strokeWidth=2).encode(
+        x=alt.X('Data:T', title=None),
+        y=alt.Y('Valore:Q', title=None),
+        color=alt.Color('Serie:N', scale=alt.Scale(
+            domain=['ATL (fatica)', 'CTL (fitness)', 'TSB (forma)'],
+            range=[Config.SCORE_COLORS['bad'], Config.SCORE_COLORS['neutral'], Config.SCORE_COLORS['good']]
+        ), legend=alt.Legend(orient='bottom', title=None)),
+        tooltip=[alt.Tooltip('Data:T'), 'Serie', alt.Tooltip('Valore', format='.1f')]
+    ).properties(
+        height=250,
+        background='rgba(0,0,0,0)'
+    )
+    st.altair_chart(_apply_chart_style(chart), width='stretch')
+    last = series[-1]
+    st.caption(f"Oggi: ATL {last['atl']:.0f} · CTL {last['ctl']:.0f} · TSB {last['tsb']:+.0f}")
+
+def render_history_table(df, on_load_more=None):
+    """Tabella storico; con on_load_more un pulsante carica la pagina successiva."""
     if df.empty:
         st.text("Nessun dato.")
         return
@@ -410,6 +465,8 @@ def render_history_table(df):
             "KM": st.column_config.NumberColumn("KM", format="%.1f km")
         }
     )
+    if on_load_more is not None:
+        st.button("Carica altre corse", key="history_load_more", on_click=on_load_more, width='stretch')
 
 def render_trend_chart(df):
     st.markdown("##### 📈 Smart Trend")
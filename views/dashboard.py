@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import time
 from datetime import datetime, timedelta
 from config import Config
@@ -7,8 +8,9 @@ from engine.core import ScoreEngine, RunMetrics
 from engine.dashboard_logic import DashboardLogic
 from ui.visuals import (
     render_history_table, render_trend_chart, render_scatter_chart, 
-    render_zones_chart, get_coach_feedback
+    render_zones_chart, render_training_load_chart, get_coach_feedback
 )
+from controllers.training_load_controller import TrainingLoadController
 from ui.feedback import render_feedback_form
 from ui.legal import render_legal_section
 
@@ -17,6 +19,23 @@ from components.header import render_header
 from components.athlete import render_top_section
 from components.kpi import render_kpi_grid
 
+# Corse per pagina nella tabella Archivio (paginazione keyset sul DB)
+HISTORY_PAGE_SIZE = 50
+
+def _history_archive(db_svc, athlete_id, latest_id):
+    """Pagine dell'archivio in sessione; si riparte dalla prima se è cambiata la corsa più recente (sync/reset)."""
+    archive = st.session_state.get("history_archive")
+    if not archive or archive["athlete_id"] != athlete_id or archive["latest_id"] != latest_id:
+        rows, cursor = db_svc.get_history_page(athlete_id, page_size=HISTORY_PAGE_SIZE)
+        archive = {"athlete_id": athlete_id, "latest_id": latest_id, "rows": rows, "cursor": cursor}
+        st.session_state.history_archive = archive
+    return archive
+
+def _load_more_history(db_svc, archive):
+    rows, cursor = db_svc.get_history_page(archive["athlete_id"], after=archive["cursor"], page_size=HISTORY_PAGE_SIZE)
+    archive["rows"] += rows
+    archive["cursor"] = cursor
+
 def render_dashboard(auth_svc, db_svc):
     # 1. HEADER
     # context
@@ -47,15 +66,15 @@ def render_dashboard(auth_svc, db_svc):
     if should_sync and not st.session_state.get("demo_mode", False):
         logger.info("🚀 Triggering initial sync...")
         try:
-            with st.spinner("⏳ Sincronizzazione ultimi 3 mesi in corso..."):
+            with st.spinner("⏳ Sincronizzazione attività in corso..."):
                 logger.info("📥 Spinner shown, importing SyncController...")
                 # Inizializziamo il controller
                 from controllers.sync_controller import SyncController
                 sync_service = SyncController(auth_svc, db_svc)
                 
                 logger.info(f"🔄 Starting sync for athlete {athlete_id}...")
-                # Default 90 giorni (3 mesi)
-                result = sync_service.sync_activities(days_lookback=90)
+                # Incrementale dal cursore (storico completo via backfill)
+                result = sync_service.sync_activities()
                 logger.info(f"✅ Sync completed: {result}")
                 
                 # Segniamo che l'abbiamo fatto, così non lo rifà ad ogni click
@@ -63,7 +82,7 @@ def render_dashboard(auth_svc, db_svc):
                 st.session_state.filter_start_date = datetime.now().date() - timedelta(days=90)
                 
                 # Refresh dati
-                st.session_state.data = db_svc.get_history(athlete_id)
+                st.session_state.data = db_svc.get_history_summary(athlete_id)
                 logger.info(f"📊 Data refreshed: {len(st.session_state.data)} runs")
                 
                 # Rerunning to apply newly synced profile params (FTP, Weight, etc.) to the UI
@@ -82,7 +101,7 @@ def render_dashboard(auth_svc, db_svc):
     # --- VISUALIZZAZIONE DASHBOARD ---
     # Refresh data from DB to catch any recent syncs
     if not st.session_state.get("demo_mode", False):
-        fresh_data = db_svc.get_history(athlete_id)
+        fresh_data = db_svc.get_history_summary(athlete_id)
         if fresh_data:
             st.session_state.data = fresh_data
     
@@ -93,8 +112,14 @@ def render_dashboard(auth_svc, db_svc):
              df['Data'] = df['Data'].dt.tz_localize(None)
 
         # Initialize Logic
-        logic = DashboardLogic(ScoreEngine())
-        df = logic.prepare_trend_data(df)
+        logic = DashboardLogic(ScoreEngine(), db_svc.get_derived_store())
+
+        # KPI aggregati lato server (migrazione v4_9): poche centinaia di righe invece delle
+        # medie mobili e del resample su tutto lo storico; senza aggregati si calcola in pandas
+        demo = st.session_state.get("demo_mode", False)
+        trend_rows = [] if demo else db_svc.get_score_trend(athlete_id, since=start_date)
+        weekly_rows = [] if demo else db_svc.get_weekly_stats(athlete_id, since=start_date)
+        df = df.sort_values("Data", ascending=False) if trend_rows else logic.prepare_trend_data(df)
         
         # Filtro Temporale Dinamico
         if 'start_date' in locals():
@@ -102,12 +127,30 @@ def render_dashboard(auth_svc, db_svc):
             cutoff = pd.to_datetime(start_date)
             # Ensure timezone awareness matches (remove tz from df if needed, done above)
             df = df[df['Data'] >= cutoff]
+        trend_df = logic.trend_frame(trend_rows) if trend_rows else df
         
         if df.empty:
             st.warning("Nessuna corsa nel periodo selezionato.")
         else:
-            cur_run = df.iloc[0]
-            delta_val = logic.calculate_delta(df)
+            cur_run = df.iloc[0].copy()
+            # Metriche derivate (EF, zone, scatter) dalla cache per (corsa, ENGINE_VERSION, FTP/zone):
+            # lo storico arriva senza stream, che si caricano solo se la voce manca
+            derived = {}
+            if cur_run.get('id') is not None:
+                run_id = cur_run['id']
+
+                def load_streams():
+                    if isinstance(cur_run.get('raw_watts'), (list, np.ndarray)):
+                        return {"watts": cur_run['raw_watts'], "hr": cur_run.get('raw_hr')}
+                    streams_cache = st.session_state.setdefault("run_streams", {})
+                    if run_id not in streams_cache:
+                        streams_cache[run_id] = db_svc.get_run_streams(run_id)
+                    return streams_cache[run_id]
+
+                derived = logic.get_run_derived(run_id, ftp, phys_params.get('hr_zones'), load_streams)
+                # Corsa ispezionata: il tab Drift della Dev Console ne ricalcola il timeline
+                st.session_state.last_drift_run = run_id
+            delta_val = logic.calculate_delta(trend_df)
             
             # --- MIDDLE SECTION: METRICHE PRINCIPALI (KPI) ---
             
@@ -117,9 +160,9 @@ def render_dashboard(auth_svc, db_svc):
             # 2. CALCOLO METRICHE (Spostato prima del rendering)
             quality_data = logic.get_run_quality(current_score)
             trend_data = cur_run.get("Trend", {})
-            consistency_data = logic.prepare_consistency_score(df)
-            ef_data = logic.get_efficiency_factor(cur_run)
-            zones_pwr = logic.get_zones(cur_run, ftp)
+            consistency_data = logic.consistency_from_weekly(weekly_rows) if weekly_rows else logic.prepare_consistency_score(df)
+            ef_data = derived.get("ef") or logic.get_efficiency_factor(cur_run)
+            zones_pwr = derived["zones"] if "zones" in derived else logic.get_zones(cur_run, ftp)
             
             # 3. RENDER FULL NEON GRID
             render_kpi_grid(cur_run, quality_data, trend_data, consistency_data, ef_data, zones_pwr)
@@ -146,13 +189,17 @@ def render_dashboard(auth_svc, db_svc):
             col_trend, col_scatter = st.columns([1.2, 1], gap="medium")
             
             with col_trend:
-                render_trend_chart(df)
+                render_trend_chart(trend_df)
                 
             with col_scatter:
-                render_scatter_chart(cur_run.get('raw_watts', []), cur_run.get('raw_hr', []))
+                scatter = derived.get("scatter") or {}
+                render_scatter_chart(scatter.get("watts", []), scatter.get("hr", []), ef_data=ef_data, step=1)
                 
             # Zones Chart (Full Width or below)
             render_zones_chart(zones_pwr)
+
+            # Carico di allenamento: stati giornalieri letti da training_load
+            render_training_load_chart(TrainingLoadController(db_svc).series(athlete_id))
             
             st.divider()
             st.markdown('<div class="details-row">', unsafe_allow_html=True)
@@ -169,7 +216,13 @@ def render_dashboard(auth_svc, db_svc):
 
             with c_arch:
                 with st.popover("📂 Archivio", width='stretch'):
-                    render_history_table(df)
+                    if st.session_state.get("demo_mode", False):
+                        render_history_table(df)
+                    else:
+                        # Pagine (date, id) lette a richiesta invece dell'intero storico
+                        archive = _history_archive(db_svc, athlete_id, st.session_state.data[0].get("id"))
+                        load_more = (lambda: _load_more_history(db_svc, archive)) if archive["cursor"] else None
+                        render_history_table(pd.DataFrame(archive["rows"]), on_load_more=load_more)
 
             with c_bug:
                 with st.popover("🛠️ Bug/Idea", width='stretch'):